@@ -0,0 +1,38 @@
+import os
+from benchmarks.common import best_of, isolated_config, make_pools, metric, quiet
+from core.config_manager import config_store, load_config, save_config
+
+POOL_COUNTS = (100, 500, 1000)
+
+
+def _touch_externally(path):
+    """Make the file look edited by another process, so the next load re-reads it."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+
+def run(quick=False):
+    """save_config/load_config cost for configs holding hundreds of pools."""
+    results = {}
+    repeat = 3 if quick else 7
+    for count in POOL_COUNTS:
+        with isolated_config({"pools": make_pools(count), "cpu": {"enabled": True}}) as config, quiet():
+            def save_and_write():
+                config["pools"].insert(0, config["pools"].pop())  # A real change, so the write isn't skipped
+                save_config(config)
+                config_store.flush()
+
+            def queue_only():
+                config["pools"].insert(0, config["pools"].pop())
+                save_config(config)
+
+            def load_changed():
+                _touch_externally(config_store.path)
+                load_config()
+
+            results[f"save_{count}_pools"] = metric(best_of(save_and_write, repeat) * 1000, "ms")
+            results[f"save_queued_{count}_pools"] = metric(best_of(queue_only, repeat, 100) * 1e6, "us")
+            config_store.flush()
+            results[f"load_changed_{count}_pools"] = metric(best_of(load_changed, repeat) * 1000, "ms")
+            results[f"load_cached_{count}_pools"] = metric(best_of(load_config, repeat, 1000) * 1e6, "us")
+    return results
@@ -0,0 +1,41 @@
+import random
+from benchmarks.common import best_of, metric
+from core.pool_manager import pool_key
+from utils.helpers import get_domain
+
+URL_COUNT = 100_000
+
+
+def make_urls(count, seed=1):
+    """A reproducible mix of the URL forms pools are configured with."""
+    rng = random.Random(seed)
+    tlds = ("com", "org", "net", "io", "stream", "co.uk")
+    forms = (
+        lambda: f"pool.example{rng.randrange(500)}.{rng.choice(tlds)}:{rng.randrange(1000, 20000)}",
+        lambda: f"stratum+tcp://xmr-eu{rng.randrange(9)}.pool{rng.randrange(500)}.{rng.choice(tlds)}:{rng.randrange(1000, 20000)}",
+        lambda: f"stratum+ssl://de.monero.pool{rng.randrange(500)}.com:{rng.randrange(1000, 20000)}",
+        lambda: f"pool{rng.randrange(500)}.org",
+        lambda: f"192.168.{rng.randrange(256)}.{rng.randrange(256)}:3333",
+        lambda: f"[2001:db8::{rng.randrange(65536):x}]:3333",
+    )
+    return [rng.choice(forms)() for _ in range(count)]
+
+
+def run(quick=False):
+    """get_domain and pool_key throughput over a large URL list."""
+    urls = make_urls(URL_COUNT // 10 if quick else URL_COUNT)
+    pools = [{"url": url, "user": "4AAAA.rig"} for url in urls]
+    repeat = 3 if quick else 5
+
+    def domains():
+        for url in urls:
+            get_domain(url)
+
+    def keys():
+        for pool in pools:
+            pool_key(pool)
+
+    return {
+        "get_domain_per_second": metric(len(urls) / best_of(domains, repeat), "calls/s", "higher"),
+        "pool_key_per_second": metric(len(pools) / best_of(keys, repeat), "calls/s", "higher"),
+    }
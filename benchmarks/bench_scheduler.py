@@ -0,0 +1,97 @@
+import random
+import time
+from datetime import datetime
+from unittest import mock
+from benchmarks.common import isolated_config, make_pools, metric, quiet
+from core import scheduler
+from core.pool_manager import add_listener, pool_key, remove_listener
+from core.schedule_store import make_schedule
+
+SCHEDULE_COUNTS = (10, 100, 1000)
+SIMULATED_HOURS = 24
+
+
+class _Finished(Exception):
+    pass
+
+
+class VirtualClock:
+    """Stands in for the scheduler's clock and wakeup event: waiting advances time instead of sleeping."""
+
+    def __init__(self, start, horizon):
+        self.now = start
+        self.horizon = horizon
+        self.wakeups = 0
+
+    def time(self):
+        return self.now
+
+    def wait(self, timeout=None):
+        self.wakeups += 1
+        self.now += timeout if timeout is not None else scheduler.MAX_SLEEP
+        if self.now >= self.horizon:
+            raise _Finished()
+        return False
+
+    def clear(self):
+        pass
+
+    def set(self):
+        pass
+
+    def datetime_class(self):
+        clock = self
+
+        class VirtualDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.fromtimestamp(clock.now, tz)
+        return VirtualDatetime
+
+
+def make_schedules(pools, count, seed=1):
+    rng = random.Random(seed)
+    schedules = []
+    for _ in range(count):
+        start, length = rng.randrange(24 * 60), rng.randrange(15, 8 * 60)
+        end = (start + length) % (24 * 60)
+        schedules.append(make_schedule(pool_key(rng.choice(pools)), f"{start // 60:02d}:{start % 60:02d}",
+                                       f"{end // 60:02d}:{end % 60:02d}"))
+    return schedules
+
+
+def simulate(count, hours=SIMULATED_HOURS):
+    """Run run_scheduler over `hours` of virtual time; returns (wakeups, CPU seconds, pool switches)."""
+    pools = make_pools(50)
+    start = datetime(2024, 1, 1).timestamp()
+    clock = VirtualClock(start, start + hours * 3600)
+    with isolated_config({"pools": pools}, debounce=0), quiet(), \
+            mock.patch.object(scheduler, "schedules", make_schedules(pools, count)), \
+            mock.patch.object(scheduler, "_index", scheduler.ScheduleIndex()), \
+            mock.patch.object(scheduler, "_wakeup", clock), \
+            mock.patch.object(scheduler, "time", clock), \
+            mock.patch.object(scheduler, "datetime", clock.datetime_class()):
+        scheduler._index.rebuild(scheduler.schedules)
+        switches = []
+        listener = lambda config, cause: switches.append(cause)
+        add_listener(listener)
+        cpu = time.process_time()
+        try:
+            scheduler.run_scheduler()
+        except _Finished:
+            pass
+        finally:
+            cpu = time.process_time() - cpu
+            remove_listener(listener)
+    return clock.wakeups, cpu, len(switches)
+
+
+def run(quick=False):
+    """Wakeups and CPU per hour of run_scheduler with many schedules, over a simulated day."""
+    results = {}
+    for count in SCHEDULE_COUNTS[:2] if quick else SCHEDULE_COUNTS:
+        wakeups, cpu, switches = simulate(count)
+        results[f"wakeups_per_hour_{count}_schedules"] = metric(wakeups / SIMULATED_HOURS, "wakeups/h")
+        results[f"cpu_per_hour_{count}_schedules"] = metric(cpu / SIMULATED_HOURS * 1000, "ms/h")
+        results[f"switches_per_hour_{count}_schedules"] = metric(switches / SIMULATED_HOURS, "switches/h")
+    return results
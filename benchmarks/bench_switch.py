@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+from benchmarks.common import isolated_config, metric, quiet, summarize
+from benchmarks.stub_xmrig import StubXmrig
+from core.config_manager import config_store
+from core.live_switch import LiveSwitcher
+from core.pool_manager import set_pool_on_top
+from utils.mock_stratum import MockStratumServer
+from utils.xmrig_api import XmrigApi
+
+SWITCHES = 20
+SWITCH_TIMEOUT = 10  # Seconds before a switch counts as lost
+
+
+async def _time_switches(stub, config, count):
+    """Alternate the top two pools `count` times; seconds from set_pool_on_top to the stub's first job on each."""
+    loop = asyncio.get_running_loop()
+    latencies = []
+    for _ in range(count):
+        target = config["pools"][1]["url"]
+        stub.job_arrived.clear()
+        started = time.perf_counter()
+        await loop.run_in_executor(None, set_pool_on_top, config, 2, "benchmark")
+        deadline = started + SWITCH_TIMEOUT
+        while stub.pool != target or stub.first_jobs.get(target, 0) < started:
+            try:
+                await asyncio.wait_for(stub.job_arrived.wait(), max(0.0, deadline - time.perf_counter()))
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"no job from {target} within {SWITCH_TIMEOUT}s of the switch")
+            stub.job_arrived.clear()
+        latencies.append(stub.first_jobs[target] - started)
+    return latencies
+
+
+async def _run(count):
+    pools = [await MockStratumServer().start() for _ in range(2)]
+    config = {"pools": [{"url": pool.url, "user": "4AAAA.bench"} for pool in pools],
+              "http": {"enabled": True, "host": "127.0.0.1", "port": 0, "restricted": False}}
+    results = {}
+    try:
+        with isolated_config(config) as config, quiet():
+            stub = await StubXmrig(config_store.path).start()
+            try:
+                # xmrig's file watcher: the switch reaches the miner when the debounced write lands
+                for name, value in summarize(await _time_switches(stub, config, count)).items():
+                    results[f"file_switch_{name}"] = value
+
+                # Live switching: pushed to the miner's HTTP API as soon as the pool order changes
+                config["http"]["port"] = stub.api_port
+                live = LiveSwitcher(config, XmrigApi.from_config(config), share_timeout=0)
+                stop = threading.Event()
+                live.start_background(stop)
+                try:
+                    for name, value in summarize(await _time_switches(stub, config, count)).items():
+                        results[f"live_switch_{name}"] = value
+                finally:
+                    stop.set()
+            finally:
+                await stub.stop()
+    finally:
+        for pool in pools:
+            await pool.stop()
+    results["debounce"] = metric(config_store.debounce * 1000, "ms")
+    return results
+
+
+def run(quick=False):
+    """Latency from set_pool_on_top to the first job on the new pool, via config.json and via the HTTP API."""
+    return asyncio.run(_run(SWITCHES // 4 if quick else SWITCHES))
@@ -0,0 +1,77 @@
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from core.config_manager import config_store, serialize_config
+
+
+def metric(value, unit, better="lower"):
+    """One benchmark result; `better` says which direction is an improvement."""
+    return {"value": round(value, 6), "unit": unit, "better": better}
+
+
+def best_of(func, repeat=5, number=1):
+    """Fastest of `repeat` runs of `number` calls to `func`, in seconds per call."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return min(timings)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(values, unit="ms", scale=1000):
+    """p50, p90 and max of timings in seconds."""
+    return {
+        "p50": metric(statistics.median(values) * scale, unit),
+        "p90": metric(percentile(values, 0.9) * scale, unit),
+        "max": metric(max(values) * scale, unit),
+    }
+
+
+def make_pools(count, seed_domains=("supportxmr.com", "nanopool.org", "herominers.com", "moneroocean.stream")):
+    """`count` distinct pool entries spread over a few real pool domains."""
+    return [{"url": f"pool{idx}.{seed_domains[idx % len(seed_domains)]}:{3333 + idx % 7}",
+             "user": f"4{'A' * 94}.rig{idx}", "pass": "x", "keepalive": True, "tls": idx % 2 == 0}
+            for idx in range(count)]
+
+
+@contextlib.contextmanager
+def isolated_config(config, debounce=None):
+    """Point the shared config_store at a temporary config.json holding `config`.
+
+    Every module imported config_store itself, so the store is retargeted in
+    place and restored afterwards; the real config.json is never touched.
+    """
+    directory = tempfile.mkdtemp(prefix="switcher-bench-")
+    path = os.path.join(directory, "config.json")
+    with open(path, "w") as file:
+        file.write(serialize_config(config))
+    saved = {name: getattr(config_store, name) for name in ("path", "debounce", "_config", "_stamp", "_written")}
+    config_store.flush()
+    config_store.path = path
+    config_store.debounce = config_store.debounce if debounce is None else debounce
+    config_store._config = config_store._stamp = config_store._written = None
+    try:
+        yield config_store.load()
+    finally:
+        config_store.flush()
+        for name, value in saved.items():
+            setattr(config_store, name, value)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the switcher's progress prints so they don't end up in the timings' output."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
@@ -0,0 +1,139 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from utils.helpers import BOLD, CYAN, GREEN, RED, RESET
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_DIR, "benchmarks", "results")
+REGRESSION = 0.1  # A metric 10% worse than the baseline is a regression
+
+# Benchmark name -> module with run(quick) returning {metric: {"value", "unit", "better"}}
+BENCHMARKS = {
+    "config": "benchmarks.bench_config",
+    "domains": "benchmarks.bench_domains",
+    "scheduler": "benchmarks.bench_scheduler",
+    "switch": "benchmarks.bench_switch",
+}
+
+
+def git_commit():
+    """Short hash of HEAD, with "-dirty" if the tree has uncommitted changes; None outside git."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def run_benchmarks(names, quick=False):
+    """Run the named benchmarks and return the report that gets stored as JSON."""
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "quick": quick,
+        "results": {},
+    }
+    for name in names:
+        print(f"{CYAN}Running {name}...{RESET}", file=sys.stderr)
+        started = time.perf_counter()
+        report["results"][name] = importlib.import_module(BENCHMARKS[name]).run(quick)
+        print(f"{CYAN}  done in {time.perf_counter() - started:.1f}s{RESET}", file=sys.stderr)
+    return report
+
+
+def save_report(report, path=None):
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{report['commit'] or 'nogit'}.json")
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+    return path
+
+
+def load_report(path):
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def compare(baseline, current, threshold=REGRESSION):
+    """[(benchmark, metric, old, new, relative change, regressed)] for metrics in both reports.
+
+    The change is signed so that positive is always worse, whichever direction the metric improves in.
+    """
+    rows = []
+    for name, metrics in current["results"].items():
+        for metric_name, entry in metrics.items():
+            old = baseline["results"].get(name, {}).get(metric_name)
+            if old is None or not old["value"]:
+                continue
+            change = (entry["value"] - old["value"]) / old["value"]
+            if entry.get("better") == "higher":
+                change = -change
+            rows.append((name, metric_name, old, entry, change, change > threshold))
+    return rows
+
+
+def print_report(report):
+    print(f"\n{CYAN}Benchmarks at {report['commit'] or 'unknown commit'} ({report['machine']}, "
+          f"Python {report['python']}):{RESET}")
+    for name, metrics in report["results"].items():
+        print(f"  {BOLD}{name}{RESET}")
+        for metric_name, entry in metrics.items():
+            print(f"    {metric_name:<40} {entry['value']:>14.6g} {entry['unit']}")
+
+
+def print_comparison(baseline, current, rows, threshold=REGRESSION):
+    print(f"\n{CYAN}{baseline['commit'] or 'baseline'} -> {current['commit'] or 'current'}:{RESET}")
+    for name, metric_name, old, new, change, regressed in rows:
+        color = RED if regressed else GREEN if change < -threshold else ""
+        print(f"  {color}{name}.{metric_name:<40} {old['value']:>12.6g} -> {new['value']:>12.6g} {new['unit']:<10}"
+              f" {'worse' if change > 0 else 'better'} by {abs(change):.0%}{RESET if color else ''}")
+    regressions = sum(1 for row in rows if row[5])
+    summary = f"{regressions} regression(s) over {threshold:.0%}" if regressions else "no regressions"
+    print(f"{RED if regressions else GREEN}{summary}.{RESET}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the switching hot paths and store the results as JSON.")
+    parser.add_argument("names", nargs="*", metavar="benchmark",
+                        help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for a smoke test")
+    parser.add_argument("--output", help="where to write the JSON (default: benchmarks/results/)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against an earlier JSON result")
+    parser.add_argument("--against", metavar="RESULT", help="with --compare: compare this result instead of running")
+    parser.add_argument("--threshold", type=float, default=REGRESSION, help="relative change that counts as a regression")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    if args.against:
+        if not args.compare:
+            parser.error("--against needs --compare")
+        current = load_report(args.against)
+    else:
+        current = run_benchmarks(args.names or list(BENCHMARKS), args.quick)
+        print(f"{GREEN}Results written to {save_report(current, args.output)}.{RESET}", file=sys.stderr)
+        print_report(current)
+    if args.compare:
+        baseline = load_report(args.compare)
+        rows = compare(baseline, current, args.threshold)
+        print_comparison(baseline, current, rows, args.threshold)
+        return 1 if any(row[5] for row in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.helpers import parse_pool_url
+from utils.mock_stratum import MockMiner
+
+WATCH_INTERVAL = 0.005  # Seconds between config.json checks, standing in for xmrig's file watcher
+
+
+class StubXmrig:
+    """Just enough of xmrig to time pool switches end to end.
+
+    Follows the top pool of config.json like xmrig's "watch" option, and
+    serves GET/PUT /1/config like its HTTP API. Whenever the top pool changes
+    it logs in there with a MockMiner and records when the first job arrived
+    (the login reply carries it). Runs on the caller's event loop; the HTTP API
+    runs on a thread, as the switcher's client blocks.
+    """
+
+    def __init__(self, config_path, watch_interval=WATCH_INTERVAL):
+        self.config_path = config_path
+        self.watch_interval = watch_interval
+        self.running_config = {}
+        self.pool = None  # "host:port" currently mined
+        self.first_jobs = {}  # "host:port" -> perf_counter time its first job arrived
+        self.job_arrived = None
+        self._miner = None
+        self._loop = None
+        self._watch_task = None
+        self._stamp = None
+        self._http = None
+
+    @property
+    def api_port(self):
+        return self._http.server_address[1]
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.job_arrived = asyncio.Event()
+        self._reload_file()
+        await self._follow(self.running_config)
+        self._watch_task = asyncio.create_task(self._watch())
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._http.daemon_threads = True
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        return self
+
+    async def stop(self):
+        self._watch_task.cancel()
+        self._http.shutdown()
+        self._http.server_close()
+        if self._miner is not None:
+            await self._miner.close()
+
+    def _reload_file(self):
+        stat = os.stat(self.config_path)
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        with open(self.config_path, "r") as file:
+            self.running_config = json.load(file)
+        return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            if self._reload_file():
+                await self._follow(self.running_config)
+
+    async def _follow(self, config):
+        """Connect to the config's top pool if it isn't the one being mined."""
+        pools = config.get("pools") or []
+        if not pools:
+            return
+        host, port = parse_pool_url(pools[0]["url"])
+        address = f"{host}:{port}"
+        if address == self.pool:
+            return
+        if self._miner is not None:
+            await self._miner.close()
+        self.pool = address
+        self._miner = MockMiner(host, port, login=pools[0].get("user", "x"))
+        if await self._miner.connect():
+            self.first_jobs[address] = time.perf_counter()
+            self.job_arrived.set()
+
+    def _handler_class(self):
+        stub = self
+
+        class ApiHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like xmrig
+            disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+            def _reply(self, body):
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/1/config":
+                    self._reply(stub.running_config)
+                else:
+                    self._reply({"connection": {"pool": stub.pool, "accepted": 0}, "hashrate": {"total": [None]}})
+
+            def do_PUT(self):
+                config = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                stub.running_config = config
+                asyncio.run_coroutine_threadsafe(stub._follow(config), stub._loop).result()
+                self._reply({})
+
+            def log_message(self, format, *args):
+                pass
+
+        return ApiHandler
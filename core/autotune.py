@@ -0,0 +1,245 @@
+import argparse
+import copy
+import glob
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from core.config_manager import ConfigStore, load_config
+from core.pool_manager import cpu_layout_section, set_cpu_layout
+from core.supervisor import XMRIG_PATH, ensure_attached, supervisor
+from utils.helpers import BOLD, CYAN, GREEN, ORANGE, RED, RESET
+
+SYSFS_ROOT = "/sys/devices/system"  # Holds cpu/ and node/; tests point this at a fake tree
+AUTOTUNE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../autotune.json")
+RX_SCRATCHPAD = 2 * 1024 * 1024  # RandomX wants 2 MiB of L3 per mining thread
+BENCH_SIZE = "1M"  # Hashes per xmrig --bench run
+BENCH_TIMEOUT = 900  # Seconds before a benchmark run is abandoned
+
+autotune_store = ConfigStore(AUTOTUNE_FILE, debounce=0)
+
+_BENCH_FINISHED = re.compile(r"benchmark finished in\s+([\d.]+)\s*s")
+_SPEED = re.compile(r"speed 10s/60s/15m\s+(\S+)\s+(\S+)\s+(\S+)\s+H/s")
+
+
+def parse_cpu_list(text):
+    """Expand a sysfs CPU list such as '0-3,8,10-11' into [0, 1, 2, 3, 8, 10, 11]."""
+    cpus = []
+    for part in (text or "").strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def parse_size(text):
+    """Convert a sysfs cache size such as '32768K' or '16M' into bytes (None if unknown)."""
+    match = re.fullmatch(r"(\d+)([KMG]?)", (text or "").strip())
+    if not match:
+        return None
+    return int(match.group(1)) * {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}[match.group(2)]
+
+
+def _read(path, default=None):
+    try:
+        with open(path, "r") as file:
+            return file.read().strip()
+    except OSError:
+        return default
+
+
+def read_topology(root=SYSFS_ROOT):
+    """Read online CPUs, physical cores (SMT siblings), L3 domains and NUMA nodes from sysfs."""
+    cpu_dir = os.path.join(root, "cpu")
+    online = parse_cpu_list(_read(os.path.join(cpu_dir, "online")))
+    if not online:
+        online = sorted(int(path.rsplit("cpu", 1)[1]) for path in glob.glob(os.path.join(cpu_dir, "cpu[0-9]*")))
+    cores = {}  # (package, core id) -> sibling CPUs
+    l3 = {}  # CPUs sharing an L3 -> its size in bytes
+    for cpu in online:
+        base = os.path.join(cpu_dir, f"cpu{cpu}")
+        package = int(_read(os.path.join(base, "topology/physical_package_id"), "0"))
+        core = int(_read(os.path.join(base, "topology/core_id"), str(cpu)))
+        cores.setdefault((package, core), []).append(cpu)
+        for index in glob.glob(os.path.join(base, "cache/index[0-9]*")):
+            if _read(os.path.join(index, "level")) == "3":
+                shared = tuple(cpu for cpu in parse_cpu_list(_read(os.path.join(index, "shared_cpu_list"))) if cpu in online)
+                l3[shared or (cpu,)] = parse_size(_read(os.path.join(index, "size")))
+    nodes = []
+    node_paths = glob.glob(os.path.join(root, "node/node[0-9]*"))
+    for path in sorted(node_paths, key=lambda path: int(path.rsplit("node", 1)[1])):
+        cpus = [cpu for cpu in parse_cpu_list(_read(os.path.join(path, "cpulist"))) if cpu in online]
+        if cpus:
+            nodes.append(cpus)
+    return {
+        "cpus": online,
+        "cores": sorted(cores.values()),
+        "l3": [{"cpus": list(cpus), "size": size} for cpus, size in sorted(l3.items())] or [{"cpus": online, "size": None}],
+        "nodes": nodes or [online],
+    }
+
+
+def fingerprint(topology):
+    """Stable short hash identifying a CPU topology; tuning results are cached under it."""
+    return hashlib.sha256(json.dumps(topology, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def candidate_layouts(topology):
+    """Return (name, cpus) thread layouts worth benchmarking, without duplicates.
+
+    - all: every logical CPU (what set_cores does for the full machine)
+    - physical: one thread per physical core, leaving SMT siblings idle
+    - cache: per L3 domain, as many threads as it has 2 MiB scratchpads for,
+      physical cores before SMT siblings
+    - cache-physical: the same, but never using SMT siblings
+    - node<N>: the physical cores of a single NUMA node (multi-node machines only)
+    Every layout lists its CPUs grouped by NUMA node.
+    """
+    physical = {siblings[0] for siblings in topology["cores"]}
+    node_of = {cpu: idx for idx, cpus in enumerate(topology["nodes"]) for cpu in cpus}
+
+    def by_node(cpus):
+        return sorted(cpus, key=lambda cpu: (node_of.get(cpu, 0), cpu))
+
+    cache, cache_physical = [], []
+    for domain in topology["l3"]:
+        fit = domain["size"] // RX_SCRATCHPAD if domain["size"] else len(domain["cpus"])
+        ordered = [cpu for cpu in domain["cpus"] if cpu in physical] + [cpu for cpu in domain["cpus"] if cpu not in physical]
+        cache.extend(ordered[:fit])
+        cache_physical.extend([cpu for cpu in ordered if cpu in physical][:fit])
+
+    candidates = [("all", topology["cpus"]), ("physical", physical), ("cache", cache), ("cache-physical", cache_physical)]
+    if len(topology["nodes"]) > 1:
+        candidates += [(f"node{idx}", [cpu for cpu in cpus if cpu in physical]) for idx, cpus in enumerate(topology["nodes"])]
+    layouts, seen = [], set()
+    for name, cpus in candidates:
+        cpus = by_node(cpus)
+        if cpus and tuple(cpus) not in seen:
+            seen.add(tuple(cpus))
+            layouts.append((name, cpus))
+    return layouts
+
+
+def _bench_hashes(bench):
+    match = re.fullmatch(r"(\d+)([KM]?)", bench.upper())
+    return int(match.group(1)) * {"": 1, "K": 1000, "M": 1000 ** 2}[match.group(2)] if match else None
+
+
+def parse_bench_output(output, hashes=None):
+    """Extract the hashrate (H/s) from xmrig --bench output, or None if there is none.
+
+    Prefers hashes / duration from the 'benchmark finished' line, falling back
+    to the last 10s speed reading.
+    """
+    finished = _BENCH_FINISHED.findall(output)
+    if finished and hashes and float(finished[-1]) > 0:
+        return hashes / float(finished[-1])
+    for speeds in reversed(_SPEED.findall(output)):
+        for value in speeds:
+            try:
+                return float(value)
+            except ValueError:
+                continue  # "n/a"
+    return None
+
+
+def run_benchmark(config, cpus, xmrig=XMRIG_PATH, bench=BENCH_SIZE, timeout=BENCH_TIMEOUT):
+    """Benchmark one thread layout with `xmrig --bench` and return its hashrate in H/s."""
+    trial = copy.deepcopy(config)
+    trial["cpu"] = cpu_layout_section(cpus)
+    trial["background"] = False
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, "config.json")
+        with open(config_path, "w") as file:
+            json.dump(trial, file)
+        result = subprocess.run([xmrig, "--config", config_path, f"--bench={bench}", "--no-color"], cwd=tmp,
+                                stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=timeout)
+    hashrate = parse_bench_output(result.stdout + result.stderr, _bench_hashes(bench))
+    if hashrate is None:
+        raise RuntimeError(f"no hashrate in xmrig output (exit code {result.returncode})")
+    return hashrate
+
+
+def autotune(config, root=SYSFS_ROOT, xmrig=XMRIG_PATH, bench=BENCH_SIZE, force=False, apply=True):
+    """Benchmark candidate layouts, write the fastest to config["cpu"] and return the result.
+
+    Results are cached per topology fingerprint, so the benchmarks only run
+    again when the hardware changes (or with `force`). Returns None if no
+    layout could be benchmarked.
+    """
+    topology = read_topology(root)
+    key = fingerprint(topology)
+    entry = (autotune_store.load() or {}).get(key)
+    if entry is None or force:
+        if ensure_attached() and supervisor.is_running():
+            print(f"{ORANGE}Warning: xmrig is mining; benchmarks will compete with it for the CPU.{RESET}")
+        results = []
+        for name, cpus in candidate_layouts(topology):
+            print(f"{CYAN}Benchmarking {name} ({len(cpus)} threads)...{RESET}")
+            try:
+                hashrate = run_benchmark(config, cpus, xmrig, bench)
+            except (OSError, subprocess.TimeoutExpired, RuntimeError) as e:
+                print(f"{RED}  {name} failed: {e}{RESET}")
+                hashrate = None
+            results.append({"name": name, "cpus": cpus, "hashrate": hashrate})
+        measured = [result for result in results if result["hashrate"]]
+        if not measured:
+            print(f"{RED}Auto-tune failed: no layout could be benchmarked.{RESET}")
+            return None
+        best = max(measured, key=lambda result: result["hashrate"])
+        entry = {"name": best["name"], "layout": best["cpus"], "hashrate": best["hashrate"],
+                 "results": results, "tuned_at": time.time()}
+        cache = autotune_store.load() or {}
+        cache[key] = entry
+        autotune_store.save(cache)
+    else:
+        print(f"{GREEN}Using cached tuning for this CPU topology ({key}).{RESET}")
+    if apply:
+        set_cpu_layout(config, entry["layout"])
+    return entry
+
+
+def print_autotune(entry):
+    """Print the benchmarked layouts, best first."""
+    print(f"\n{CYAN}CPU layouts by hashrate:{RESET}")
+    for result in sorted(entry["results"], key=lambda result: result["hashrate"] or 0, reverse=True):
+        marker = f"{BOLD}*" if result["name"] == entry["name"] else " "
+        hashrate = f"{result['hashrate']:.1f} H/s" if result["hashrate"] else f"{RED}failed{RESET}"
+        print(f"  {marker} {result['name']:<15}{RESET} {len(result['cpus']):>3} threads  {hashrate}")
+    print(f"{GREEN}Best: {entry['name']} on CPUs {','.join(map(str, entry['layout']))}.{RESET}")
+
+
+def run_autotune(config, force=False):
+    """Auto-tune the mining threads and print the comparison."""
+    entry = autotune(config, force=force)
+    if entry is not None:
+        print_autotune(entry)
+    return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pick the fastest xmrig thread layout for this CPU.")
+    parser.add_argument("--xmrig", default=XMRIG_PATH, help="xmrig binary to benchmark with")
+    parser.add_argument("--bench", default=BENCH_SIZE, help="hashes per benchmark run (e.g. 1M, 10M)")
+    parser.add_argument("--sysfs", default=SYSFS_ROOT, help="sysfs directory holding cpu/ and node/")
+    parser.add_argument("--force", action="store_true", help="re-run the benchmarks even if cached")
+    parser.add_argument("--dry-run", action="store_true", help="don't write the result to config.json")
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    if config is None:
+        return 1
+    entry = autotune(config, args.sysfs, args.xmrig, args.bench, args.force, apply=not args.dry_run)
+    if entry is None:
+        return 1
+    print_autotune(entry)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
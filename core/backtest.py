@@ -0,0 +1,275 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import product
+from core.pool_manager import pool_key
+from core.schedule_store import MINUTES_PER_DAY, ScheduleIndex, load_schedules
+from utils.helpers import BOLD, CYAN, RED, RESET, get_domain
+
+try:
+    import numpy as np
+except ImportError:  # Optional: only backtesting needs it
+    np = None
+
+NUMPY_MISSING = "Backtesting needs NumPy: pip install numpy"
+SWITCH_COST = 1  # Minutes of earnings lost reconnecting after a switch
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError(NUMPY_MISSING)
+
+
+def default_signal(earnings):
+    """What the ranking policy sees when no other signal is given: minutes per XMR (lower is better)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(earnings > 0, 1 / earnings, np.inf)
+
+
+def _fill_forward(choices):
+    """Replace -1 ("no decision") with the previous decision, starting from pool 0."""
+    index = np.where(choices >= 0, np.arange(len(choices)), 0)
+    np.maximum.accumulate(index, out=index)
+    filled = choices[index]
+    filled[filled < 0] = 0
+    return filled
+
+
+def schedule_choices(length, schedules, pools, start_minute=0):
+    """Pool index per minute under time-window schedules, like the scheduler applies them.
+
+    `schedules` are schedule entries (see make_schedule) whose keys identify
+    pools in `pools`; outside every window the last promoted pool stays on top.
+    """
+    index = ScheduleIndex(schedules)
+    columns = {pool_key({"url": pool}).split("|", 1)[0]: idx for idx, pool in enumerate(pools)}
+    owners = np.full(MINUTES_PER_DAY, -1)
+    for minute in range(MINUTES_PER_DAY):
+        sched = index.owner_at(minute)
+        if sched is not None:
+            owners[minute] = columns.get(sched["pool"].split("|", 1)[0], -1)
+    return _fill_forward(owners[(start_minute + np.arange(length)) % MINUTES_PER_DAY])
+
+
+def rank_choices(signal, hysteresis=0.0, cooldown=0, start_pool=0):
+    """Pool index per minute when the best-scoring pool is promoted, as rank_pools does.
+
+    The best pool (lowest signal) takes over when it beats the current one by
+    more than `hysteresis`, and never within `cooldown` minutes of the last
+    switch. A minute's signal is only known once it is over, so a decision on
+    it takes effect the next minute; minute 0 is mined on `start_pool`. For every pool, the first minute at or after each minute where it
+    would be overtaken is precomputed in one vectorized pass, so following the
+    policy costs O(1) per switch.
+    """
+    length, count = signal.shape
+    scores = np.where(np.isnan(signal), np.inf, signal)
+    best = np.argmin(scores, axis=1)
+    best_score = scores[np.arange(length), best]
+    steps = np.arange(length)
+    next_overtake = []
+    for pool in range(count):
+        current = scores[:, pool]
+        overtaken = np.where(np.isinf(current), ~np.isinf(best_score), best_score < current * (1 - hysteresis))
+        first = np.where(overtaken, steps, length)
+        next_overtake.append(np.minimum.accumulate(first[::-1])[::-1])
+    times, pools = [0], [start_pool]
+    now, pool = 0, start_pool
+    while True:
+        earliest = now + cooldown if len(times) > 1 else now
+        if earliest >= length:
+            break
+        switch_at = int(next_overtake[pool][earliest])
+        if switch_at >= length:
+            break
+        pool = int(best[switch_at])
+        times.append(switch_at)
+        pools.append(pool)
+        now = switch_at
+    decided = np.repeat(np.array(pools), np.diff(np.array(times + [length])))
+    return np.concatenate(([start_pool], decided[:-1]))[:length]
+
+
+def simulate(earnings, policy, signal=None, pools=None, start_minute=0):
+    """Replay a policy over per-minute earnings (rows: minutes, columns: pools).
+
+    Policies are dicts:
+      {"type": "static", "pool": 0}
+      {"type": "schedule", "schedules": [...]}  # make_schedule entries; needs `pools`
+      {"type": "rank", "hysteresis": 0.05, "cooldown": 30}  # uses `signal`, lower is better
+    Any policy may set "switch_cost" (minutes of earnings lost per switch).
+    Returns the switch count, minutes on each pool and total earnings.
+    """
+    _require_numpy()
+    earnings = np.asarray(earnings, dtype=float)
+    length, count = earnings.shape
+    kind = policy.get("type", "rank")
+    if kind == "static":
+        choices = np.full(length, policy.get("pool", 0))
+    elif kind == "schedule":
+        choices = schedule_choices(length, policy["schedules"], pools or [], start_minute)
+    elif kind == "rank":
+        signal = default_signal(earnings) if signal is None else np.asarray(signal, dtype=float)
+        choices = rank_choices(signal, policy.get("hysteresis", 0.0), policy.get("cooldown", 0))
+    else:
+        raise ValueError(f"Unknown policy type: {kind}")
+
+    realized = np.nan_to_num(earnings[np.arange(length), choices])
+    switches = np.flatnonzero(choices[1:] != choices[:-1]) + 1
+    cost = policy.get("switch_cost", SWITCH_COST)
+    lost = 0.0
+    if len(switches) and cost:
+        cumulative = np.concatenate(([0.0], np.cumsum(realized)))
+        lost = float((cumulative[np.minimum(switches + cost, length)] - cumulative[switches]).sum())
+    return {
+        "policy": policy,
+        "switches": int(len(switches)),
+        "minutes": np.bincount(choices, minlength=count).tolist(),
+        "earnings": float(realized.sum()) - lost,
+    }
+
+
+_worker_data = None
+
+
+def _init_worker(earnings, signal, pools, start_minute):
+    global _worker_data
+    _worker_data = (earnings, signal, pools, start_minute)
+
+
+def _simulate_in_worker(policy):
+    earnings, signal, pools, start_minute = _worker_data
+    return simulate(earnings, policy, signal, pools, start_minute)
+
+
+def sweep(earnings, base_policy, grid, signal=None, pools=None, start_minute=0, workers=None):
+    """Simulate every combination of `grid` ({param: [values]}) over `base_policy`, best first.
+
+    Runs on a process pool; the series are sent to each worker once, not per policy.
+    """
+    _require_numpy()
+    earnings = np.asarray(earnings, dtype=float)
+    if signal is None and base_policy.get("type", "rank") == "rank":
+        signal = default_signal(earnings)
+    names = sorted(grid)
+    policies = [dict(base_policy, **dict(zip(names, values))) for values in product(*(grid[name] for name in names))]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(policies)), initializer=_init_worker,
+                             initargs=(earnings, signal, pools, start_minute)) as executor:
+        results = list(executor.map(_simulate_in_worker, policies, chunksize=max(1, len(policies) // (4 * workers))))
+    return sorted(results, key=lambda result: result["earnings"], reverse=True)
+
+
+def load_csv(path):
+    """Read per-minute series: a `timestamp` column, then one column per pool URL.
+
+    Returns (pools, start timestamp, matrix); blank cells become NaN.
+    """
+    _require_numpy()
+    with open(path, "r", newline="") as file:
+        rows = list(csv.reader(file))
+    pools = rows[0][1:]
+    body = [row for row in rows[1:] if row]
+    matrix = np.array([[float(cell) if cell else np.nan for cell in row[1:]] for row in body], dtype=float)
+    return pools, float(body[0][0]) if body else time.time(), matrix
+
+
+def series_from_history(store, metric="accepted", days=30, now=None):
+    """Per-minute (pools, start timestamp, matrix) of `metric` from the history store.
+
+    Only pools that were actually mined have data; their gaps are filled
+    forward from their last value, and hourly rollups are spread evenly over
+    their minutes when the period is longer than the minute-level retention.
+    """
+    _require_numpy()
+    now = now if now is not None else time.time()
+    since = now - days * 86400
+    resolution = 60 if days <= 14 else 3600
+    rows = store.query(metric, since, now, resolution)
+    pools = sorted({pool for _, pool, *_ in rows if pool})
+    start = since - since % resolution
+    steps = int((now - start) // resolution) + 1
+    matrix = np.full((steps, len(pools)), np.nan)
+    column = {pool: idx for idx, pool in enumerate(pools)}
+    for bucket, pool, count, total, low, high in rows:
+        if pool in column:
+            matrix[int((bucket - start) // resolution), column[pool]] = total
+    for idx in range(len(pools)):
+        series = matrix[:, idx]
+        valid = np.where(~np.isnan(series), np.arange(steps), 0)
+        np.maximum.accumulate(valid, out=valid)
+        matrix[:, idx] = series[valid]  # Leading gaps stay NaN: series[0] is NaN there
+    if resolution != 60:
+        matrix = np.repeat(matrix / (resolution // 60), resolution // 60, axis=0)
+    return pools, start, matrix
+
+
+def print_results(results, pools, limit=10):
+    """Print simulation results, best first."""
+    print(f"\n{CYAN}Backtest results (best first):{RESET}")
+    for result in results[:limit]:
+        params = {name: value for name, value in result["policy"].items() if name not in ("type", "schedules")}
+        share = ", ".join(f"{get_domain(pool)} {minutes / max(1, sum(result['minutes'])):.0%}"
+                          for pool, minutes in zip(pools, result["minutes"]) if minutes)
+        print(f"  {BOLD}{result['policy'].get('type', 'rank')}{RESET} {params}  earnings {result['earnings']:.6g}"
+              f"  switches {result['switches']}  time: {share}")
+
+
+def _values(text):
+    return [float(value) for value in text.split(",")] if text else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay pool switching policies over recorded series.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="per-minute CSV: timestamp, then earnings per pool")
+    source.add_argument("--history-days", type=float, help="use this many days of history.db")
+    parser.add_argument("--metric", default="accepted", help="history metric to treat as earnings")
+    parser.add_argument("--policy", choices=("rank", "static", "schedules"), default="rank")
+    parser.add_argument("--hysteresis", type=float, default=0.0)
+    parser.add_argument("--cooldown", type=int, default=0, help="minutes between switches")
+    parser.add_argument("--switch-cost", type=int, default=SWITCH_COST, help="minutes lost per switch")
+    parser.add_argument("--sweep-hysteresis", help="comma-separated values to sweep")
+    parser.add_argument("--sweep-cooldown", help="comma-separated values to sweep")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print(f"{RED}{NUMPY_MISSING}{RESET}")
+        return 1
+    if args.csv:
+        pools, start, earnings = load_csv(args.csv)
+    else:
+        from core.history import history_store
+        pools, start, earnings = series_from_history(history_store(), args.metric, args.history_days)
+    if not pools or not len(earnings):
+        print(f"{RED}No data to backtest.{RESET}")
+        return 1
+    start_minute = datetime.fromtimestamp(start).hour * 60 + datetime.fromtimestamp(start).minute
+    if args.policy == "schedules":
+        policy = {"type": "schedule", "schedules": load_schedules()}
+    elif args.policy == "static":
+        policy = {"type": "static", "pool": 0}
+    else:
+        policy = {"type": "rank", "hysteresis": args.hysteresis, "cooldown": args.cooldown}
+    policy["switch_cost"] = args.switch_cost
+
+    print(f"{CYAN}Replaying {len(earnings)} minutes across {len(pools)} pools...{RESET}")
+    started = time.perf_counter()
+    grid = {name: values for name, values in (("hysteresis", _values(args.sweep_hysteresis)),
+                                              ("cooldown", [int(v) for v in _values(args.sweep_cooldown) or []]))
+            if values}
+    if grid:
+        results = sweep(earnings, policy, grid, pools=pools, start_minute=start_minute, workers=args.workers)
+    else:
+        results = [simulate(earnings, policy, pools=pools, start_minute=start_minute)]
+    print_results(results, pools)
+    print(f"{CYAN}{len(results)} simulation(s) in {time.perf_counter() - started:.2f}s.{RESET}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
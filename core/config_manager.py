@@ -1,20 +1,171 @@
+import atexit
 import json
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from utils.helpers import RED, RESET, GREEN
+from utils.metrics import counter, histogram
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
 
 # Path to config.json in the parent directory
 CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../config.json")
+SAVE_DEBOUNCE = 0.5  # Seconds to wait so bursts of changes become one write
+
+config_writes = counter("config_writes_total", "Config files rewritten, by file and outcome.", ("file", "result"))
+config_write_seconds = histogram("config_write_seconds", "Time to write and fsync a config file.", ("file",))
+
+
+def serialize_config(config):
+    """Serialize a configuration exactly as it is written to disk."""
+    return json.dumps(config, indent=4)
+
+
+class ConfigStore:
+    """Shared, thread- and process-safe access to a config.json file.
+
+    Reads are served from memory while the file's inode, mtime and size are
+    unchanged, and every caller gets the same dict, which is refreshed in place
+    when the file changes on disk. Writes are debounced so a burst of changes becomes a
+    single write, skipped when the content is unchanged, and done atomically
+    via a temporary file renamed over the original, so xmrig never reads a
+    half-written config.
+    """
+
+    def __init__(self, path, debounce=SAVE_DEBOUNCE):
+        self.path = os.path.abspath(path)
+        self.debounce = debounce
+        self.lock = threading.RLock()
+        self._config = None
+        self._stamp = None
+        self._written = None  # Serialized content last read from or written to disk
+        self._timer = None
+        self._lock_file = None
+        self._lock_depth = 0
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold an advisory lock on `<path>.lock` so other processes serialize with us."""
+        with self.lock:
+            if fcntl is not None and self._lock_depth == 0:
+                self._lock_file = open(self.path + ".lock", "a")
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_file is not None and self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Return the configuration, re-reading the file only if it changed. None if missing."""
+        with self.lock:
+            if self._timer is not None:
+                return self._config  # Unsaved changes are newer than the file
+            try:
+                stamp = self._file_stamp()
+            except FileNotFoundError:
+                return None
+            if self._config is not None and stamp == self._stamp:
+                return self._config
+            with self._file_lock():
+                with open(self.path, "r") as file:
+                    config = json.load(file)
+                stamp = self._file_stamp()
+            if self._config is None:
+                self._config = config
+            else:
+                self._config.clear()
+                self._config.update(config)
+            self._stamp = stamp
+            self._written = serialize_config(config)
+            return self._config
+
+    def save(self, config, delay=None):
+        """Queue `config` to be written after the debounce window (immediately if delay is 0)."""
+        with self.lock:
+            self._config = config
+            delay = self.debounce if delay is None else delay
+            if delay <= 0:
+                return self.flush()
+            if self._timer is None:
+                self._timer = threading.Timer(delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return True
+
+    def flush(self):
+        """Write any pending changes now. Returns True if the file was rewritten."""
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._config is None:
+                return False
+            content = serialize_config(self._config)
+            name = os.path.basename(self.path)
+            if content == self._written:
+                config_writes.inc(file=name, result="unchanged")
+                return False
+            with self._file_lock(), config_write_seconds.time(file=name):
+                self._write_atomic(content)
+                self._stamp = self._file_stamp()
+            config_writes.inc(file=name, result="written")
+            self._written = content
+            return True
+
+    def _write_atomic(self, content):
+        directory = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".config.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(content)
+                file.flush()
+                os.fsync(file.fileno())
+            if os.path.exists(self.path):
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def transaction(self):
+        """Read-modify-write under both locks, writing once when the block exits."""
+        with self._file_lock():
+            config = self.load()
+            yield config
+            if config is not None:
+                self.save(config, delay=0)
+
+
+config_store = ConfigStore(CONFIG_FILE)
+atexit.register(config_store.flush)
+
 
 def load_config():
     """Load the configuration from the config.json file."""
-    if not os.path.exists(CONFIG_FILE):
-        print(f"{RED}Error: config.json not found at {os.path.abspath(CONFIG_FILE)}.{RESET}")
-        return None
-    with open(CONFIG_FILE, "r") as file:
-        return json.load(file)
+    config = config_store.load()
+    if config is None:
+        print(f"{RED}Error: config.json not found at {config_store.path}.{RESET}")
+    return config
 
 def save_config(config):
     """Save the updated configuration to the config.json file."""
-    with open(CONFIG_FILE, "w") as file:
-        json.dump(config, file, indent=4)
-    print(f"{GREEN}Configuration saved to {os.path.abspath(CONFIG_FILE)}.{RESET}")
+    if config_store.save(config):
+        print(f"{GREEN}Configuration saved to {config_store.path}.{RESET}")
@@ -0,0 +1,53 @@
+import json
+import os
+import socket
+
+# Unix socket the daemon listens on, next to this project
+SOCKET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../switcher.sock")
+CONTROL_TIMEOUT = 5.0
+
+
+class ControlError(Exception):
+    """The daemon was unreachable or rejected a command."""
+
+
+class DaemonUnreachable(ControlError):
+    """Nothing accepted the connection, so the command was certainly not applied."""
+
+
+def send_command(command, socket_path=SOCKET_PATH, timeout=CONTROL_TIMEOUT, **args):
+    """Send one command to the daemon and return its result, raising ControlError on failure."""
+    request = (json.dumps({"command": command, "args": args}) + "\n").encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except OSError as e:
+            raise DaemonUnreachable(f"cannot reach the daemon at {os.path.abspath(socket_path)}: {e}")
+        try:
+            sock.sendall(request)
+            reply = b""
+            while not reply.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                reply += chunk
+        except OSError as e:
+            # Connected, so the command may have been applied: not safe to retry elsewhere
+            raise ControlError(f"no reply from the daemon: {e}")
+    try:
+        response = json.loads(reply)
+    except ValueError:
+        raise ControlError("malformed reply from the daemon")
+    if not response.get("ok"):
+        raise ControlError(response.get("error", "command failed"))
+    return response.get("result")
+
+
+def daemon_running(socket_path=SOCKET_PATH):
+    """Return True if a daemon answers on `socket_path`."""
+    try:
+        send_command("status", socket_path, timeout=1.0)
+        return True
+    except ControlError:
+        return False
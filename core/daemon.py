@@ -0,0 +1,320 @@
+import asyncio
+import inspect
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from core.config_manager import config_store, load_config
+from core.diff_tuner import TUNE_INTERVAL, DifficultyTuner
+from core.gossip import GossipNode
+from core.health_monitor import POLL_INTERVAL, HealthMonitor
+from core.history import start_recording
+from core.live_switch import LiveSwitcher
+from core.control_client import SOCKET_PATH
+from core.pool_manager import rank_pools, set_cpu_threads, set_pool_on_top
+from core.pool_prober import HYSTERESIS, PROBE_INTERVAL, PoolProber
+from core.stratum_proxy import StratumProxy
+from core.thermal_governor import GOVERNOR_INTERVAL, ThreadGovernor
+from core import scheduler
+from core.supervisor import ensure_attached, supervisor
+from utils.helpers import CYAN, GREEN, RED, RESET, get_domain
+from utils.metrics import gauge
+from utils.xmrig_api import XmrigApiError
+
+MAX_REQUEST = 64 * 1024  # Bytes; control requests are tiny
+
+xmrig_up = gauge("xmrig_up", "1 if the supervised xmrig is running.")
+
+
+class CommandError(Exception):
+    """A control command was malformed or could not be carried out."""
+
+
+class SwitcherDaemon:
+    """Headless pool switcher: scheduler, health probes and a Unix-socket JSON control API.
+
+    Every request is one JSON line, `{"command": "...", "args": {...}}`, answered
+    with `{"ok": true, "result": ...}` or `{"ok": false, "error": "..."}`.
+    Commands only touch in-memory state (config writes are debounced by the
+    ConfigStore), so they answer in milliseconds while probes are in flight.
+    """
+
+    def __init__(self, config, socket_path=SOCKET_PATH, probe_interval=PROBE_INTERVAL, auto_rank=False, failover=False,
+                 live=False, proxy=False, gossip=False, governor=False, tune_difficulty=False):
+        self.config = config
+        self.socket_path = os.path.abspath(socket_path)
+        self.probe_interval = probe_interval
+        self.auto_rank = auto_rank
+        self.health = None
+        if failover:
+            try:
+                self.health = HealthMonitor(config)
+            except XmrigApiError as e:
+                print(f"{RED}Health failover disabled: {e}{RESET}")
+        self.live = None
+        if live:
+            try:
+                self.live = LiveSwitcher(config)
+            except XmrigApiError as e:
+                print(f"{RED}Live switching disabled: {e}{RESET}")
+        self.governor = None
+        if governor:
+            try:
+                # With live switching on, its listener already pushes the governor's thread changes
+                self.governor = ThreadGovernor(config, push=self.live is None)
+            except XmrigApiError as e:
+                print(f"{RED}Thread governor disabled: {e}{RESET}")
+        self.tuner = None
+        if tune_difficulty:
+            try:
+                self.tuner = DifficultyTuner(config)
+            except XmrigApiError as e:
+                print(f"{RED}Difficulty tuning disabled: {e}{RESET}")
+        self.proxy = StratumProxy(config) if proxy else None
+        self.gossip = GossipNode(config) if gossip else None
+        self.prober = PoolProber()
+        self.started_at = time.time()
+        self._server = None
+        self._stopping = None
+        self.commands = {
+            "status": self.cmd_status,
+            "list_pools": self.cmd_list_pools,
+            "promote": self.cmd_promote,
+            "list_schedules": self.cmd_list_schedules,
+            "add_schedule": self.cmd_add_schedule,
+            "remove_schedule": self.cmd_remove_schedule,
+            "set_cores": self.cmd_set_cores,
+        }
+
+    # Control commands
+
+    def cmd_status(self):
+        active = scheduler.active_schedule()
+        pools = self.config.get("pools", [])
+        return {
+            "uptime": round(time.time() - self.started_at, 1),
+            "xmrig_running": supervisor.is_running(),
+            "xmrig_pid": supervisor.pid,
+            "xmrig_exit_codes": [code for _, code in supervisor.exit_codes],
+            "xmrig_start_error": supervisor.start_error,
+            "xmrig_crash_loop": supervisor.crash_loop,
+            "top_pool": pools[0].get("url") if pools else None,
+            "active_schedule": _schedule_info(active) if active else None,
+            "scheduler_lag_ms": round(scheduler.scheduler_lag[-1] * 1000, 1) if scheduler.scheduler_lag else None,
+            "threads": len(self.config.get("cpu", {}).get("threads", [])),
+            "health": None if self.health is None else {"problems": self.health.problems, "error": self.health.last_error},
+            "live": None if self.live is None else self.live.status(),
+            "proxy": None if self.proxy is None else self.proxy.status(),
+            "gossip": None if self.gossip is None else self.gossip.status(),
+            "governor": None if self.governor is None else self.governor.status(),
+            "difficulty": None if self.tuner is None else self.tuner.status(),
+        }
+
+    def cmd_list_pools(self):
+        result = []
+        for idx, pool in enumerate(self.config.get("pools", []), start=1):
+            stats = self.prober.stats_for(pool)
+            result.append({"index": idx, "url": pool.get("url"), "domain": get_domain(pool.get("url", "")),
+                           "tls": bool(pool.get("tls")), "p50_ms": stats.p50, "p95_ms": stats.p95,
+                           "loss": stats.loss if stats.samples else None})
+        return result
+
+    def cmd_promote(self, index):
+        pools = self.config.get("pools", [])
+        if not 1 <= _as_int(index, "index") <= len(pools):
+            raise CommandError(f"index must be between 1 and {len(pools)}")
+        set_pool_on_top(self.config, int(index))
+        return self.cmd_list_pools()
+
+    def cmd_list_schedules(self):
+        return [dict(_schedule_info(sched), number=idx) for idx, sched in enumerate(scheduler.schedules, start=1)]
+
+    def cmd_add_schedule(self, index, start_time, end_time):
+        try:
+            added = scheduler.schedule_pool(self.config, _as_int(index, "index"), start_time, end_time)
+        except ValueError:
+            raise CommandError("times must be HH:MM in 24-hour format")
+        if not added:
+            raise CommandError(f"index must be between 1 and {len(self.config.get('pools', []))}")
+        return self.cmd_list_schedules()
+
+    def cmd_remove_schedule(self, number):
+        if not scheduler.remove_schedule(_as_int(number, "number")):
+            raise CommandError(f"number must be between 1 and {len(scheduler.schedules)}")
+        return self.cmd_list_schedules()
+
+    def cmd_set_cores(self, cores):
+        try:
+            set_cpu_threads(self.config, _as_int(cores, "cores"))
+        except ValueError as e:
+            raise CommandError(str(e))
+        return {"threads": _as_int(cores, "cores")}
+
+    # Plumbing
+
+    def dispatch(self, request):
+        """Run one control request and build its response."""
+        try:
+            handler = self.commands.get(request.get("command"))
+            if handler is None:
+                raise CommandError(f"unknown command {request.get('command')!r}")
+            args = request.get("args") or {}
+            try:
+                inspect.signature(handler).bind(**args)
+            except TypeError:
+                raise CommandError(f"bad arguments for {request['command']}: {sorted(args)}")
+            return {"ok": True, "result": handler(**args)}
+        except CommandError as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:  # A bug in one handler mustn't take the connection or the daemon down
+            print(f"{RED}Control command {request.get('command')!r} failed: {e!r}{RESET}")
+            return {"ok": False, "error": f"{request.get('command')} failed: {e}"}
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError
+                except ValueError:
+                    response = {"ok": False, "error": "request must be a JSON object"}
+                else:
+                    response = self.dispatch(request)
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except (OSError, ValueError):  # ValueError: request line over MAX_REQUEST
+            pass
+        finally:
+            writer.close()
+
+    async def _probe_loop(self):
+        while True:
+            if self.gossip is not None:
+                await self.gossip.probe_round(self.prober, self.probe_interval)  # Skips pools a peer just probed
+            else:
+                await self.prober.probe_all(list(self.config.get("pools", [])))
+            if self.auto_rank:
+                # Failover, gossip or a control command may have reordered the pools during the round
+                rank_pools(self.config, self.prober.scores, HYSTERESIS)
+            await asyncio.sleep(self.probe_interval)
+
+    async def _health_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.health.step)
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _governor_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.governor.step)
+            await asyncio.sleep(GOVERNOR_INTERVAL)
+
+    async def _tune_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.tuner.step)
+            await asyncio.sleep(TUNE_INTERVAL)
+
+    async def _supervise_loop(self, interval=1.0):
+        # Liveness checks are O(1), so a crashed xmrig is noticed (and restarted) within a second
+        while True:
+            supervisor.check()
+            xmrig_up.set(1 if supervisor.is_running() else 0)
+            await asyncio.sleep(interval)
+
+    async def run(self):
+        """Serve the control socket and background tasks until stopped by a signal.
+
+        Returns False without starting if another daemon answers on the socket.
+        """
+        if os.path.exists(self.socket_path):
+            if _socket_in_use(self.socket_path):
+                print(f"{RED}Another daemon is already listening on {self.socket_path}; not starting.{RESET}")
+                return False
+            os.unlink(self.socket_path)  # Stale socket from an earlier run
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+        self._server = await asyncio.start_unix_server(self._handle_client, self.socket_path, limit=MAX_REQUEST)
+        os.chmod(self.socket_path, 0o600)
+        await asyncio.get_running_loop().run_in_executor(None, ensure_attached)
+        recording = start_recording()
+        live_stop = threading.Event()
+        if self.live is not None:
+            self.live.start_background(live_stop)
+        if self.proxy is not None:
+            await self.proxy.start()
+        if self.gossip is not None:
+            await self.gossip.start()
+        tasks = [asyncio.create_task(scheduler.run_scheduler_async()), asyncio.create_task(self._probe_loop()),
+                 asyncio.create_task(self._supervise_loop())]
+        if self.health is not None:
+            tasks.append(asyncio.create_task(self._health_loop()))
+        if self.governor is not None:
+            tasks.append(asyncio.create_task(self._governor_loop()))
+        if self.tuner is not None:
+            tasks.append(asyncio.create_task(self._tune_loop()))
+        print(f"{GREEN}Pool switcher daemon listening on {self.socket_path}.{RESET}")
+        try:
+            await self._stopping.wait()
+        finally:
+            recording.set()
+            live_stop.set()
+            for task in tasks:
+                task.cancel()
+            if self.proxy is not None:
+                await self.proxy.stop()
+            if self.gossip is not None:
+                self.gossip.stop()
+            self._server.close()
+            await self._server.wait_closed()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            config_store.flush()
+            print(f"{CYAN}Pool switcher daemon stopped.{RESET}")
+        return True
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+
+def _socket_in_use(path):
+    """Return True if something accepts connections on the Unix socket at `path`."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(1.0)
+        try:
+            sock.connect(path)
+            return True
+        except OSError:
+            return False
+
+
+def _as_int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise CommandError(f"{name} must be a number")
+
+
+def _schedule_info(sched):
+    return {"pool": sched["pool"], "start_time": sched["start_time"], "end_time": sched["end_time"]}
+
+
+def run_daemon(socket_path=SOCKET_PATH, probe_interval=PROBE_INTERVAL, auto_rank=False, failover=False, live=False,
+               proxy=False, gossip=False, governor=False, tune_difficulty=False):
+    """Run the switcher headless (e.g. under systemd) until SIGINT/SIGTERM."""
+    config = load_config()
+    if config is None:
+        print(f"{RED}Daemon not started: no configuration.{RESET}")
+        return False
+    return asyncio.run(SwitcherDaemon(config, socket_path, probe_interval, auto_rank, failover, live, proxy, gossip,
+                                     governor, tune_difficulty).run())
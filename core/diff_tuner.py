@@ -0,0 +1,238 @@
+import argparse
+import re
+import sys
+import threading
+from core.config_manager import config_store, load_config
+from core.pool_manager import set_pool_users
+from utils.helpers import BOLD, CYAN, GREEN, ORANGE, RED, RESET, get_domain, parse_pool_url
+from utils.metrics import counter
+from utils.xmrig_api import XmrigApi, XmrigApiError
+
+TARGET_SHARE_INTERVAL = 30  # Seconds between shares the difficulty is tuned for
+DRIFT = 0.25  # Re-tune when the hashrate moves 25% away from what the difficulty was tuned for
+TUNE_INTERVAL = 60  # Seconds between hashrate checks
+
+# Pool software -> (separator between user and difficulty, lowest and highest fixed difficulty accepted)
+DIFFICULTY_ADAPTERS = {
+    "nodejs-pool": ("+", 1000, None),
+    "cryptonote-nodejs-pool": ("+", 1000, None),
+    "p2pool": ("+", 1000, None),
+}
+
+# Pool host or domain -> pool software; pools not listed (e.g. nanopool) keep vardiff
+POOL_DIFFICULTY = {
+    "supportxmr.com": "nodejs-pool",
+    "moneroocean.stream": "nodejs-pool",
+    "monerohash.com": "nodejs-pool",
+    "c3pool.com": "nodejs-pool",
+    "herominers.com": "cryptonote-nodejs-pool",
+}
+
+difficulty_tunes = counter("difficulty_tunes_total", "Pool users rewritten with a new fixed difficulty.", ("pool",))
+
+
+def register_pool_difficulty(host, adapter_name):
+    """Tell the tuner which fixed-difficulty syntax the pool at `host` (or its domain) uses, e.g. a local p2pool."""
+    if adapter_name not in DIFFICULTY_ADAPTERS:
+        raise ValueError(f"Unknown difficulty adapter: {adapter_name}")
+    POOL_DIFFICULTY[host] = adapter_name
+
+
+def difficulty_adapter(pool):
+    """(separator, minimum, maximum) for the pool's fixed-difficulty syntax, or None if it has none."""
+    try:
+        host, _ = parse_pool_url(pool.get("url", ""))
+    except ValueError:
+        return None
+    name = POOL_DIFFICULTY.get(host.lower()) or POOL_DIFFICULTY.get(get_domain(host.lower()))
+    return DIFFICULTY_ADAPTERS[name] if name else None
+
+
+def split_difficulty(pool):
+    """(user without the fixed-difficulty suffix, the difficulty or None)."""
+    user = pool.get("user", "")
+    adapter = difficulty_adapter(pool)
+    if adapter is None:
+        return user, None
+    match = re.search(re.escape(adapter[0]) + r"(\d+)$", user)
+    if match is None:
+        return user, None
+    return user[:match.start()], int(match.group(1))
+
+
+def base_user(pool):
+    """The pool's user without a fixed difficulty, as pool_key identifies it."""
+    return split_difficulty(pool)[0]
+
+
+def optimal_difficulty(hashrate, interval=TARGET_SHARE_INTERVAL, adapter=None):
+    """Fixed difficulty giving one share per `interval` seconds at `hashrate` H/s.
+
+    A share takes `difficulty` hashes on average. The result keeps two
+    significant digits, so small hashrate changes don't produce a new value,
+    and is clamped to the adapter's limits.
+    """
+    difficulty = int(float(f"{hashrate * interval:.2g}"))
+    if adapter is not None:
+        _, lowest, highest = adapter
+        difficulty = max(difficulty, lowest) if lowest else difficulty
+        difficulty = min(difficulty, highest) if highest else difficulty
+    return max(1, difficulty)
+
+
+def rig_hashrate(api):
+    """The rig's hashrate from xmrig's API: the 15-minute average, else the 60s, else the 10s one."""
+    total = ((api.summary() or {}).get("hashrate") or {}).get("total") or []
+    for value in reversed(total):
+        if value:
+            return float(value)
+    return None
+
+
+def plan_difficulties(config, hashrate, interval=TARGET_SHARE_INTERVAL):
+    """{pool index: (old user, new user)} for the pools whose user would change; None clears the suffix."""
+    changes = {}
+    for idx, pool in enumerate(config.get("pools", []), start=1):
+        adapter = difficulty_adapter(pool)
+        if adapter is None:
+            continue
+        user, _ = split_difficulty(pool)
+        new = user if hashrate is None else f"{user}{adapter[0]}{optimal_difficulty(hashrate, interval, adapter)}"
+        if new != pool.get("user", ""):
+            changes[idx] = (pool.get("user", ""), new)
+    return changes
+
+
+class DifficultyTuner:
+    """Keep each pool's fixed difficulty matched to the rig's hashrate.
+
+    The difficulty goes into each pool's user in that pool's own syntax
+    (see DIFFICULTY_ADAPTERS), so a freshly promoted pool sends shares at the
+    target interval from the first job instead of waiting for vardiff to
+    converge. Users are only rewritten when the hashrate has drifted more
+    than `drift` from the one the current difficulties were tuned for.
+    """
+
+    def __init__(self, config, api=None, interval=TARGET_SHARE_INTERVAL, drift=DRIFT):
+        self.config = config
+        self.api = api or XmrigApi.from_config(config)
+        self.interval = interval
+        self.drift = drift
+        self.tuned_for = self._current_hashrate()
+        self.last_error = None
+
+    def _current_hashrate(self):
+        """The hashrate the difficulty in the top tunable pool's user was tuned for, if that can be told.
+
+        A difficulty at the adapter's limit was clamped, and any hashrate past
+        the limit gives it, so it tells nothing and the first step re-tunes.
+        """
+        for pool in self.config.get("pools", []):
+            _, difficulty = split_difficulty(pool)
+            if difficulty is not None:
+                _, lowest, highest = difficulty_adapter(pool)
+                if difficulty in (lowest, highest):
+                    return None
+                return difficulty / self.interval
+        return None
+
+    def drifted(self, hashrate):
+        return self.tuned_for is None or abs(hashrate - self.tuned_for) > self.drift * self.tuned_for
+
+    def tune(self, hashrate):
+        """Rewrite the pools' users for `hashrate` H/s. Returns {pool index: (old user, new user)}."""
+        with config_store.lock:
+            changes = plan_difficulties(self.config, hashrate, self.interval)
+            domains = {idx: get_domain(self.config["pools"][idx - 1].get("url", "")) for idx in changes}
+        changed = set_pool_users(self.config, changes, cause="difficulty")  # Listeners hear about it once
+        for idx in changed:
+            difficulty_tunes.inc(pool=domains[idx])
+        self.tuned_for = hashrate
+        return {idx: changes[idx] for idx in changed}
+
+    def step(self):
+        """Check the hashrate once and re-tune if it drifted. Returns the changes made."""
+        try:
+            hashrate = rig_hashrate(self.api)
+        except XmrigApiError as e:
+            self.last_error = str(e)
+            return {}
+        self.last_error = None
+        if not hashrate or not self.drifted(hashrate):
+            return {}
+        changes = self.tune(hashrate)
+        if changes:
+            print(f"{CYAN}Difficulty re-tuned for {hashrate:.0f} H/s "
+                  f"({optimal_difficulty(hashrate, self.interval)} per share, one every {self.interval:.0f}s).{RESET}")
+        return changes
+
+    def run(self, interval=TUNE_INTERVAL, stop_event=None):
+        """Check every `interval` seconds until `stop_event` is set."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.step()
+            stop_event.wait(interval)
+
+    def status(self):
+        return {"tuned_for": self.tuned_for, "interval": self.interval, "error": self.last_error}
+
+
+def print_plan(config, changes):
+    """Print every pool's difficulty syntax and the user it gets."""
+    print(f"\n{CYAN}Fixed difficulty per pool:{RESET}")
+    for idx, pool in enumerate(config.get("pools", []), start=1):
+        domain = get_domain(pool.get("url", ""))
+        if difficulty_adapter(pool) is None:
+            print(f"  {BOLD}{idx}. {domain}{RESET}  {ORANGE}no known fixed-difficulty syntax; vardiff{RESET}")
+        elif idx in changes:
+            print(f"  {BOLD}{idx}. {domain}{RESET}  {changes[idx][0]} -> {GREEN}{changes[idx][1]}{RESET}")
+        else:
+            difficulty = split_difficulty(pool)[1]
+            print(f"  {BOLD}{idx}. {domain}{RESET}  {difficulty or 'vardiff'} (unchanged)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Set each pool's fixed difficulty from the rig's hashrate.")
+    parser.add_argument("--hashrate", type=float, help="H/s to tune for (default: measured by xmrig's API)")
+    parser.add_argument("--interval", type=float, default=TARGET_SHARE_INTERVAL, help="target seconds between shares")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--watch", action="store_true", help="keep re-tuning when the hashrate drifts")
+    mode.add_argument("--clear", action="store_true", help="remove the fixed difficulties (back to vardiff)")
+    parser.add_argument("--dry-run", action="store_true", help="only show the new users")
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    if config is None:
+        return 1
+    hashrate = args.hashrate
+    if args.watch or (hashrate is None and not args.clear):
+        try:
+            tuner = DifficultyTuner(config, interval=args.interval)
+            hashrate = hashrate or rig_hashrate(tuner.api)
+        except XmrigApiError as e:
+            print(f"{RED}{e}; pass --hashrate instead.{RESET}")
+            return 1
+        if hashrate is None:
+            print(f"{RED}xmrig reports no hashrate yet; pass --hashrate instead.{RESET}")
+            return 1
+    changes = plan_difficulties(config, None if args.clear else hashrate, args.interval)
+    if not args.clear:
+        print(f"{CYAN}Tuning for {hashrate:.0f} H/s, one share every {args.interval:.0f}s.{RESET}")
+    print_plan(config, changes)
+    if args.dry_run:
+        return 0
+    try:
+        set_pool_users(config, changes, cause="difficulty")
+        if args.watch:
+            tuner.tuned_for = hashrate
+            print(f"{CYAN}Re-tuning when the hashrate moves more than {DRIFT:.0%}...{RESET}")
+            tuner.run()
+    except KeyboardInterrupt:
+        print(f"\n{CYAN}Difficulty tuner stopped.{RESET}")
+    finally:
+        config_store.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
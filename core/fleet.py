@@ -0,0 +1,160 @@
+import argparse
+import copy
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core.config_manager import ConfigStore, serialize_config
+from core.pool_manager import cpu_section, pool_key
+from utils.helpers import BOLD, CYAN, GREEN, ORANGE, RED, RESET, get_domain
+
+FLEET_WORKERS = 32  # Config files processed in parallel; mostly waiting on (network) disks
+
+
+def load_inventory(path):
+    """Read an inventory of rig configs: one config.json path, directory or glob per line.
+
+    Directories mean `<dir>/config.json`; blank lines and `#` comments are ignored.
+    """
+    paths = []
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r") as file:
+        for line in file:
+            entry = line.split("#", 1)[0].strip()
+            if not entry:
+                continue
+            entry = os.path.join(base, os.path.expanduser(entry))
+            for match in sorted(glob.glob(entry)) or [entry]:
+                if os.path.isdir(match):
+                    match = os.path.join(match, "config.json")
+                paths.append(os.path.abspath(match))
+    return list(dict.fromkeys(paths))  # Drop duplicates, keep order
+
+
+def match_pool(pools, ref):
+    """Return the 1-based index of the pool matching `ref` (identity key, URL or domain), or None."""
+    for idx, pool in enumerate(pools, start=1):
+        key = pool_key(pool)
+        if ref in (key, key.split("|", 1)[0], pool.get("url"), get_domain(pool.get("url", ""))):
+            return idx
+    return None
+
+
+def promote(ref):
+    """Operation: move the pool matching `ref` to the top (a no-op where it already is)."""
+    def operation(config):
+        pools = config.get("pools", [])
+        idx = match_pool(pools, ref)
+        if idx is None:
+            raise LookupError(f"no pool matching {ref}")
+        pools.insert(0, pools.pop(idx - 1))
+    operation.description = f"promote {ref}"
+    return operation
+
+
+def set_cores(cores):
+    """Operation: mine with `cores` threads pinned to CPUs 0..cores-1."""
+    def operation(config):
+        config["cpu"] = cpu_section(cores)
+    operation.description = f"use {cores} cores"
+    return operation
+
+
+def apply_schedules():
+    """Operation: promote the pool owning the current schedule window, if any."""
+    from core.scheduler import active_schedule
+    sched = active_schedule()
+
+    def operation(config):
+        if sched is not None:
+            promote(sched["pool"])(config)
+    operation.description = f"apply schedule for {sched['pool'].split('|', 1)[0]}" if sched else "apply schedules (none active)"
+    return operation
+
+
+def _changed_sections(before, after):
+    return sorted(key for key in set(before) | set(after) if before.get(key) != after.get(key))
+
+
+def apply_to_rig(path, operations, dry_run=False):
+    """Apply operations to one rig's config; it is only rewritten if something changed."""
+    result = {"path": path, "status": "unchanged", "changed": [], "error": None}
+    store = ConfigStore(path, debounce=0)
+    try:
+        if not store.exists():
+            raise FileNotFoundError(f"config.json not found at {path}")
+        if dry_run:
+            before = store.load()
+            config = copy.deepcopy(before)
+            for operation in operations:
+                operation(config)
+        else:
+            with store.transaction() as config:
+                before = copy.deepcopy(config)
+                for operation in operations:
+                    operation(config)
+        if serialize_config(before) != serialize_config(config):
+            result["status"] = "changed"
+            result["changed"] = _changed_sections(before, config)
+    except (OSError, ValueError, LookupError) as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    return result
+
+
+def apply_to_fleet(paths, operations, dry_run=False, workers=FLEET_WORKERS):
+    """Apply operations to every rig config in parallel and return a result per rig, in order."""
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        return list(executor.map(lambda path: apply_to_rig(path, operations, dry_run), paths))
+
+
+def print_fleet_report(results, elapsed=None, verbose=False):
+    """Summarize a fleet run, listing every failure (and every change if verbose)."""
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("changed", "unchanged", "failed")}
+    timing = f" in {elapsed:.2f}s" if elapsed is not None else ""
+    print(f"{CYAN}Fleet: {len(results)} rigs{timing} - {GREEN}{counts['changed']} changed{RESET}, "
+          f"{counts['unchanged']} unchanged, {RED if counts['failed'] else ''}{counts['failed']} failed{RESET}")
+    for r in results:
+        if r["status"] == "failed":
+            print(f"  {RED}FAILED{RESET} {r['path']}: {r['error']}")
+        elif verbose and r["status"] == "changed":
+            print(f"  {BOLD}changed{RESET} {r['path']}: {', '.join(r['changed'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply pool order, schedules and core settings to many rigs.")
+    parser.add_argument("inventory", help="file listing config.json paths, directories or globs")
+    parser.add_argument("--promote", metavar="POOL", help="pool URL, domain or identity to move to the top")
+    parser.add_argument("--apply-schedules", action="store_true", help="promote the pool of the active schedule")
+    parser.add_argument("--cores", type=int, help="number of mining threads")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--workers", type=int, default=FLEET_WORKERS)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    operations = []
+    if args.promote:
+        operations.append(promote(args.promote))
+    if args.apply_schedules:
+        operations.append(apply_schedules())
+    if args.cores is not None:
+        if args.cores < 1:
+            parser.error("--cores must be at least 1")
+        operations.append(set_cores(args.cores))
+    if not operations:
+        parser.error("nothing to do: give --promote, --apply-schedules and/or --cores")
+
+    paths = load_inventory(args.inventory)
+    print(f"{ORANGE}{'Checking' if args.dry_run else 'Applying'} "
+          f"{'; '.join(op.description for op in operations)} on {len(paths)} rigs...{RESET}")
+    started = time.perf_counter()
+    results = apply_to_fleet(paths, operations, args.dry_run, args.workers)
+    print_fleet_report(results, time.perf_counter() - started, args.verbose)
+    return 1 if any(r["status"] == "failed" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
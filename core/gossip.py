@@ -0,0 +1,366 @@
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import random
+import socket
+import sys
+import time
+from core.config_manager import load_config
+from core.pool_manager import set_pool_on_top
+from core.pool_prober import PROBE_INTERVAL, PoolProber
+from utils.helpers import BOLD, CYAN, GREEN, ORANGE, RED, RESET, parse_pool_url
+from utils.metrics import counter, gauge
+
+GOSSIP_GROUP = "239.255.77.77"  # Site-local multicast group; a broadcast address works too
+GOSSIP_PORT = 47777
+GOSSIP_INTERFACE = "0.0.0.0"  # Let the kernel pick; 127.0.0.1 keeps tests on one host
+GOSSIP_INTERVAL = 5.0  # Seconds between digests; a pool going down is sent at once
+STALE_AFTER = 60  # Seconds after which a node's snapshot no longer counts
+DOWN_AFTER = 3  # Consecutive failed probes before a node reports a pool down
+MAX_DATAGRAM = 1400  # Bytes; digests are split so none is fragmented
+PROTOCOL = 1
+
+gossip_datagrams = counter("gossip_datagrams_total", "Gossip datagrams, by direction.", ("direction",))
+gossip_peers = gauge("gossip_peers", "Switcher instances heard from within STALE_AFTER.")
+gossip_skipped_probes = counter("gossip_skipped_probes_total", "Pool probes skipped because a peer just probed the pool.")
+
+
+def endpoint(pool):
+    """What gossip calls a pool: the host and port probed, so regional mirrors of one pool are told apart."""
+    url = pool.get("url", "")
+    try:
+        host, port = parse_pool_url(url)
+    except ValueError:
+        return url
+    return f"{host.lower()}:{port}"
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def valid_snapshot(snapshot):
+    """True if `snapshot` is shaped like the ones observe() writes; peers' datagrams are checked before merging."""
+    if not isinstance(snapshot, dict) or type(snapshot.get("v")) is not int or not _number(snapshot.get("t")):
+        return False
+    pools = snapshot.get("pools")
+    return isinstance(pools, dict) and all(
+        isinstance(entry, list) and len(entry) == 4 and (entry[0] is None or _number(entry[0]))
+        and type(entry[1]) is int and (entry[2] is None or _number(entry[2])) and _number(entry[3])
+        for entry in pools.values())
+
+
+class HealthTable:
+    """Every node's latest view of the pools, merged by version vector.
+
+    Each node only ever writes its own snapshot, {"v", "t", "pools"}, whose
+    version grows with every probe round (it starts from the clock, so it keeps
+    growing across restarts). Merging keeps the highest version per node, so
+    all nodes converge on the same table whatever order, duplication or loss
+    digests see. "pools" maps an endpoint to [RTT in ms or None, consecutive
+    failures, last time it answered or None, time of the last probe].
+    """
+
+    def __init__(self, node_id, clock=time.time):
+        self.node_id = node_id
+        self.clock = clock
+        self.snapshots = {}  # Node id -> snapshot
+        self._version = int(clock() * 1000)
+
+    @property
+    def own(self):
+        return self.snapshots.get(self.node_id)
+
+    def observe(self, results):
+        """Record a probe round, {endpoint: RTT in ms or None}. Returns the endpoints that just went down."""
+        now = self.clock()
+        pools = dict((self.own or {}).get("pools", {}))
+        went_down = []
+        for key, rtt in results.items():
+            _, failures, good, _ = pools.get(key, (None, 0, None, None))
+            failures = 0 if rtt is not None else failures + 1
+            pools[key] = [None if rtt is None else round(rtt, 1), failures, now if rtt is not None else good, now]
+            if failures == DOWN_AFTER:
+                went_down.append(key)
+        self._version += 1
+        self.snapshots[self.node_id] = {"v": self._version, "t": now, "pools": pools}
+        return went_down
+
+    def vector(self):
+        """Highest snapshot version held per node."""
+        return {node: snapshot["v"] for node, snapshot in self.snapshots.items()}
+
+    def merge(self, snapshots):
+        """Take any snapshots newer than ours, dropping malformed ones. Returns the node ids that changed."""
+        changed = []
+        for node, snapshot in snapshots.items():
+            if node == self.node_id or not valid_snapshot(snapshot):
+                continue  # Our own, echoed back by a peer (ours is always at least as new), or garbage
+            current = self.snapshots.get(node)
+            if current is None or snapshot["v"] > current["v"]:
+                self.snapshots[node] = snapshot
+                changed.append(node)
+        return changed
+
+    def missing_from(self, vector):
+        """Node ids whose snapshot we hold in a newer version than `vector` does."""
+        return [node for node, snapshot in self.snapshots.items() if snapshot["v"] > vector.get(node, 0)]
+
+    def fresh(self, now=None):
+        now = self.clock() if now is None else now
+        return {node: snapshot for node, snapshot in self.snapshots.items() if now - snapshot["t"] < STALE_AFTER}
+
+    def view(self, key, now=None):
+        """Fleet-wide health of an endpoint from the probes of the last STALE_AFTER seconds.
+
+        It is down when some node has failed DOWN_AFTER probes in a row and no
+        node has seen it answer since that node's last probe.
+        """
+        now = self.clock() if now is None else now
+        reports = [snapshot["pools"][key] for snapshot in self.snapshots.values()
+                   if key in snapshot["pools"] and now - snapshot["pools"][key][3] < STALE_AFTER]
+        if not reports:
+            return None
+        good = max((entry[2] for entry in reports if entry[2] is not None), default=None)
+        down_since = max((entry[3] for entry in reports if entry[1] >= DOWN_AFTER), default=None)
+        latencies = sorted(entry[0] for entry in reports if entry[0] is not None)
+        return {
+            "down": down_since is not None and (good is None or down_since > good),
+            "p50": latencies[len(latencies) // 2] if latencies else None,
+            "nodes": len(reports),
+            "good": good,
+        }
+
+    def peer_probe(self, key, max_age, now=None):
+        """A peer's entry for `key` probed in the last `max_age` seconds, or None."""
+        now = self.clock() if now is None else now
+        for node, snapshot in self.snapshots.items():
+            entry = snapshot["pools"].get(key)
+            if node != self.node_id and entry is not None and now - entry[3] < max_age:
+                return entry
+        return None
+
+
+def gossip_socket(group=GOSSIP_GROUP, port=GOSSIP_PORT, interface=GOSSIP_INTERFACE):
+    """UDP socket joined to `group` (or allowed to broadcast to it); several can share a port on one host."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(("", port))
+    if ipaddress.ip_address(group).is_multicast:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)  # Never leaves the LAN
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)  # Other instances on this host
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, socket.inet_aton(group) + socket.inet_aton(interface))
+    else:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.setblocking(False)
+    return sock
+
+
+class GossipNode(asyncio.DatagramProtocol):
+    """Share pool health with the other switchers on the LAN and act on the merged view.
+
+    Every digest carries the sender's version vector and its own snapshot;
+    a peer that is behind on some node gets that node's snapshot in our next
+    digest, so late joiners and lost datagrams catch up. When the merged view
+    says the top pool is down, the first pool that isn't is promoted, so one
+    node's detection moves the whole fleet within a digest or two.
+    """
+
+    def __init__(self, config, group=GOSSIP_GROUP, port=GOSSIP_PORT, interface=GOSSIP_INTERFACE,
+                 node_id=None, interval=GOSSIP_INTERVAL, failover=True):
+        self.config = config
+        self.group = group
+        self.port = port
+        self.interface = interface
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}-{random.getrandbits(16):04x}"
+        self.interval = interval
+        self.failover = failover
+        self.table = HealthTable(self.node_id)
+        self.transport = None
+        self._due = set()  # Nodes whose snapshots peers are missing
+        self._borrowed = {}  # Endpoint -> probe time of the peer result last recorded for it
+        self._wakeup = None
+        self._task = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await loop.create_datagram_endpoint(lambda: self, sock=gossip_socket(self.group, self.port, self.interface))
+        self._task = asyncio.create_task(self._gossip_loop())
+        return self
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self.transport is not None:
+            self.transport.close()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            message = json.loads(data)
+            if message.get("proto") != PROTOCOL or message.get("from") == self.node_id:
+                return
+            snapshots, vector = message.get("snap") or {}, message.get("vv") or {}
+        except (ValueError, AttributeError):
+            return
+        if not isinstance(snapshots, dict) or not isinstance(vector, dict):
+            return
+        vector = {node: version for node, version in vector.items() if type(version) is int}
+        gossip_datagrams.inc(direction="in")
+        if self.table.merge(snapshots):
+            gossip_peers.set(len([node for node in self.table.fresh() if node != self.node_id]))
+            self.react()
+        behind = self.table.missing_from(vector)
+        if behind:
+            self._due.update(behind)
+            self._wakeup.set()
+
+    def publish(self, results):
+        """Record one probe round, {endpoint: RTT in ms or None}; a pool going down is gossiped at once."""
+        if self.table.observe(results):
+            self._wakeup.set()
+        self._due.add(self.node_id)
+        self.react()
+
+    def react(self):
+        """Promote the first pool the fleet doesn't consider down if the top one is."""
+        pools = self.config.get("pools", [])
+        if not self.failover or not pools:
+            return False
+        view = self.table.view(endpoint(pools[0]))
+        if view is None or not view["down"]:
+            return False
+        for idx, pool in enumerate(pools[1:], start=2):
+            other = self.table.view(endpoint(pool))
+            if pool.get("enabled") is not False and not (other and other["down"]):
+                print(f"{ORANGE}Gossip: {endpoint(pools[0])} is down across {view['nodes']} node(s); "
+                      f"promoting {endpoint(pool)}.{RESET}")
+                return set_pool_on_top(self.config, idx, cause="gossip")
+        return False
+
+    def digests(self):
+        """The datagrams to send now: our version vector plus every snapshot due, split to fit MAX_DATAGRAM."""
+        vector = self.table.vector()
+        due = [node for node in ({self.node_id} | self._due) if node in self.table.snapshots]
+        self._due.clear()
+        datagrams, batch = [], {}
+        for node in due:
+            candidate = dict(batch, **{node: self.table.snapshots[node]})
+            data = json.dumps({"proto": PROTOCOL, "from": self.node_id, "vv": vector, "snap": candidate},
+                              separators=(",", ":")).encode()
+            if len(data) > MAX_DATAGRAM and batch:
+                datagrams.append(json.dumps({"proto": PROTOCOL, "from": self.node_id, "vv": vector, "snap": batch},
+                                            separators=(",", ":")).encode())
+                batch = {node: self.table.snapshots[node]}
+            else:
+                batch = candidate
+        datagrams.append(json.dumps({"proto": PROTOCOL, "from": self.node_id, "vv": vector, "snap": batch},
+                                    separators=(",", ":")).encode())
+        return datagrams
+
+    def send(self):
+        for data in self.digests():
+            try:
+                self.transport.sendto(data, (self.group, self.port))
+                gossip_datagrams.inc(direction="out")
+            except OSError:
+                pass  # No route to the group yet (e.g. interface down); the next round retries
+
+    async def _gossip_loop(self):
+        while True:
+            try:
+                # Jitter keeps a fleet started together from sending in lockstep
+                await asyncio.wait_for(self._wakeup.wait(), self.interval * random.uniform(0.8, 1.2))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self.send()
+
+    async def probe_round(self, prober, max_age=None):
+        """Probe the pools no peer probed in the last `max_age` seconds (reusing peers' results), then publish.
+
+        A peer's result is recorded in the prober's stats once, however many
+        rounds it stays within `max_age`.
+        """
+        max_age = self.interval if max_age is None else max_age
+        pools = self.config.get("pools", [])
+        own, borrowed = [], {}
+        for pool in pools:
+            key = endpoint(pool)
+            peer = self.table.peer_probe(key, max_age)
+            if peer is None:
+                own.append(pool)
+                continue
+            borrowed[key] = peer[0]
+            gossip_skipped_probes.inc()
+            if self._borrowed.get(key) != peer[3]:
+                self._borrowed[key] = peer[3]
+                prober.stats_for(pool).record(peer[0])
+        results = await prober.probe_all(own) if own else []
+        self.publish({endpoint(pool): rtt for pool, rtt in zip(own, results)})
+        return borrowed
+
+    def status(self):
+        pools = self.config.get("pools", [])
+        down = [endpoint(pool) for pool in pools if (self.table.view(endpoint(pool)) or {}).get("down")]
+        peers = [node for node in self.table.fresh() if node != self.node_id]
+        return {"node": self.node_id, "peers": len(peers), "down": down}
+
+
+def print_view(node):
+    """Print the merged fleet view of every configured pool."""
+    print(f"\n{CYAN}Fleet view from {node.node_id} ({len(node.table.fresh())} node(s)):{RESET}")
+    for idx, pool in enumerate(node.config.get("pools", []), start=1):
+        view = node.table.view(endpoint(pool))
+        if view is None:
+            print(f"  {BOLD}{idx}. {endpoint(pool)}{RESET}  no reports")
+            continue
+        state = f"{RED}down{RESET}" if view["down"] else f"{GREEN}up{RESET}"
+        p50 = f"{view['p50']:.1f} ms" if view["p50"] is not None else "n/a"
+        print(f"  {BOLD}{idx}. {endpoint(pool)}{RESET}  {state}  p50 {p50}  reported by {view['nodes']}")
+
+
+async def _run(config, args):
+    node = await GossipNode(config, args.group, args.port, args.interface, failover=not args.no_failover).start()
+    prober = PoolProber()
+    print(f"{CYAN}Gossiping on {args.group}:{args.port} as {node.node_id}.{RESET}")
+    try:
+        while True:
+            if not args.listen_only:
+                await node.probe_round(prober, args.probe_interval)
+            print_view(node)
+            await asyncio.sleep(args.probe_interval * random.uniform(0.8, 1.2))
+    finally:
+        node.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Share pool health with other switchers on the LAN.")
+    parser.add_argument("--group", default=GOSSIP_GROUP, help="multicast group or broadcast address")
+    parser.add_argument("--port", type=int, default=GOSSIP_PORT)
+    parser.add_argument("--interface", default=GOSSIP_INTERFACE, help="local address to send and join on")
+    parser.add_argument("--probe-interval", type=float, default=PROBE_INTERVAL)
+    parser.add_argument("--listen-only", action="store_true", help="don't probe, only follow the fleet")
+    parser.add_argument("--no-failover", action="store_true", help="report only; never promote a pool")
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    if config is None:
+        return 1
+    try:
+        asyncio.run(_run(config, args))
+    except KeyboardInterrupt:
+        print(f"\n{CYAN}Gossip stopped.{RESET}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
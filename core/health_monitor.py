@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import deque
+from core.config_manager import config_store
+from core.pool_manager import pool_key, set_pool_on_top
+from utils.helpers import CYAN, ORANGE, RED, RESET, get_domain, parse_pool_url
+from utils.xmrig_api import XmrigApi, XmrigApiError
+
+POLL_INTERVAL = 5  # Seconds between /2/summary polls
+HEALTH_WINDOW = 60  # Seconds of samples the share and disconnect checks look at
+MAX_BAD_SHARE_RATIO = 0.1  # Rejected + invalid shares over all shares in the window
+MIN_SHARES = 5  # Shares the window needs before the ratio means anything
+MAX_DISCONNECTS = 2  # Pool connection failures tolerated within the window
+ZERO_HASHRATE_POLLS = 6  # Consecutive polls with no hashrate (30s at the default interval)
+STALE_SHARES = 10  # Expected share intervals without an accepted share before the job counts as stale
+FAIL_POLLS = 2  # Consecutive unhealthy polls before failing over (hysteresis)
+COOLDOWN = 300  # Seconds after a failover before another one
+PENALTY = 900  # Seconds a demoted pool is skipped when picking a replacement
+
+
+def _sample(summary):
+    """Pull the counters the checks need out of a /2/summary response."""
+    connection = summary.get("connection") or {}
+    results = summary.get("results") or {}
+    hashrate = (summary.get("hashrate") or {}).get("total") or [None]
+    return {
+        "time": time.monotonic(),
+        "pool": connection.get("pool"),
+        "uptime": connection.get("uptime"),
+        "failures": connection.get("failures", 0),
+        "shares": results.get("shares_total", 0),
+        "good": results.get("shares_good", 0),
+        "diff": results.get("diff_current", 0),
+        "hashrate": hashrate[0],
+    }
+
+
+class HealthMonitor:
+    """Watch xmrig's view of the current pool and fail over before xmrig's own retries would.
+
+    Every poll compares the samples of the last `window` seconds: too many
+    rejected or invalid shares, repeated disconnects, no connection, no
+    hashrate for `zero_hashrate_polls` polls, or a stale job (no accepted
+    share for `stale_shares` times the interval the current difficulty and
+    hashrate predict) make the poll unhealthy. After `fail_polls`
+    unhealthy polls in a row the next pool that wasn't demoted in the last
+    `penalty` seconds is promoted via set_pool_on_top, at most once per
+    `cooldown`.
+    """
+
+    def __init__(self, config, api=None, window=HEALTH_WINDOW, max_bad_ratio=MAX_BAD_SHARE_RATIO,
+                 min_shares=MIN_SHARES, max_disconnects=MAX_DISCONNECTS, zero_hashrate_polls=ZERO_HASHRATE_POLLS,
+                 stale_shares=STALE_SHARES, fail_polls=FAIL_POLLS, cooldown=COOLDOWN, penalty=PENALTY):
+        self.config = config
+        self.api = api or XmrigApi.from_config(config)
+        self.window = window
+        self.max_bad_ratio = max_bad_ratio
+        self.min_shares = min_shares
+        self.max_disconnects = max_disconnects
+        self.zero_hashrate_polls = zero_hashrate_polls
+        self.stale_shares = stale_shares
+        self.fail_polls = fail_polls
+        self.cooldown = cooldown
+        self.penalty = penalty
+        self.samples = deque()
+        self.problems = []
+        self.unhealthy_polls = 0
+        self.zero_polls = 0
+        self.last_accepted = None  # (monotonic time, shares_good) when the good-share count last rose
+        self.last_failover = None
+        self.demoted = {}  # Pool key -> monotonic time it was demoted
+        self.last_error = None
+
+    def _reset_window(self):
+        self.samples.clear()
+        self.unhealthy_polls = 0
+        self.zero_polls = 0
+        self.last_accepted = None
+
+    def evaluate(self, sample):
+        """Add a sample and return the problems seen in the window (empty if healthy)."""
+        if self.samples:
+            last = self.samples[-1]
+            if sample["pool"] != last["pool"] or sample["shares"] < last["shares"] or sample["failures"] < last["failures"]:
+                self._reset_window()  # Other pool, or xmrig restarted: old counters don't compare
+        self.samples.append(sample)
+        while sample["time"] - self.samples[0]["time"] > self.window:
+            self.samples.popleft()
+        first = self.samples[0]
+
+        problems = []
+        shares = sample["shares"] - first["shares"]
+        bad = shares - (sample["good"] - first["good"])
+        if shares >= self.min_shares and bad / shares > self.max_bad_ratio:
+            problems.append(f"{bad}/{shares} shares rejected or invalid")
+        disconnects = sample["failures"] - first["failures"]
+        if disconnects >= self.max_disconnects:
+            problems.append(f"{disconnects} disconnects")
+        if sample["uptime"] == 0:
+            problems.append("not connected")
+        self.zero_polls = self.zero_polls + 1 if not sample["hashrate"] else 0
+        if self.zero_polls >= self.zero_hashrate_polls:
+            problems.append(f"no hashrate for {self.zero_polls} polls")
+        if self.last_accepted is None or sample["good"] != self.last_accepted[1]:
+            self.last_accepted = (sample["time"], sample["good"])
+        if sample["diff"] and sample["hashrate"]:
+            expected = sample["diff"] / sample["hashrate"]
+            quiet = sample["time"] - self.last_accepted[0]
+            if quiet >= self.window and quiet > self.stale_shares * expected:
+                problems.append(f"stale job: no accepted share for {quiet:.0f}s (expected one every {expected:.1f}s)")
+        return problems
+
+    def _pool_index(self, address):
+        """1-based index of the configured pool xmrig is connected to ('host:port'), or None if none matches."""
+        try:
+            host, port = parse_pool_url(address or "")
+        except ValueError:
+            return None
+        for idx, pool in enumerate(self.config.get("pools", []), start=1):
+            try:
+                if parse_pool_url(pool.get("url", "")) == (host, port):
+                    return idx
+            except ValueError:
+                continue
+        return None
+
+    def next_healthy(self, current):
+        """1-based index of the first pool other than `current` not demoted recently, or None."""
+        now = time.monotonic()
+        for idx, pool in enumerate(self.config.get("pools", []), start=1):
+            if idx == current or pool.get("enabled") is False:
+                continue
+            demoted_at = self.demoted.get(pool_key(pool))
+            if demoted_at is None or now - demoted_at >= self.penalty:
+                return idx
+        return None
+
+    def failover(self, problems):
+        """Demote the current pool and promote the next healthy one. Returns True if it switched."""
+        with config_store.lock:
+            address = self.samples[-1]["pool"] if self.samples else None
+            current = self._pool_index(address)
+            pools = self.config.get("pools", [])
+            if not pools:
+                return False
+            if current is None:
+                # Demoting the top pool would punish one xmrig may not even be using
+                self.last_failover = time.monotonic()
+                print(f"{ORANGE}xmrig's pool {address or '(none reported)'} is unhealthy ({'; '.join(problems)}) "
+                      f"but isn't in config.json; not failing over.{RESET}")
+                return False
+            self.demoted[pool_key(pools[current - 1])] = time.monotonic()
+            self.last_failover = time.monotonic()  # Also throttles the warning below
+            target = self.next_healthy(current)
+            if target is None:
+                print(f"{RED}Pool {get_domain(pools[current - 1].get('url', ''))} is unhealthy "
+                      f"({'; '.join(problems)}) but every other pool was demoted recently.{RESET}")
+                return False
+            print(f"{ORANGE}Pool {get_domain(pools[current - 1].get('url', ''))} is unhealthy "
+                  f"({'; '.join(problems)}); failing over.{RESET}")
+            switched = set_pool_on_top(self.config, target, cause="health")
+        self._reset_window()
+        return switched
+
+    def step(self):
+        """Poll xmrig once and fail over if warranted. Returns True if it switched pools."""
+        try:
+            summary = self.api.summary()
+        except XmrigApiError as e:
+            self.last_error = str(e)
+            return False  # xmrig itself is down or busy; the supervisor handles that, not a pool switch
+        self.last_error = None
+        self.problems = self.evaluate(_sample(summary))
+        self.unhealthy_polls = self.unhealthy_polls + 1 if self.problems else 0
+        if self.unhealthy_polls < self.fail_polls:
+            return False
+        if self.last_failover is not None and time.monotonic() - self.last_failover < self.cooldown:
+            return False
+        return self.failover(self.problems)
+
+    def run(self, interval=POLL_INTERVAL, stop_event=None):
+        """Poll every `interval` seconds until `stop_event` is set."""
+        stop_event = stop_event or threading.Event()
+        print(f"{CYAN}Health monitor polling {self.api.base_url} every {interval}s...{RESET}")
+        while not stop_event.is_set():
+            self.step()
+            stop_event.wait(interval)
@@ -0,0 +1,326 @@
+import argparse
+import atexit
+import os
+import sqlite3
+import sys
+import threading
+import time
+from core.config_manager import config_store
+from core.supervisor import supervisor
+from utils.helpers import BOLD, CYAN, GREEN, RED, RESET, get_domain
+from utils.xmrig_api import XmrigApi, XmrigApiError
+
+HISTORY_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../history.db")
+SAMPLE_INTERVAL = 60  # Seconds between recorder samples
+BATCH_SIZE = 500  # Buffered observations that force a write
+FLUSH_INTERVAL = 300  # Seconds the buffer is kept at most
+PRUNE_INTERVAL = 3600
+RESOLUTIONS = (60, 3600, 86400)  # Rollup bucket sizes in seconds: 1m, 1h, 1d
+RETENTION = {0: 2 * 86400, 60: 14 * 86400, 3600: 400 * 86400, 86400: None}  # Resolution (0 = raw) -> seconds kept
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (ts INTEGER NOT NULL, metric TEXT NOT NULL, pool TEXT NOT NULL, value REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution INTEGER NOT NULL, metric TEXT NOT NULL, pool TEXT NOT NULL, bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL, sum REAL NOT NULL, min REAL NOT NULL, max REAL NOT NULL,
+    PRIMARY KEY (resolution, metric, pool, bucket)
+) WITHOUT ROWID;
+"""
+
+UPSERT_ROLLUP = """
+INSERT INTO rollups (resolution, metric, pool, bucket, count, sum, min, max) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, metric, pool, bucket) DO UPDATE SET
+    count = count + excluded.count, sum = sum + excluded.sum,
+    min = MIN(min, excluded.min), max = MAX(max, excluded.max)
+"""
+
+
+def pick_resolution(span):
+    """Coarsest rollup that still resolves a window of `span` seconds well."""
+    if span <= 6 * 3600:
+        return 60
+    if span <= 60 * 86400:
+        return 3600
+    return 86400
+
+
+class HistoryStore:
+    """SQLite (WAL) time series of observations with 1m/1h/1d rollups.
+
+    `record` only appends to an in-memory buffer; `flush` writes the buffer as
+    raw samples and folds it into every rollup resolution in one transaction.
+    Queries read the rollups, so a month of history is a few hundred rows per
+    pool and answers in milliseconds. Old raw samples and fine rollups are
+    pruned per RETENTION.
+    """
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = os.path.abspath(path)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._buffer = []
+        self._flushed_at = time.monotonic()
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, metric, value, pool="", ts=None):
+        """Buffer one observation; written on the next flush (forced when the batch is full)."""
+        with self._lock:
+            self._buffer.append((int(ts if ts is not None else time.time()), metric, pool or "", float(value)))
+            full = len(self._buffer) >= BATCH_SIZE or time.monotonic() - self._flushed_at >= FLUSH_INTERVAL
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write buffered observations and update the rollups. Returns how many were written."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            self._flushed_at = time.monotonic()
+            if not batch:
+                return 0
+            rollups = {}
+            for ts, metric, pool, value in batch:
+                for resolution in RESOLUTIONS:
+                    key = (resolution, metric, pool, ts - ts % resolution)
+                    entry = rollups.get(key)
+                    if entry is None:
+                        rollups[key] = [1, value, value, value]
+                    else:
+                        entry[0] += 1
+                        entry[1] += value
+                        entry[2] = min(entry[2], value)
+                        entry[3] = max(entry[3], value)
+            with self._db:
+                self._db.executemany("INSERT INTO samples VALUES (?, ?, ?, ?)", batch)
+                self._db.executemany(UPSERT_ROLLUP, [key + tuple(entry) for key, entry in rollups.items()])
+            if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+                self._prune()
+            return len(batch)
+
+    def _prune(self, now=None):
+        now = now if now is not None else time.time()
+        with self._db:
+            for resolution, keep in RETENTION.items():
+                if keep is None:
+                    continue
+                if resolution == 0:
+                    self._db.execute("DELETE FROM samples WHERE ts < ?", (now - keep,))
+                else:
+                    self._db.execute("DELETE FROM rollups WHERE resolution = ? AND bucket < ?", (resolution, now - keep))
+        self._pruned_at = time.monotonic()
+
+    def prune(self, now=None):
+        """Drop raw samples and rollups older than their retention."""
+        with self._lock:
+            self._prune(now)
+
+    def query(self, metric, since, until=None, resolution=None):
+        """Rollup rows (bucket, pool, count, sum, min, max) for `metric` between two timestamps."""
+        self.flush()
+        until = until if until is not None else time.time()
+        resolution = resolution or pick_resolution(until - since)
+        with self._lock:
+            return self._db.execute(
+                "SELECT bucket, pool, count, sum, min, max FROM rollups "
+                "WHERE resolution = ? AND metric = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+                (resolution, metric, since - since % resolution, until)).fetchall()
+
+    def totals(self, metric, since, until=None):
+        """Per-pool {pool: (count, sum, min, max)} for `metric` between two timestamps."""
+        self.flush()
+        until = until if until is not None else time.time()
+        resolution = pick_resolution(until - since)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT pool, SUM(count), SUM(sum), MIN(min), MAX(max) FROM rollups "
+                "WHERE resolution = ? AND metric = ? AND bucket >= ? AND bucket < ? GROUP BY pool",
+                (resolution, metric, since - since % resolution, until)).fetchall()
+        return {pool: (count, total, low, high) for pool, count, total, low, high in rows}
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+
+class HistoryRecorder:
+    """Sample xmrig, the active pool and the XMR price into a HistoryStore every interval.
+
+    Hashrate and shares come from xmrig's HTTP API when it is enabled, otherwise
+    from xmrig.log via the log tailer. "active" records the seconds spent on
+    each pool, so per-pool rates can be computed over the time actually mined.
+    """
+
+    def __init__(self, store, interval=SAMPLE_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self._last_sample = None
+        self._last_shares = {}  # Pool (None: xmrig's process-wide counters) -> (accepted, rejected) last sample
+        self._last_price_at = time.time()
+        self._tailer = None
+        config = config_store.load() or {}
+        try:
+            self.api = XmrigApi.from_config(config)
+        except XmrigApiError:
+            self.api = None
+
+    def _mining_state(self):
+        """Return (pool, hashrate, {pool: (accepted, rejected) counters}) as best as can be told.
+
+        xmrig's API only counts shares for the whole process, so they come under
+        the None key and each interval's increase goes to the pool mined on.
+        """
+        if self.api is not None:
+            try:
+                summary = self.api.summary()
+                pool = (summary.get("connection") or {}).get("pool")
+                results = summary.get("results") or {}
+                good = results.get("shares_good", 0)
+                return pool, ((summary.get("hashrate") or {}).get("total") or [None])[0], \
+                    {None: (good, results.get("shares_total", 0) - good)}
+            except XmrigApiError:
+                return None, None, {}
+        if self._tailer is None:
+            from core.log_tailer import LogTailer
+            self._tailer = LogTailer()
+        self._tailer.poll()
+        stats = self._tailer.stats.get(self._tailer.pool)
+        return self._tailer.pool, stats.hashrate if stats else None, \
+            {pool: (entry.accepted, entry.rejected) for pool, entry in self._tailer.stats.items()}
+
+    def sample(self):
+        """Take one sample of everything."""
+        now = time.time()
+        elapsed = now - self._last_sample if self._last_sample else self.interval
+        self._last_sample = now
+        running = supervisor.is_running()
+        self.store.record("xmrig_up", 1 if running else 0, ts=now)
+        if running:
+            pool, hashrate, shares = self._mining_state()
+            if pool is None:
+                pools = (config_store.load() or {}).get("pools") or [{}]
+                pool = pools[0].get("url")
+            if pool:
+                self.store.record("active", min(elapsed, 2 * self.interval), pool, ts=now)
+            if hashrate:
+                self.store.record("hashrate", hashrate, pool, ts=now)
+            for share_pool, (accepted, rejected) in shares.items():
+                previous = self._last_shares.get(share_pool)
+                credit = share_pool if share_pool is not None else pool
+                if previous and credit and accepted >= previous[0] and rejected >= previous[1]:
+                    self.store.record("accepted", accepted - previous[0], credit, ts=now)
+                    self.store.record("rejected", rejected - previous[1], credit, ts=now)
+                self._last_shares[share_pool] = (accepted, rejected)
+        from utils.monero_data import market_data
+        for fetched_at, price in market_data.samples():
+            if fetched_at > self._last_price_at:
+                self.store.record("price", price, ts=fetched_at)
+                self._last_price_at = fetched_at
+
+    def run(self, stop_event=None):
+        """Sample every interval until `stop_event` is set."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                self.sample()
+            except sqlite3.Error as e:
+                print(f"{RED}History recording failed: {e}{RESET}")
+            stop_event.wait(self.interval)
+
+    def start(self):
+        """Record on a daemon thread; returns the Event that stops it."""
+        stop_event = threading.Event()
+        threading.Thread(target=self.run, args=(stop_event,), daemon=True).start()
+        return stop_event
+
+
+_store = None
+
+
+def history_store():
+    """The shared HistoryStore, opened on first use and flushed at exit."""
+    global _store
+    if _store is None:
+        _store = HistoryStore()
+        atexit.register(_store.flush)
+    return _store
+
+
+def start_recording(interval=SAMPLE_INTERVAL):
+    """Start recording history in the background, with the market data service it takes prices from."""
+    from utils.monero_data import market_data
+    market_data.start()
+    return HistoryRecorder(history_store(), interval).start()
+
+
+def build_report(store, days=1, now=None):
+    """Summarize the last `days` days per pool, plus xmrig uptime and price."""
+    now = now if now is not None else time.time()
+    since = now - days * 86400
+    active = store.totals("active", since, now)
+    accepted = store.totals("accepted", since, now)
+    rejected = store.totals("rejected", since, now)
+    hashrate = store.totals("hashrate", since, now)
+    pools = {}
+    for pool in set(active) | set(accepted) | set(hashrate):
+        hours = active.get(pool, (0, 0))[1] / 3600
+        shares = accepted.get(pool, (0, 0))[1]
+        pools[pool] = {
+            "hours": hours,
+            "accepted": shares,
+            "rejected": rejected.get(pool, (0, 0))[1],
+            "accepted_per_hour": shares / hours if hours else None,
+            "hashrate": hashrate[pool][1] / hashrate[pool][0] if pool in hashrate and hashrate[pool][0] else None,
+        }
+    up = store.totals("xmrig_up", since, now).get("")
+    price = store.totals("price", since, now).get("")
+    return {
+        "days": days,
+        "pools": pools,
+        "uptime": up[1] / up[0] if up and up[0] else None,
+        "price": {"avg": price[1] / price[0], "min": price[2], "max": price[3]} if price and price[0] else None,
+    }
+
+
+def print_report(report):
+    """Print a report built by build_report."""
+    print(f"\n{CYAN}History for the last {report['days']:g} day(s):{RESET}")
+    if report["uptime"] is not None:
+        print(f"  xmrig running {report['uptime']:.1%} of the time.")
+    if not report["pools"]:
+        print(f"{RED}  No mining history recorded yet.{RESET}")
+    for pool, entry in sorted(report["pools"].items(), key=lambda item: item[1]["hours"], reverse=True):
+        rate = f"{entry['accepted_per_hour']:.1f}/h" if entry["accepted_per_hour"] is not None else "n/a"
+        hashrate = f"{entry['hashrate']:.1f} H/s" if entry["hashrate"] is not None else "n/a"
+        print(f"  {BOLD}{get_domain(pool)}{RESET} ({pool})  {entry['hours']:.1f} h  accepted {entry['accepted']:.0f}"
+              f" ({rate})  rejected {entry['rejected']:.0f}  avg hashrate {hashrate}")
+    if report["price"]:
+        price = report["price"]
+        print(f"{GREEN}  XMR price: avg ${price['avg']:,.2f}  min ${price['min']:,.2f}  max ${price['max']:,.2f}{RESET}")
+
+
+def show_history():
+    """Ask for a period and print the history report."""
+    answer = input("Report on how many days? [1]: ").strip() or "1"
+    try:
+        days = float(answer)
+    except ValueError:
+        print(f"{RED}Invalid input. Please enter a number of days.{RESET}")
+        return
+    print_report(build_report(history_store(), days))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report recorded mining, pool and price history.")
+    parser.add_argument("--days", type=float, default=1, help="report period in days")
+    parser.add_argument("--db", default=HISTORY_DB)
+    args = parser.parse_args(argv)
+    print_report(build_report(HistoryStore(args.db), args.days))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
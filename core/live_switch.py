@@ -0,0 +1,244 @@
+import argparse
+import copy
+import sys
+import threading
+import time
+from collections import deque
+from core.config_manager import config_store, load_config
+from core.pool_manager import add_listener, remove_listener, set_cpu_threads, set_pool_on_top
+from utils.helpers import BOLD, CYAN, GREEN, ORANGE, RED, RESET, parse_pool_url
+from utils.metrics import counter, histogram
+from utils.xmrig_api import XmrigApi, XmrigApiError
+
+SHARE_TIMEOUT = 600  # Seconds to wait for the new pool's first accepted share
+SHARE_POLL = 0.5  # Seconds between /2/summary polls while measuring a switch
+SWITCH_HISTORY = 20  # Switch measurements kept for status
+SWITCH_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+live_pushes = counter("live_pushes_total", "Pushes of the pools and cpu sections to xmrig's API, by result.", ("result",))
+live_push_seconds = histogram("live_push_seconds", "Time to push the pools and cpu sections to xmrig's API.")
+switch_connect_seconds = histogram("switch_connect_seconds", "Time from a pool switch until xmrig is on the new pool.",
+                                   ("cause",), SWITCH_BUCKETS)
+switch_share_seconds = histogram("switch_first_share_seconds", "Time from a pool switch until the new pool accepts a share.",
+                                 ("cause",), SWITCH_BUCKETS)
+
+
+def pool_address(pool):
+    """'host:port' of a pool, as xmrig reports the pool it is connected to."""
+    try:
+        host, port = parse_pool_url(pool.get("url", ""))
+    except ValueError:
+        return None
+    return f"{host.lower()}:{port}"
+
+
+class LiveSwitcher:
+    """Push pool order and CPU threads into the running xmrig through its HTTP API.
+
+    push() swaps the "pools" and "cpu" sections into xmrig's running config
+    (GET then PUT /1/config), so a switch doesn't wait for config.json to be
+    written and xmrig's file watcher to notice. config.json is still written by
+    the ConfigStore; xmrig then reloads identical sections and keeps its
+    connection. Needs an access token and "restricted": false in the "http"
+    section.
+
+    After every switch of the top pool, the time until xmrig is connected to
+    it and until it accepts the first share is measured from /2/summary.
+    """
+
+    def __init__(self, config, api=None, share_timeout=SHARE_TIMEOUT, poll_interval=SHARE_POLL):
+        self.config = config
+        self.api = api or XmrigApi.from_config(config)
+        self.share_timeout = share_timeout
+        self.poll_interval = poll_interval
+        self.switches = deque(maxlen=SWITCH_HISTORY)  # Newest last
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = None  # (generation, cause, monotonic time) of the change not pushed yet
+        self._generation = 0
+        pools = config.get("pools", [])
+        self._top = pool_address(pools[0]) if pools else None  # Top pool as of the last push
+
+    def push(self):
+        """Replace the pools and cpu sections of xmrig's running config. Returns the seconds it took."""
+        with config_store.lock:
+            sections = {name: copy.deepcopy(self.config[name]) for name in ("pools", "cpu") if name in self.config}
+        started = time.perf_counter()
+        try:
+            live = self.api.get_config()
+            if not isinstance(live, dict):
+                raise XmrigApiError("GET /1/config returned no config")
+            live.update(sections)
+            self.api.put_config(live)
+        except XmrigApiError:
+            live_pushes.inc(result="error")
+            raise
+        elapsed = time.perf_counter() - started
+        live_push_seconds.observe(elapsed)
+        live_pushes.inc(result="ok")
+        return elapsed
+
+    def _push_change(self, generation, cause, started):
+        """Push the current sections; returns the switch record if the top pool changed, else None."""
+        try:
+            push_seconds = self.push()
+        except XmrigApiError as e:
+            self.last_error = str(e)
+            print(f"{ORANGE}Live push failed ({e}); xmrig will pick the change up from config.json.{RESET}")
+            return None
+        self.last_error = None
+        pools = self.config.get("pools", [])
+        top = pool_address(pools[0]) if pools else None
+        if top is None or top == self._top:
+            return None  # Threads or lower pools changed: nothing to reconnect to
+        self._top = top
+        record = {"pool": top, "cause": cause, "generation": generation, "push_ms": round(push_seconds * 1000, 1),
+                  "connect_s": None, "first_share_s": None, "result": "pending"}
+        self.switches.append(record)
+        return record
+
+    def measure(self, record, started):
+        """Poll /2/summary until xmrig is on the record's pool and has an accepted share there.
+
+        Gives up when another switch supersedes this one or after share_timeout.
+        """
+        deadline = started + self.share_timeout
+        while time.monotonic() < deadline:
+            if self._generation != record["generation"]:
+                record["result"] = "superseded"
+                return record
+            try:
+                connection = self.api.summary().get("connection") or {}
+            except (XmrigApiError, AttributeError):
+                connection = {}
+            if (connection.get("pool") or "").lower() == record["pool"]:
+                elapsed = time.monotonic() - started
+                if record["connect_s"] is None:
+                    record["connect_s"] = round(elapsed, 2)
+                    switch_connect_seconds.observe(elapsed, cause=record["cause"])
+                if connection.get("accepted", 0) > 0:  # Per-connection count, so only the new pool's shares
+                    record["first_share_s"] = round(elapsed, 2)
+                    record["result"] = "ok"
+                    switch_share_seconds.observe(elapsed, cause=record["cause"])
+                    return record
+            time.sleep(self.poll_interval)
+        record["result"] = "timeout"
+        return record
+
+    def switch(self, pool_index, cause="manual", wait=True):
+        """Promote a pool, push it live and (with `wait`) measure the switch in this thread.
+
+        Returns the switch record, or None if nothing was pushed.
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        started = time.monotonic()
+        if not set_pool_on_top(self.config, pool_index, cause):
+            return None
+        record = self._push_change(generation, cause, started)
+        if record is not None and wait:
+            self.measure(record, started)
+        return record
+
+    def set_threads(self, cores):
+        """Set the thread count and push it live; xmrig restarts its workers, not the pool connection."""
+        set_cpu_threads(self.config, cores)
+        try:
+            self.push()
+        except XmrigApiError as e:
+            self.last_error = str(e)
+            print(f"{ORANGE}Live push failed ({e}); xmrig will pick the change up from config.json.{RESET}")
+            return False
+        return True
+
+    def on_change(self, config, cause):
+        """pool_manager listener: queue a push. Bursts of changes are pushed once."""
+        if config is not self.config:
+            return  # e.g. fleet mode editing another rig's config
+        with self._lock:
+            self._generation += 1
+            self._pending = (self._generation, cause, time.monotonic())
+        self._wakeup.set()
+
+    def run(self, stop_event=None):
+        """Push queued changes until `stop_event` is set; each switch is measured on its own thread."""
+        stop_event = stop_event or threading.Event()
+        add_listener(self.on_change)
+        try:
+            while not stop_event.is_set():
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                with self._lock:
+                    pending, self._pending = self._pending, None
+                if pending is None:
+                    continue
+                record = self._push_change(*pending)
+                if record is not None:
+                    threading.Thread(target=self.measure, args=(record, pending[2]), daemon=True).start()
+        finally:
+            remove_listener(self.on_change)
+
+    def start_background(self, stop_event=None):
+        thread = threading.Thread(target=self.run, args=(stop_event,), daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        last = self.switches[-1] if self.switches else None
+        return {"error": self.last_error, "last_switch": {k: v for k, v in last.items() if k != "generation"} if last else None}
+
+
+def _format_s(value):
+    return f"{value:.2f}s" if value is not None else "n/a"
+
+
+def print_switch(record):
+    """Print one switch measurement."""
+    color = GREEN if record["result"] == "ok" else RED
+    print(f"  {BOLD}{record['pool']}{RESET} ({record['cause']}): pushed in {record['push_ms']:.1f} ms,"
+          f" connected after {_format_s(record['connect_s'])},"
+          f" first accepted share after {_format_s(record['first_share_s'])}  {color}{record['result']}{RESET}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Switch pools or threads in the running xmrig through its HTTP API.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    promote = commands.add_parser("promote", help="move a pool to the top and measure the switch")
+    promote.add_argument("index", type=int)
+    promote.add_argument("--no-wait", action="store_true", help="don't wait for the first accepted share")
+    promote.add_argument("--timeout", type=float, default=SHARE_TIMEOUT, help="seconds to wait for a share")
+    commands.add_parser("cores", help="set the number of mining threads").add_argument("cores", type=int)
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    if config is None:
+        return 1
+    try:
+        switcher = LiveSwitcher(config, share_timeout=getattr(args, "timeout", SHARE_TIMEOUT))
+    except XmrigApiError as e:
+        print(f"{RED}{e}{RESET}")
+        return 1
+    try:
+        if args.command == "cores":
+            return 0 if switcher.set_threads(args.cores) else 1
+        if not 1 <= args.index <= len(config.get("pools", [])):
+            print(f"{RED}Invalid number. Enter a number between 1 and {len(config.get('pools', []))}.{RESET}")
+            return 1
+        if not args.no_wait:
+            print(f"{CYAN}Switching and waiting for the first accepted share (up to {args.timeout:.0f}s)...{RESET}")
+        record = switcher.switch(args.index, wait=not args.no_wait)
+    except ValueError as e:
+        print(f"{RED}Error: {e}{RESET}")
+        return 1
+    finally:
+        config_store.flush()
+    if record is None:
+        return 0 if switcher.last_error is None else 1
+    print_switch(record)
+    return 0 if record["result"] in ("ok", "pending") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
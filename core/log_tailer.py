@@ -0,0 +1,250 @@
+import argparse
+import os
+import re
+import sys
+import threading
+from core.config_manager import ConfigStore
+from core.supervisor import LOG_FILE
+from utils.helpers import BOLD, CYAN, RED, RESET
+
+TAIL_STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../log_tailer.json")
+READ_CHUNK = 1024 * 1024  # Bytes read per call; lines are parsed straight out of each chunk
+EWMA_ALPHA = 0.1  # Weight of the newest sample in rolling averages
+TAIL_INTERVAL = 2  # Seconds between polls when following
+
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+_TIMESTAMP = re.compile(r"\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)")
+_USE_POOL = re.compile(r"use pool (\S+)")
+_NEW_JOB = re.compile(r"new job from (\S+) diff (\d+)")
+_ACCEPTED = re.compile(r"accepted \((\d+)/(\d+)\) diff (\d+)(?: \((\d+) ms\))?")
+_REJECTED = re.compile(r"rejected \((\d+)/(\d+)\) diff (\d+) \"([^\"]*)\"")
+_SPEED = re.compile(r"speed 10s/60s/15m (\S+)")
+_NET_ERROR = re.compile(r"\[?([\w.-]+:\d+)\]? (?:connect|read|write|login|DNS) error")
+
+
+def _ewma(current, sample):
+    return sample if current is None else current + EWMA_ALPHA * (sample - current)
+
+
+class PoolLogStats:
+    """Running totals and averages for one pool; fixed size however long the log gets."""
+
+    __slots__ = ("accepted", "rejected", "jobs", "errors", "accepted_diff", "last_diff",
+                 "share_ms", "hashrate", "last_reject", "first_seen", "last_seen")
+
+    def __init__(self, data=None):
+        data = data or {}
+        for name in self.__slots__:
+            setattr(self, name, data.get(name, 0 if name in ("accepted", "rejected", "jobs", "errors", "accepted_diff") else None))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @property
+    def reject_ratio(self):
+        shares = self.accepted + self.rejected
+        return self.rejected / shares if shares else None
+
+
+class LogTailer:
+    """Follow xmrig.log incrementally and aggregate it per pool.
+
+    The byte offset and inode are persisted with the aggregates, so a restart
+    resumes where it stopped instead of re-reading the file. A new inode at the
+    log path means rotation: the rest of the old file is read first (while it
+    is still open, or from `<log>.1`), then the new one from the start. A file
+    shorter than the offset was truncated and is re-read from the start.
+    Share lines carry no pool, so they count towards the pool from the last
+    "use pool" / "new job" line.
+    """
+
+    def __init__(self, path=LOG_FILE, state_path=TAIL_STATE_FILE):
+        self.path = os.path.abspath(path)
+        self.store = ConfigStore(state_path, debounce=0)
+        state = self.store.load() or {}
+        if state.get("path") != self.path:
+            state = {}
+        self.inode = state.get("inode")
+        self.offset = state.get("offset", 0)
+        self.pool = state.get("pool")
+        self.stats = {pool: PoolLogStats(data) for pool, data in state.get("pools", {}).items()}
+        self.lines = 0
+        self._file = None
+
+    def _pool_stats(self, pool):
+        stats = self.stats.get(pool)
+        if stats is None:
+            stats = self.stats[pool] = PoolLogStats()
+        return stats
+
+    def feed(self, line):
+        """Parse one log line into the aggregates."""
+        if "\x1b" in line:
+            line = _ANSI.sub("", line)
+        stamp = _TIMESTAMP.match(line)
+        stamp = stamp.group(1) if stamp else None
+        if "accepted (" in line:
+            match = _ACCEPTED.search(line)
+            if match and self.pool:
+                stats = self._pool_stats(self.pool)
+                stats.accepted += 1
+                stats.accepted_diff += int(match.group(3))
+                if match.group(4):
+                    stats.share_ms = _ewma(stats.share_ms, int(match.group(4)))
+                stats.last_seen = stamp or stats.last_seen
+        elif "rejected (" in line:
+            match = _REJECTED.search(line)
+            if match and self.pool:
+                stats = self._pool_stats(self.pool)
+                stats.rejected += 1
+                stats.last_reject = match.group(4)
+                stats.last_seen = stamp or stats.last_seen
+        elif "new job from" in line:
+            match = _NEW_JOB.search(line)
+            if match:
+                self.pool = match.group(1)
+                stats = self._pool_stats(self.pool)
+                stats.jobs += 1
+                stats.last_diff = int(match.group(2))
+                stats.first_seen = stats.first_seen or stamp
+                stats.last_seen = stamp or stats.last_seen
+        elif "speed 10s/60s/15m" in line:
+            match = _SPEED.search(line)
+            if match and self.pool:
+                try:
+                    stats = self._pool_stats(self.pool)
+                    stats.hashrate = _ewma(stats.hashrate, float(match.group(1)))
+                except ValueError:
+                    pass  # "n/a" right after start
+        elif "use pool" in line:
+            match = _USE_POOL.search(line)
+            if match:
+                self.pool = match.group(1)
+                stats = self._pool_stats(self.pool)
+                stats.first_seen = stats.first_seen or stamp
+        elif " error" in line:
+            match = _NET_ERROR.search(line)
+            if match:
+                self._pool_stats(match.group(1)).errors += 1
+        self.lines += 1
+
+    def _consume(self, file):
+        """Parse complete lines from the current offset to EOF; a trailing partial line is left for later."""
+        file.seek(self.offset)
+        pending = b""
+        while True:
+            chunk = file.read(READ_CHUNK)
+            if not chunk:
+                break
+            chunk = pending + chunk
+            end = chunk.rfind(b"\n") + 1
+            pending = chunk[end:]
+            if end:
+                for line in chunk[:end].decode("utf-8", "replace").splitlines():
+                    self.feed(line)
+                self.offset += end
+
+    def _open(self):
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return None
+        inode = os.fstat(file.fileno()).st_ino
+        if self.inode is not None and inode != self.inode:
+            # Rotated while we weren't looking: finish the old file if it is still around
+            rotated = f"{self.path}.1"
+            if self._file is None and os.path.exists(rotated) and os.stat(rotated).st_ino == self.inode:
+                with open(rotated, "rb") as old:
+                    self._consume(old)
+            self.offset = 0
+        self.inode = inode
+        return file
+
+    def poll(self):
+        """Read everything appended since the last poll. Returns the number of lines parsed."""
+        before = self.lines
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        if self._file is not None and (current is None or current.st_ino != self.inode):
+            self._consume(self._file)  # Rotated: drain the old file through the handle we hold
+            self._file.close()
+            self._file = None
+            self.offset = 0
+            self.inode = current.st_ino if current else None
+        if self._file is None:
+            self._file = self._open()
+        if self._file is not None:  # None until a rotated-away log is recreated
+            if os.fstat(self._file.fileno()).st_size < self.offset:
+                self.offset = 0  # Truncated (e.g. copytruncate rotation)
+            self._consume(self._file)
+        if self.lines != before:
+            self.save()
+        return self.lines - before
+
+    def save(self):
+        """Persist the offset, inode and aggregates."""
+        self.store.save({"path": self.path, "inode": self.inode, "offset": self.offset, "pool": self.pool,
+                         "pools": {pool: stats.to_dict() for pool, stats in self.stats.items()}})
+
+    def reset(self):
+        """Forget the aggregates and start again from the beginning of the log."""
+        self.stats.clear()
+        self.offset = 0
+        self.pool = None
+        self.save()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def follow(self, interval=TAIL_INTERVAL, stop_event=None):
+        """Poll every `interval` seconds until `stop_event` is set."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.poll()
+            stop_event.wait(interval)
+
+
+def print_log_stats(tailer):
+    """Print the per-pool aggregates."""
+    if not tailer.stats:
+        print(f"{RED}No pool activity found in {tailer.path}.{RESET}")
+        return
+    print(f"\n{CYAN}Pool activity from {tailer.path}:{RESET}")
+    for pool, stats in sorted(tailer.stats.items(), key=lambda item: item[1].last_seen or "", reverse=True):
+        ratio = f"{stats.reject_ratio:.1%}" if stats.reject_ratio is not None else "n/a"
+        hashrate = f"{stats.hashrate:.1f} H/s" if stats.hashrate is not None else "n/a"
+        latency = f"{stats.share_ms:.0f} ms" if stats.share_ms is not None else "n/a"
+        print(f"  {BOLD}{pool}{RESET}  accepted {stats.accepted}  rejected {stats.rejected} ({ratio})"
+              f"  jobs {stats.jobs}  diff {stats.last_diff or 'n/a'}  share latency {latency}"
+              f"  hashrate {hashrate}  errors {stats.errors}  last seen {stats.last_seen or 'n/a'}")
+        if stats.last_reject:
+            print(f"    last reject: {stats.last_reject}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize xmrig.log per pool, reading only what's new.")
+    parser.add_argument("--log", default=LOG_FILE, help="xmrig log file")
+    parser.add_argument("--follow", action="store_true", help="keep following the log")
+    parser.add_argument("--reset", action="store_true", help="forget the saved position and re-read the log")
+    args = parser.parse_args(argv)
+
+    tailer = LogTailer(args.log)
+    if args.reset:
+        tailer.reset()
+    tailer.poll()
+    print_log_stats(tailer)
+    if args.follow:
+        try:
+            tailer.follow()
+        except KeyboardInterrupt:
+            print_log_stats(tailer)
+    tailer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import ipaddress
+import socket
+import sys
+import time
+from core.config_manager import config_store, load_config
+from core.pool_manager import set_pool_url
+from core.pool_prober import PROBE_TIMEOUT, PoolStats, probe_pool
+from utils.helpers import BOLD, CYAN, GREEN, ORANGE, RED, RESET, get_domain, parse_pool_url
+
+DNS_TTL = 300  # Seconds a lookup is cached when the resolver reports no TTL
+NEGATIVE_TTL = 30  # Seconds a failed or empty lookup is cached
+MIRROR_ROUNDS = 3  # Handshakes per address; the median is the address's latency
+MIRROR_HYSTERESIS = 0.1  # A mirror must be 10% faster than the current host to replace it
+
+# Pool domain -> regional hostnames of the same pool (same ports and accounts)
+MIRRORS = {
+    "nanopool.org": [
+        "xmr-eu1.nanopool.org", "xmr-eu2.nanopool.org", "xmr-us-east1.nanopool.org",
+        "xmr-us-west1.nanopool.org", "xmr-asia1.nanopool.org", "xmr-jp1.nanopool.org", "xmr-au1.nanopool.org",
+    ],
+    "herominers.com": [
+        "monero.herominers.com", "de.monero.herominers.com", "fi.monero.herominers.com",
+        "ca.monero.herominers.com", "us.monero.herominers.com", "us2.monero.herominers.com",
+        "br.monero.herominers.com", "hk.monero.herominers.com", "kr.monero.herominers.com",
+        "sg.monero.herominers.com", "tr.monero.herominers.com", "in.monero.herominers.com",
+    ],
+}
+
+
+def register_mirrors(domain, hosts):
+    """Add regional hostnames for the pool at `domain`; they must share its domain and ports."""
+    for host in hosts:
+        if get_domain(host) != domain:
+            raise ValueError(f"{host} is not under {domain}; the pool's identity would change")
+    known = MIRRORS.setdefault(domain, [])
+    known.extend(host for host in hosts if host not in known)
+
+
+async def system_resolver(host, family):
+    """Look `host` up with getaddrinfo. It exposes no TTL, so the TTL returned is None."""
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, None, family=family, type=socket.SOCK_STREAM)
+    return sorted({info[4][0] for info in infos}), None
+
+
+class DnsCache:
+    """A and AAAA lookups, run concurrently and cached for their TTL.
+
+    `resolver(host, family)` is a coroutine returning (addresses, ttl), with
+    ttl None when unknown. Lookups of a name already in flight wait for that
+    query instead of sending another.
+    """
+
+    def __init__(self, resolver=system_resolver, ttl=DNS_TTL, negative_ttl=NEGATIVE_TTL, clock=time.monotonic):
+        self.resolver = resolver
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.queries = 0
+        self._entries = {}  # (host, family) -> (expiry, addresses)
+        self._pending = {}  # (host, family) -> task of the query in flight
+
+    async def _query(self, key):
+        self.queries += 1
+        try:
+            addresses, ttl = await self.resolver(*key)
+        except OSError:
+            addresses, ttl = [], None
+        if not addresses:
+            ttl = self.negative_ttl
+        self._entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), addresses)
+        return addresses
+
+    async def lookup(self, host, family):
+        key = (host, family)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > self.clock():
+            return entry[1]
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._query(key))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def resolve(self, host):
+        """IPv4 then IPv6 addresses of `host`; an IP literal resolves to itself."""
+        try:
+            return [str(ipaddress.ip_address(host))]
+        except ValueError:
+            pass
+        ipv4, ipv6 = await asyncio.gather(self.lookup(host, socket.AF_INET), self.lookup(host, socket.AF_INET6))
+        return ipv4 + ipv6
+
+    async def resolve_many(self, hosts):
+        """Resolve every host at once. Returns {host: addresses}."""
+        results = await asyncio.gather(*(self.resolve(host) for host in hosts))
+        return dict(zip(hosts, results))
+
+    def clear(self):
+        self._entries.clear()
+
+
+dns_cache = DnsCache()
+
+
+def candidate_hosts(pool):
+    """The pool's current host followed by its known regional mirrors; empty if its URL is invalid."""
+    try:
+        host, _ = parse_pool_url(pool.get("url", ""))
+    except ValueError:
+        return []
+    hosts = [host.lower()]
+    hosts.extend(mirror for mirror in MIRRORS.get(get_domain(host.lower()), []) if mirror not in hosts)
+    return hosts
+
+
+def replace_host(url, host):
+    """`url` pointing at `host` instead, keeping its scheme and port."""
+    _, port = parse_pool_url(url)
+    scheme = url[:url.index("://") + 3] if "://" in url else ""
+    return f"{scheme}{host}:{port}"
+
+
+def _address_url(address, port):
+    return f"[{address}]:{port}" if ":" in address else f"{address}:{port}"
+
+
+async def probe_mirrors(pool, dns=None, rounds=MIRROR_ROUNDS, timeout=PROBE_TIMEOUT):
+    """Resolve every mirror of `pool` and probe all of their addresses concurrently.
+
+    Returns one entry per candidate host, in candidate order:
+    {"host", "addresses": {address: PoolStats}, "score"} where the score is
+    that of the host's best address (lower is better, inf if unreachable).
+    """
+    dns = dns or dns_cache
+    _, port = parse_pool_url(pool.get("url", ""))
+    hosts = candidate_hosts(pool)
+    resolved = await dns.resolve_many(hosts)
+    targets = [(host, address) for host in hosts for address in resolved[host]]
+    stats = {target: PoolStats(rounds) for target in targets}
+    for _ in range(rounds):
+        rtts = await asyncio.gather(
+            *(probe_pool(_address_url(address, port), pool.get("tls", False), timeout) for _, address in targets)
+        )
+        for target, rtt in zip(targets, rtts):
+            stats[target].record(rtt)
+    results = []
+    for host in hosts:
+        addresses = {address: stats[(host, address)] for address in resolved[host]}
+        score = min((entry.score(timeout) for entry in addresses.values()), default=float("inf"))
+        results.append({"host": host, "addresses": addresses, "score": score})
+    return results
+
+
+def choose_mirror(results, hysteresis=MIRROR_HYSTERESIS):
+    """The best host from probe_mirrors, or None if the current host (the first) should stay."""
+    current = results[0]
+    best = min(results, key=lambda result: result["score"])
+    if best is current or best["score"] == float("inf"):
+        return None
+    if current["score"] != float("inf") and best["score"] >= current["score"] * (1 - hysteresis):
+        return None
+    return best["host"]
+
+
+def use_mirror(config, pool_index, host):
+    """Point the pool at `pool_index` (1-based) at `host`. Its pool_key, and so its schedules, don't change."""
+    with config_store.lock:
+        old_url = config["pools"][pool_index - 1]["url"]
+        set_pool_url(config, pool_index, replace_host(old_url, host), cause="mirror")
+        print(f"{GREEN}Pool {pool_index}: {old_url} -> {config['pools'][pool_index - 1]['url']}{RESET}")
+
+
+async def select_mirrors(config, indices=None, dns=None, rounds=MIRROR_ROUNDS, apply=True):
+    """Probe the mirrors of the given pools (default: all with known mirrors) at once.
+
+    Returns {pool index: probe results}; with `apply`, pools with a faster mirror are rewritten.
+    """
+    pools = config.get("pools", [])
+    if indices is None:
+        indices = [idx for idx, pool in enumerate(pools, start=1) if len(candidate_hosts(pool)) > 1]
+    indices = [idx for idx in indices if candidate_hosts(pools[idx - 1])]
+    probed = await asyncio.gather(*(probe_mirrors(pools[idx - 1], dns, rounds) for idx in indices))
+    reports = dict(zip(indices, probed))
+    if apply:
+        for idx, results in reports.items():
+            host = choose_mirror(results)
+            if host is not None:
+                use_mirror(config, idx, host)
+    return reports
+
+
+def _format_ms(value):
+    return f"{value:.1f} ms" if value is not None else "n/a"
+
+
+def print_mirrors(config, reports):
+    """Print each probed pool's mirrors with their addresses' median latency."""
+    if not reports:
+        print(f"{RED}No pools with known mirrors; add some with register_mirrors().{RESET}")
+        return
+    pools = config.get("pools", [])
+    for idx, results in reports.items():
+        current, _ = parse_pool_url(pools[idx - 1].get("url", ""))
+        print(f"\n{CYAN}Pool {idx} ({get_domain(current)}):{RESET}")
+        for result in sorted(results, key=lambda result: result["score"]):
+            marker = f" {GREEN}<- in use{RESET}" if result["host"] == current.lower() else ""
+            if not result["addresses"]:
+                print(f"  {BOLD}{result['host']}{RESET}  {RED}does not resolve{RESET}{marker}")
+                continue
+            latencies = ", ".join(f"{address} {_format_ms(stats.p50)}" for address, stats in result["addresses"].items())
+            print(f"  {BOLD}{result['host']}{RESET}  {latencies}{marker}")
+
+
+def run_mirror_selection(config, indices=None, rounds=MIRROR_ROUNDS, apply=True):
+    """Probe mirrors, switch pools to faster ones if `apply`, and print the results."""
+    if not config.get("pools"):
+        print(f"{RED}No pools found in the configuration.{RESET}")
+        return None
+    print(f"{CYAN}Resolving and probing pool mirrors...{RESET}")
+    reports = asyncio.run(select_mirrors(config, indices, rounds=rounds, apply=apply))
+    print_mirrors(config, reports)
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Point pools at their fastest regional mirror.")
+    parser.add_argument("--pool", type=int, action="append", help="1-based pool number (repeatable; default: all)")
+    parser.add_argument("--rounds", type=int, default=MIRROR_ROUNDS, help="handshakes per address")
+    parser.add_argument("--dry-run", action="store_true", help="only show the probe results")
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    if config is None:
+        return 1
+    if args.pool and not all(1 <= idx <= len(config.get("pools", [])) for idx in args.pool):
+        print(f"{RED}Invalid pool number.{RESET}")
+        return 1
+    started = time.perf_counter()
+    reports = run_mirror_selection(config, args.pool, args.rounds, apply=not args.dry_run)
+    if reports is None:
+        return 1
+    print(f"{ORANGE}Probed in {time.perf_counter() - started:.2f}s.{RESET}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+import argparse
+import copy
+import glob
+import math
+import os
+import re
+import shutil
+import sys
+import time
+from core.autotune import SYSFS_ROOT, autotune_store, fingerprint, parse_cpu_list, read_topology
+from core.config_manager import ConfigStore, config_store, load_config, serialize_config
+from core.pool_manager import add_listener, cpu_layout_section
+from core.supervisor import XMRIG_DIR, XMRIG_PATH, XmrigSupervisor, find_xmrig, supervisor
+from utils.helpers import BOLD, CYAN, GREEN, ORANGE, RED, RESET
+
+MEMINFO = "/proc/meminfo"
+PROC_ROOT = "/proc"
+RX_DATASET_KB = 2080 * 1024  # RandomX dataset, one per instance
+RX_CACHE_KB = 256 * 1024  # RandomX cache the dataset is built from
+RX_SCRATCHPAD_KB = 2 * 1024  # Per mining thread
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _read(path, default=None):
+    try:
+        with open(path, "r") as file:
+            return file.read().strip()
+    except OSError:
+        return default
+
+
+def read_meminfo(path=MEMINFO):
+    """Parse /proc/meminfo into {field: value}, values in kB (or a page count for HugePages_*)."""
+    meminfo = {}
+    try:
+        with open(path, "r") as file:
+            for line in file:
+                name, _, value = line.partition(":")
+                if value.split():
+                    meminfo[name.strip()] = int(value.split()[0])
+    except OSError:
+        pass
+    return meminfo
+
+
+def instance_memory_kb(threads):
+    """Memory one RandomX instance with `threads` threads needs, in kB."""
+    return RX_DATASET_KB + RX_CACHE_KB + threads * RX_SCRATCHPAD_KB
+
+
+def hugepage_shortfall(threads, meminfo=None, held=0):
+    """Hugepages missing system-wide for one instance with `threads` threads (0 if enough).
+
+    `held` pages already belong to the xmrig being reconfigured; it keeps or
+    reuses them, so they count as available alongside HugePages_Free.
+    """
+    meminfo = read_meminfo() if meminfo is None else meminfo
+    available = meminfo.get("HugePages_Free", 0) + held
+    return max(0, pages_needed(threads, meminfo.get("Hugepagesize", 2048)) - available)
+
+
+def process_hugepages(pid, page_kb=2048, proc=PROC_ROOT):
+    """Hugepages mapped by process `pid`, from its smaps_rollup; None if unreadable."""
+    held_kb = 0
+    try:
+        with open(os.path.join(proc, str(pid), "smaps_rollup"), "r") as file:
+            for line in file:
+                name, _, value = line.partition(":")
+                if name in ("Private_Hugetlb", "Shared_Hugetlb"):
+                    held_kb += int(value.split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return held_kb // page_kb
+
+
+def xmrig_hugepages(page_kb=2048, proc=PROC_ROOT):
+    """Hugepages the supervised xmrig holds: 0 if it isn't running, None if it is but they can't be read."""
+    if not (supervisor.attach() and supervisor.is_running()):
+        return 0
+    return process_hugepages(supervisor.pid, page_kb, proc)
+
+
+def pages_needed(threads, page_kb=2048):
+    """Hugepages one RandomX instance with `threads` threads needs (1168 + threads at 2 MiB)."""
+    return math.ceil(instance_memory_kb(threads) / page_kb)
+
+
+def read_nodes(root=SYSFS_ROOT):
+    """Return [(node id, online CPUs)] for NUMA nodes that have CPUs."""
+    online = set(parse_cpu_list(_read(os.path.join(root, "cpu/online")))) or None
+    nodes = []
+    for path in glob.glob(os.path.join(root, "node/node[0-9]*")):
+        cpus = [cpu for cpu in parse_cpu_list(_read(os.path.join(path, "cpulist"))) if online is None or cpu in online]
+        if cpus:
+            nodes.append((int(path.rsplit("node", 1)[1]), cpus))
+    return sorted(nodes)
+
+
+def node_free_pages(node, page_kb=2048, root=SYSFS_ROOT):
+    """Free hugepages of `page_kb` on a NUMA node, or None if sysfs doesn't say."""
+    value = _read(os.path.join(root, f"node/node{node}/hugepages/hugepages-{page_kb}kB/free_hugepages"))
+    return int(value) if value is not None and value.isdigit() else None
+
+
+def plan_instances(root=SYSFS_ROOT, meminfo=None):
+    """Plan one xmrig instance per NUMA node and check its hugepages.
+
+    Each instance gets its node's share of the cached autotune layout for this
+    topology, or the node's physical cores if it was never tuned. Every entry
+    records the pages it needs, the pages free on its node and the shortfall.
+    """
+    meminfo = read_meminfo() if meminfo is None else meminfo
+    page_kb = meminfo.get("Hugepagesize", 2048)
+    topology = read_topology(root)
+    tuned = (autotune_store.load() or {}).get(fingerprint(topology))
+    physical = {siblings[0] for siblings in topology["cores"]}
+    nodes = read_nodes(root) or [(0, topology["cpus"])]
+    plan = []
+    for node, node_cpus in nodes:
+        if tuned:
+            cpus = [cpu for cpu in tuned["layout"] if cpu in node_cpus]
+        else:
+            cpus = [cpu for cpu in node_cpus if cpu in physical]
+        if not cpus:
+            continue
+        free = node_free_pages(node, page_kb, root) if len(nodes) > 1 else None
+        if free is None and len(nodes) == 1:
+            free = meminfo.get("HugePages_Free", 0)
+        needed = pages_needed(len(cpus), page_kb)
+        plan.append({"node": node, "cpus": cpus, "pages_needed": needed, "pages_free": free or 0,
+                     "shortfall": max(0, needed - (free or 0)), "page_kb": page_kb})
+    return plan
+
+
+def fallback_plan(plan, meminfo=None):
+    """Shrink a plan whose hugepages fall short; returns (plan, note) or (None, note).
+
+    Drops the nodes that are short if others are fully backed. Failing that,
+    runs a single instance over all CPUs if the system-wide free pages cover
+    it. Otherwise no plan runs at full speed.
+    """
+    if not any(instance["shortfall"] for instance in plan):
+        return plan, None
+    backed = [instance for instance in plan if not instance["shortfall"]]
+    if backed:
+        dropped = ", ".join(f"node{instance['node']}" for instance in plan if instance["shortfall"])
+        return backed, f"dropped {dropped} (not enough hugepages)"
+    meminfo = read_meminfo() if meminfo is None else meminfo
+    cpus = [cpu for instance in plan for cpu in instance["cpus"]]
+    page_kb = meminfo.get("Hugepagesize", 2048)
+    free = meminfo.get("HugePages_Free", 0)
+    needed = pages_needed(len(cpus), page_kb)
+    if free >= needed:
+        single = {"node": None, "cpus": cpus, "pages_needed": needed, "pages_free": free,
+                  "shortfall": 0, "page_kb": page_kb}
+        return [single], "running a single instance across all nodes"
+    return None, f"even one instance needs {needed} hugepages and only {free} are free"
+
+
+def print_plan(plan, meminfo=None):
+    """Print each planned instance with its hugepage budget and how to fix any shortfall."""
+    meminfo = read_meminfo() if meminfo is None else meminfo
+    print(f"\n{CYAN}NUMA instance plan:{RESET}")
+    for instance in plan:
+        name = f"node{instance['node']}" if instance["node"] is not None else "all nodes"
+        status = f"{GREEN}ok{RESET}" if not instance["shortfall"] else f"{RED}short by {instance['shortfall']} pages{RESET}"
+        print(f"  {BOLD}{name}{RESET}: {len(instance['cpus'])} threads on CPUs {','.join(map(str, instance['cpus']))}"
+              f"  hugepages {instance['pages_free']}/{instance['pages_needed']} {status}")
+        if instance["shortfall"] and instance["node"] is not None:
+            print(f"    echo {instance['pages_needed']} | sudo tee /sys/devices/system/node/node{instance['node']}"
+                  f"/hugepages/hugepages-{instance['page_kb']}kB/nr_hugepages")
+    unbacked_kb = sum(instance_memory_kb(len(instance["cpus"])) for instance in plan if instance["shortfall"])
+    available = meminfo.get("MemAvailable")
+    if unbacked_kb and available is not None and available < unbacked_kb:
+        print(f"{RED}  Not even regular memory suffices: {unbacked_kb // 1024} MiB needed, "
+              f"{available // 1024} MiB available.{RESET}")
+
+
+def instance_config(config, instance, position):
+    """xmrig config for one instance: its own CPUs and, if the HTTP API is on, its own port."""
+    return _instance_overrides(config, cpu_layout_section(instance["cpus"]), position)
+
+
+def _instance_overrides(config, cpu, position):
+    generated = copy.deepcopy(config)
+    generated["cpu"] = cpu
+    generated["background"] = False
+    generated.setdefault("randomx", {})["numa"] = True
+    if generated.get("http", {}).get("port"):
+        generated["http"]["port"] += position
+    return generated
+
+
+def _instance_name(instance):
+    return f"node{instance['node']}" if instance["node"] is not None else "all"
+
+
+def _config_path(name):
+    return os.path.join(XMRIG_DIR, f"config-{name}.json")
+
+
+def _pidfile(name):
+    return os.path.join(PROJECT_DIR, f"xmrig-{name}.pid")
+
+
+def _write_config(path, config):
+    """Write atomically, so an instance watching its config never reads half of it."""
+    ConfigStore(path, debounce=0).save(config)
+
+
+def launched_instances():
+    """Names of the instances launched from this project whose pidfile is still there."""
+    names = [os.path.basename(path)[len("xmrig-"):-len(".pid")] for path in glob.glob(_pidfile("*"))]
+    return sorted(name for name in names if re.fullmatch(r"node\d+|all", name))
+
+
+def refresh_instance_configs(config, cause=None):
+    """Regenerate the launched instances' configs from `config`, keeping each one's CPUs and API port.
+
+    A pool_manager listener (see follow_pool_changes): switches, schedules,
+    failover and ranking only rewrite config.json, while each instance watches
+    its own file. Returns the names of the configs rewritten.
+    """
+    rewritten = []
+    for name in launched_instances():
+        store = ConfigStore(_config_path(name), debounce=0)
+        current = store.load() if store.exists() else None
+        if not current or "cpu" not in current:
+            continue
+        generated = _instance_overrides(config, current["cpu"], 0)
+        if generated.get("http", {}).get("port") and current.get("http", {}).get("port"):
+            generated["http"]["port"] = current["http"]["port"]
+        if store.save(generated):
+            rewritten.append(name)
+    return rewritten
+
+
+def follow_pool_changes():
+    """Keep per-node configs in step with config.json changes made in this process (no-op when nothing runs)."""
+    add_listener(refresh_instance_configs)
+
+
+def main_xmrig(exclude=()):
+    """PID of a mining xmrig other than the per-node instances (`exclude`), or None."""
+    if supervisor.attach() and supervisor.is_running() and supervisor.pid not in exclude:
+        return supervisor.pid
+    return find_xmrig(exclude)
+
+
+def launch_instances(config, plan, xmrig=XMRIG_PATH, replace=False):
+    """Write a config per instance and start each one under its own supervisor, bound to its node.
+
+    Refuses (returns None) while the main xmrig mines, as the rig would mine
+    twice over the same CPUs, unless `replace` stops it first.
+    """
+    supervisors = []
+    for position, instance in enumerate(plan):
+        name = _instance_name(instance)
+        supervisors.append(XmrigSupervisor(xmrig, cwd=XMRIG_DIR, log_file=os.path.join(XMRIG_DIR, f"xmrig-{name}.log"),
+                                           pidfile=_pidfile(name)))
+    running = {instance.pid for instance in supervisors if instance.attach()}
+    main_pid = main_xmrig(running)
+    if main_pid is not None:
+        if not replace:
+            print(f"{RED}Not launching: xmrig (pid {main_pid}) is already mining on every node; "
+                  f"stop it or use --replace.{RESET}")
+            return None
+        if supervisor.pid != main_pid:
+            supervisor.adopt(main_pid)
+        supervisor.stop()
+        print(f"{ORANGE}Stopped xmrig (pid {main_pid}) to run one instance per node.{RESET}")
+
+    numactl = shutil.which("numactl")
+    for position, (instance, node_supervisor) in enumerate(zip(plan, supervisors)):
+        name = _instance_name(instance)
+        config_path = _config_path(name)
+        _write_config(config_path, instance_config(config, instance, position))
+        if numactl and instance["node"] is not None:
+            node_supervisor.binary = numactl
+            node_supervisor.args = [f"--cpunodebind={instance['node']}", f"--membind={instance['node']}", xmrig,
+                                    "--config", config_path]
+        else:
+            node_supervisor.args = ["--config", config_path]
+        if node_supervisor.pid is None:
+            node_supervisor.start()
+        print(f"{GREEN}xmrig {name} running (pid {node_supervisor.pid}) with {config_path}.{RESET}")
+    follow_pool_changes()
+    return supervisors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run one xmrig instance per NUMA node.")
+    parser.add_argument("--launch", action="store_true", help="start the instances (default: only show the plan)")
+    parser.add_argument("--fallback", action="store_true", help="shrink the plan instead of refusing on a hugepage shortfall")
+    parser.add_argument("--supervise", action="store_true", help="stay in the foreground restarting crashed instances")
+    parser.add_argument("--replace", action="store_true", help="stop the main xmrig if it is running instead of refusing")
+    parser.add_argument("--xmrig", default=XMRIG_PATH)
+    parser.add_argument("--sysfs", default=SYSFS_ROOT, help="sysfs directory holding cpu/ and node/")
+    parser.add_argument("--meminfo", default=MEMINFO)
+    args = parser.parse_args(argv)
+
+    meminfo = read_meminfo(args.meminfo)
+    plan = plan_instances(args.sysfs, meminfo)
+    print_plan(plan, meminfo)
+    if not args.launch:
+        return 0
+    if any(instance["shortfall"] for instance in plan):
+        if not args.fallback:
+            print(f"{RED}Not launching: hugepages fall short (use --fallback to run a smaller plan).{RESET}")
+            return 1
+        plan, note = fallback_plan(plan, meminfo)
+        if plan is None:
+            print(f"{RED}Not launching: {note}.{RESET}")
+            return 1
+        print(f"{ORANGE}Falling back: {note}.{RESET}")
+    config = load_config()
+    if config is None:
+        return 1
+    supervisors = launch_instances(config, plan, args.xmrig, args.replace)
+    if supervisors is None:
+        return 1
+    if args.supervise:
+        seen = serialize_config(config)
+        try:
+            while True:
+                time.sleep(1.0)
+                for instance in supervisors:
+                    instance.check()
+                # Pool changes made by other processes (daemon, scheduler) only reach config.json
+                latest = config_store.load()
+                if latest is not None and serialize_config(latest) != seen:
+                    seen = serialize_config(latest)
+                    refresh_instance_configs(latest, "file")
+        except KeyboardInterrupt:
+            print(f"{CYAN}Stopped supervising; the instances keep running.{RESET}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
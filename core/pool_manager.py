@@ -1,7 +1,25 @@
 import os
-from core.config_manager import save_config
+from core.config_manager import config_store, save_config
 from utils.helpers import BOLD, RESET, CYAN, RED, GREEN
-from utils.helpers import get_domain
+from utils.helpers import get_domain, parse_pool_url
+from utils.metrics import counter, histogram
+
+pool_switches = counter("pool_switches_total", "Times a different pool was put on top, by pool and cause.", ("pool", "cause"))
+pool_switch_seconds = histogram("pool_switch_seconds", "Time to reorder the pools and queue the config write.")
+
+_listeners = []  # Called after the pools or the CPU threads change
+
+def add_listener(callback):
+    """Call `callback(config, cause)` after the pools or CPU threads change; cause is "cpu" for threads."""
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+def remove_listener(callback):
+    _listeners.remove(callback)
+
+def _notify(config, cause):
+    for callback in list(_listeners):
+        callback(config, cause)
 
 def configure_cores(config):
     """Allow the user to configure the number of cores for mining."""
@@ -15,11 +33,7 @@ def configure_cores(config):
         try:
             num_cores = int(input(f"Enter the number of cores to use (1-{total_cores}): "))
             if 1 <= num_cores <= total_cores:
-                # Update the config.json file
-                config["cpu"] = {"enabled": True, "huge-pages": True, "pools": config.get("pools", [])}
-                config["cpu"]["threads"] = [{"low_power_mode": False, "affine_to_cpu": i} for i in range(num_cores)]
-
-                save_config(config)
+                set_cpu_threads(config, num_cores)
                 print(f"{GREEN}Configuration updated: Using {num_cores} cores for mining.{RESET}")
                 break
             else:
@@ -27,6 +41,70 @@ def configure_cores(config):
         except ValueError:
             print(f"{RED}Invalid input. Please enter a valid number.{RESET}")
 
+def pool_key(pool):
+    """Stable identity of a pool that survives reordering and difficulty tuning: its URL (domain and port) plus user."""
+    from core.diff_tuner import base_user
+    url = pool.get("url", "")
+    try:
+        host, port = parse_pool_url(url)
+        url = f"{get_domain(host.lower())}:{port}"
+    except ValueError:
+        pass
+    return f"{url}|{base_user(pool)}"
+
+def find_pool(config, key):
+    """Return the 1-based position of the pool with identity `key`, or None."""
+    url, _, user = key.partition("|")
+    key = pool_key({"url": url, "user": user})  # Keys saved before difficulty tuning may still carry one
+    for idx, pool in enumerate(config.get("pools", []), start=1):
+        if pool_key(pool) == key:
+            return idx
+    return None
+
+def cpu_layout_section(cpus):
+    """Build the xmrig "cpu" section with one thread pinned to each CPU in `cpus`."""
+    return {
+        "enabled": True,
+        "huge-pages": True,
+        "threads": [{"low_power_mode": False, "affine_to_cpu": cpu} for cpu in cpus]
+    }
+
+def cpu_section(cores):
+    """Build the xmrig "cpu" section for `cores` threads pinned to CPUs 0..cores-1."""
+    return cpu_layout_section(range(cores))
+
+def warn_hugepages(threads):
+    """Warn when "huge-pages" is on but too few are reserved; xmrig would silently run slower."""
+    from core.numa import hugepage_shortfall, xmrig_hugepages
+    held = xmrig_hugepages()
+    if held is None:
+        return  # xmrig runs but its pages can't be counted; HugePages_Free alone would undercount
+    shortfall = hugepage_shortfall(threads, held=held)
+    if shortfall:
+        print(f"{RED}Warning: {shortfall} more 2 MiB hugepages are needed for {threads} threads; "
+              f"xmrig will fall back to regular pages and mine slower (see python3 -m core.numa).{RESET}")
+
+def set_cpu_threads(config, cores):
+    """Mine with `cores` threads pinned to CPUs 0..cores-1."""
+    max_cores = os.cpu_count() or 1
+    if not 1 <= cores <= max_cores:
+        raise ValueError(f"Core count must be between 1 and {max_cores}")
+    with config_store.lock:
+        config["cpu"] = cpu_section(cores)
+        save_config(config)
+    _notify(config, "cpu")
+    warn_hugepages(cores)
+
+def set_cpu_layout(config, cpus):
+    """Mine with one thread pinned to each CPU in `cpus` (e.g. a layout picked by autotune)."""
+    if not cpus:
+        raise ValueError("A CPU layout needs at least one CPU")
+    with config_store.lock:
+        config["cpu"] = cpu_layout_section(cpus)
+        save_config(config)
+    _notify(config, "cpu")
+    warn_hugepages(len(cpus))
+
 def show_pools(config):
     """List all pools in the config.json."""
     pools = config.get("pools", [])
@@ -38,19 +116,92 @@ def show_pools(config):
         domain = get_domain(pool.get("url", "N/A"))
         print(f"  {BOLD}{idx}. Domain:{RESET} {domain}")
 
-def set_pool_on_top(config, pool_index):
-    """Move a specific pool to the top of the list."""
-    pools = config.get("pools", [])
-    if not pools:
-        print(f"{RED}No pools found in the configuration.{RESET}")
-        return False
-    if 1 <= pool_index <= len(pools):
-        pool = pools.pop(pool_index - 1)
-        pools.insert(0, pool)
-        config["pools"] = pools
-        print(f"{GREEN}Moved pool with domain {get_domain(pool['url'])} to the top of the list.{RESET}")
+def set_pool_on_top(config, pool_index, cause="manual"):
+    """Move a specific pool to the top of the list. `cause` only labels the switch metric."""
+    with config_store.lock:
+        pools = config.get("pools", [])
+        if not pools:
+            print(f"{RED}No pools found in the configuration.{RESET}")
+            return False
+        if not 1 <= pool_index <= len(pools):
+            print(f"{RED}Invalid number. Enter a number between 1 and {len(pools)}.{RESET}")
+            return False
+        with pool_switch_seconds.time():
+            pool = pools.pop(pool_index - 1)
+            pools.insert(0, pool)
+            config["pools"] = pools
+            save_config(config)
+    print(f"{GREEN}Moved pool with domain {get_domain(pool['url'])} to the top of the list.{RESET}")
+    if pool_index != 1:
+        pool_switches.inc(pool=get_domain(pool.get("url", "")), cause=cause)
+        _notify(config, cause)
+    return True
+
+def set_pool_users(config, changes, cause="user"):
+    """Replace pools' users (wallet, worker and any fixed difficulty) with one write and one notification.
+
+    `changes` maps a 1-based pool index to (old user, new user). A pool whose
+    user is no longer the old one (the pools were reordered or edited since)
+    is left alone. Returns the indexes changed.
+    """
+    with config_store.lock:
+        pools = config.get("pools", [])
+        changed = [idx for idx, (old, _) in changes.items()
+                   if 1 <= idx <= len(pools) and pools[idx - 1].get("user", "") == old]
+        for idx in changed:
+            pools[idx - 1]["user"] = changes[idx][1]
+        if changed:
+            save_config(config)
+    if changed:
+        _notify(config, cause)
+    return changed
+
+def set_pool_url(config, pool_index, url, cause="url"):
+    """Replace the URL of the pool at `pool_index` (1-based), e.g. with a regional mirror of the same pool."""
+    with config_store.lock:
+        config["pools"][pool_index - 1]["url"] = url
         save_config(config)
-        return True
-    else:
-        print(f"{RED}Invalid number. Enter a number between 1 and {len(pools)}.{RESET}")
-        return False
+    _notify(config, cause)
+
+def _overtakes(score, other_score, hysteresis):
+    """Return True if a pool scoring `score` should move above one scoring `other_score`."""
+    if other_score == float("inf"):
+        return score != float("inf")
+    return score < other_score * (1 - hysteresis)
+
+def rank_pools(config, scores, hysteresis=0.0):
+    """Reorder the pools by score (lower is better), saving only if the order changed.
+
+    `scores` is a list aligned with config["pools"], or a function returning one
+    for a list of pools. A function is called under the config lock, so callers
+    that awaited something since reading the pools (while failover or gossip
+    reordered them) can't apply scores to the wrong pools. A pool only overtakes
+    the one above it when its score is better by more than the `hysteresis`
+    fraction, so small fluctuations don't make the order flap.
+    """
+    with config_store.lock:
+        pools = config.get("pools", [])
+        if not pools:
+            print(f"{RED}No pools found in the configuration.{RESET}")
+            return False
+        if callable(scores):
+            scores = scores(pools)
+        if len(scores) != len(pools):
+            raise ValueError(f"Expected {len(pools)} scores, got {len(scores)}.")
+        ranked = list(zip(pools, scores))
+        for i in range(1, len(ranked)):
+            j = i
+            while j > 0 and _overtakes(ranked[j][1], ranked[j - 1][1], hysteresis):
+                ranked[j - 1], ranked[j] = ranked[j], ranked[j - 1]
+                j -= 1
+        ordered = [pool for pool, _ in ranked]
+        if all(a is b for a, b in zip(ordered, pools)):
+            return False
+        with pool_switch_seconds.time():
+            config["pools"] = ordered
+            save_config(config)
+    print(f"{GREEN}Pools reordered: {', '.join(get_domain(pool.get('url', 'N/A')) for pool in ordered)}.{RESET}")
+    if ordered[0] is not pools[0]:
+        pool_switches.inc(pool=get_domain(ordered[0].get("url", "")), cause="ranking")
+    _notify(config, "ranking")
+    return True
@@ -0,0 +1,157 @@
+import asyncio
+import ssl
+import time
+from collections import deque
+from core.pool_manager import rank_pools
+from utils.helpers import BOLD, CYAN, RED, RESET, get_domain, parse_pool_url
+
+PROBE_INTERVAL = 30  # Seconds between probe rounds
+PROBE_TIMEOUT = 5.0  # Seconds before a handshake counts as lost
+WINDOW_SIZE = 20  # Number of rounds kept per pool
+HYSTERESIS = 0.2  # A pool must be 20% better to overtake the one above it
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class PoolStats:
+    """Rolling RTT and failure statistics for a single pool."""
+
+    def __init__(self, window=WINDOW_SIZE):
+        self.samples = deque(maxlen=window)  # RTT in ms, or None for a failed probe
+
+    def record(self, rtt):
+        self.samples.append(rtt)
+
+    def successes(self):
+        return [rtt for rtt in self.samples if rtt is not None]
+
+    @property
+    def loss(self):
+        if not self.samples:
+            return 0.0
+        return 1 - len(self.successes()) / len(self.samples)
+
+    @property
+    def p50(self):
+        return percentile(self.successes(), 50)
+
+    @property
+    def p95(self):
+        return percentile(self.successes(), 95)
+
+    def score(self, timeout=PROBE_TIMEOUT):
+        """Score used for ranking (lower is better): p50 with lost probes counted as timeouts."""
+        p50 = self.p50
+        if p50 is None:
+            return float("inf")
+        return p50 * (1 - self.loss) + timeout * 1000 * self.loss
+
+
+def tls_context():
+    """SSL context for pool connections."""
+    # Pools commonly use self-signed certificates; xmrig only pins them via tls-fingerprint.
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def probe_pool(url, tls=False, timeout=PROBE_TIMEOUT):
+    """Time a TCP (and optionally TLS) handshake with a pool. Returns RTT in ms or None."""
+    try:
+        host, port = parse_pool_url(url)
+    except ValueError:
+        return None
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=tls_context() if tls else None), timeout
+        )
+    except (OSError, asyncio.TimeoutError, ssl.SSLError):
+        return None
+    rtt = (time.perf_counter() - start) * 1000
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (OSError, ssl.SSLError):
+        pass
+    return rtt
+
+
+class PoolProber:
+    """Probe every configured pool concurrently and keep rolling statistics per URL."""
+
+    def __init__(self, window=WINDOW_SIZE, timeout=PROBE_TIMEOUT):
+        self.window = window
+        self.timeout = timeout
+        self.stats = {}
+
+    def stats_for(self, pool):
+        url = pool.get("url", "")
+        if url not in self.stats:
+            self.stats[url] = PoolStats(self.window)
+        return self.stats[url]
+
+    async def probe_all(self, pools):
+        """Run one probe round against all pools at once; takes about one RTT overall."""
+        results = await asyncio.gather(
+            *(probe_pool(pool.get("url", ""), pool.get("tls", False), self.timeout) for pool in pools)
+        )
+        for pool, rtt in zip(pools, results):
+            self.stats_for(pool).record(rtt)
+        return results
+
+    def scores(self, pools):
+        return [self.stats_for(pool).score(self.timeout) for pool in pools]
+
+
+def _format_ms(value):
+    return f"{value:.1f} ms" if value is not None else "n/a"
+
+
+def print_probe_stats(prober, pools):
+    """Print the rolling statistics for each pool in its current order."""
+    print(f"\n{CYAN}Pool latency (last {prober.window} rounds):{RESET}")
+    for idx, pool in enumerate(pools, start=1):
+        stats = prober.stats_for(pool)
+        color = RED if stats.loss >= 1 else ""
+        print(f"  {BOLD}{idx}. {get_domain(pool.get('url', 'N/A'))}{RESET}{color}"
+              f"  p50 {_format_ms(stats.p50)}  p95 {_format_ms(stats.p95)}"
+              f"  loss {stats.loss:.0%}{RESET}")
+
+
+async def probe_loop(config, interval=PROBE_INTERVAL, rounds=None, reorder=True, prober=None):
+    """Probe all pools every `interval` seconds and rank them by the rolling statistics."""
+    prober = prober or PoolProber()
+    completed = 0
+    while rounds is None or completed < rounds:
+        started = time.monotonic()
+        pools = config.get("pools", [])
+        await prober.probe_all(pools)
+        completed += 1
+        if reorder:
+            rank_pools(config, prober.scores, HYSTERESIS)
+        print_probe_stats(prober, config.get("pools", []))
+        if rounds is None or completed < rounds:
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+    return prober
+
+
+def run_probe(config, interval=PROBE_INTERVAL, rounds=None, reorder=True):
+    """Run the latency prober until interrupted (or for a fixed number of rounds)."""
+    if not config.get("pools"):
+        print(f"{RED}No pools found in the configuration.{RESET}")
+        return None
+    print(f"{CYAN}Probing {len(config['pools'])} pools every {interval}s. Press Ctrl+C to stop.{RESET}")
+    try:
+        return asyncio.run(probe_loop(config, interval, rounds, reorder))
+    except KeyboardInterrupt:
+        print(f"\n{CYAN}Probing stopped.{RESET}")
+        return None
@@ -0,0 +1,206 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from core.pool_manager import rank_pools
+from utils.helpers import BOLD, CYAN, RED, RESET, get_domain, parse_pool_url
+from utils.http_session import HTTP_TIMEOUT, make_session
+
+ATOMIC_UNITS = 1e12  # Piconero per XMR
+STATS_TTL = 300  # Seconds a pool's stats are reused before fetching again
+DEFAULT_HASHRATE = 1000.0  # H/s; only scales the estimate, the ranking doesn't depend on it
+HYSTERESIS = 0.05  # A pool must earn 5% more to overtake the one above it
+MAX_WORKERS = 16
+
+
+def wallet_address(user):
+    """Strip fixed-difficulty and worker suffixes ('addr+50000', 'addr.rig1') from a pool user."""
+    return re.split(r"[+.]", user or "", maxsplit=1)[0]
+
+
+class PoolStatsAdapter:
+    """Fetch a pool's public statistics from its API.
+
+    Subclasses implement `fetch_pool`, returning a dict with `fee` (fraction),
+    `hashrate` (H/s), `effort` (fraction of the network difficulty),
+    `payout_threshold` and `min_payout` (XMR), and may implement `fetch_network`,
+    returning `difficulty` and `reward` (XMR).
+    """
+
+    def __init__(self, api_url):
+        self.api_url = api_url.rstrip("/")
+
+    def get_json(self, session, path, timeout=HTTP_TIMEOUT):
+        response = session.get(f"{self.api_url}{path}", timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_pool(self, session, pool, timeout=HTTP_TIMEOUT):
+        raise NotImplementedError
+
+    def fetch_network(self, session, timeout=HTTP_TIMEOUT):
+        return None
+
+
+class NodejsPoolAdapter(PoolStatsAdapter):
+    """Adapter for pools running nodejs-pool (SupportXMR, MoneroOcean and many others)."""
+
+    def fetch_network(self, session, timeout=HTTP_TIMEOUT):
+        network = self.get_json(session, "/network/stats", timeout)
+        return {"difficulty": float(network["difficulty"]), "reward": network["value"] / ATOMIC_UNITS}
+
+    def fetch_pool(self, session, pool, timeout=HTTP_TIMEOUT):
+        stats = self.get_json(session, "/pool/stats", timeout)["pool_statistics"]
+        config = self.get_json(session, "/config", timeout)
+        network = self.fetch_network(session, timeout)
+        min_payout = config.get("min_wallet_payout", 0) / ATOMIC_UNITS
+        threshold = min_payout
+        address = wallet_address(pool.get("user"))
+        if address:
+            try:
+                user = self.get_json(session, f"/user/{address}", timeout)
+                threshold = user.get("payout_threshold", config.get("min_wallet_payout", 0)) / ATOMIC_UNITS
+            except (requests.RequestException, ValueError):
+                pass  # Unknown wallets just get the pool default
+        return {
+            "fee": config.get("pplns_fee", 0) / 100,
+            "hashrate": float(stats.get("hashRate", 0)),
+            "effort": stats.get("roundHashes", 0) / network["difficulty"] if network["difficulty"] else None,
+            "payout_threshold": threshold,
+            "min_payout": min_payout,
+            "network": network,
+        }
+
+
+ADAPTERS = {"nodejs-pool": NodejsPoolAdapter}
+
+# Pool host or domain -> (adapter name, API base URL)
+POOL_APIS = {
+    "supportxmr.com": ("nodejs-pool", "https://supportxmr.com/api"),
+    "moneroocean.stream": ("nodejs-pool", "https://api.moneroocean.stream"),
+    "monerohash.com": ("nodejs-pool", "https://api.monerohash.com"),
+}
+
+
+def register_adapter(name, adapter_class):
+    """Make an adapter class available to register_pool_api under `name`."""
+    ADAPTERS[name] = adapter_class
+
+
+def register_pool_api(host, adapter_name, api_url):
+    """Tell the engine which adapter and API URL serve the pool at `host` (or its domain)."""
+    if adapter_name not in ADAPTERS:
+        raise ValueError(f"Unknown pool stats adapter: {adapter_name}")
+    POOL_APIS[host] = (adapter_name, api_url)
+
+
+def adapter_for(pool):
+    """Return the stats adapter for a pool, or None if its API is unknown."""
+    try:
+        host, _ = parse_pool_url(pool.get("url", ""))
+    except ValueError:
+        return None
+    entry = POOL_APIS.get(host) or POOL_APIS.get(get_domain(host))
+    if entry is None:
+        return None
+    adapter_name, api_url = entry
+    return ADAPTERS[adapter_name](api_url)
+
+
+class ProfitabilityEngine:
+    """Fetch pool stats concurrently, cache them per pool and rank pools by expected earnings."""
+
+    def __init__(self, hashrate=DEFAULT_HASHRATE, ttl=STATS_TTL, timeout=HTTP_TIMEOUT, session=None):
+        self.hashrate = hashrate
+        self.ttl = ttl
+        self.timeout = timeout
+        self.session = session or make_session(MAX_WORKERS)
+        self.errors = {}
+        self._cache = {}  # Pool URL -> (fetched_at, stats)
+        self._lock = threading.Lock()
+
+    def _fetch(self, pool):
+        url = pool.get("url", "")
+        adapter = adapter_for(pool)
+        if adapter is None:
+            self.errors[url] = "no stats adapter for this pool"
+            return None
+        try:
+            stats = adapter.fetch_pool(self.session, pool, self.timeout)
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            self.errors[url] = str(e)
+            return None
+        self.errors.pop(url, None)
+        with self._lock:
+            self._cache[url] = (time.monotonic(), stats)
+        return stats
+
+    def _cached(self, pool):
+        with self._lock:
+            entry = self._cache.get(pool.get("url", ""))
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def fetch_all(self, pools):
+        """Return stats for each pool (None where unavailable), fetching stale ones concurrently."""
+        results = [self._cached(pool) for pool in pools]
+        stale = [i for i, stats in enumerate(results) if stats is None]
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(stale))) as executor:
+                for i, stats in zip(stale, executor.map(self._fetch, [pools[i] for i in stale])):
+                    results[i] = stats
+        return results
+
+    def expected_xmr_per_hour(self, stats):
+        """Expected XMR/hour for our hashrate on a pool, net of its fee."""
+        if not stats or not stats["network"]["difficulty"]:
+            return None
+        network = stats["network"]
+        return self.hashrate / network["difficulty"] * network["reward"] * 3600 * (1 - stats["fee"])
+
+    def rank(self, config, hysteresis=HYSTERESIS):
+        """Reorder config["pools"] by expected earnings; returns (pools, stats, xmr_per_hour)."""
+        pools = list(config.get("pools", []))
+        stats = self.fetch_all(pools)
+        earnings = [self.expected_xmr_per_hour(entry) for entry in stats]
+        scores = [1 / rate if rate else float("inf") for rate in earnings]  # Hours per XMR, lower is better
+        if config.get("pools") == pools:
+            rank_pools(config, scores, hysteresis)
+        return pools, stats, earnings
+
+
+def _format_hashrate(hashrate):
+    for unit in ("H/s", "KH/s", "MH/s", "GH/s"):
+        if hashrate < 1000:
+            return f"{hashrate:.1f} {unit}"
+        hashrate /= 1000
+    return f"{hashrate:.1f} TH/s"
+
+
+def print_profitability(engine, pools, stats, earnings):
+    """Print the fetched stats and expected earnings for each pool."""
+    print(f"\n{CYAN}Pool profitability at {_format_hashrate(engine.hashrate)}:{RESET}")
+    for idx, (pool, entry, rate) in enumerate(zip(pools, stats, earnings), start=1):
+        domain = get_domain(pool.get("url", "N/A"))
+        if entry is None:
+            print(f"  {BOLD}{idx}. {domain}{RESET}{RED}  unavailable: "
+                  f"{engine.errors.get(pool.get('url', ''), 'unknown error')}{RESET}")
+            continue
+        effort = f"{entry['effort']:.0%}" if entry["effort"] is not None else "n/a"
+        print(f"  {BOLD}{idx}. {domain}{RESET}  fee {entry['fee']:.2%}"
+              f"  pool {_format_hashrate(entry['hashrate'])}  effort {effort}"
+              f"  payout {entry['payout_threshold']:.4f} XMR (min {entry['min_payout']:.4f})"
+              f"  expected {rate:.8f} XMR/h")
+
+
+def run_profitability(config, hashrate=DEFAULT_HASHRATE):
+    """Rank the configured pools by expected earnings and print the comparison."""
+    if not config.get("pools"):
+        print(f"{RED}No pools found in the configuration.{RESET}")
+        return None
+    engine = ProfitabilityEngine(hashrate)
+    pools, stats, earnings = engine.rank(config)
+    print_profitability(engine, pools, stats, earnings)
+    return engine
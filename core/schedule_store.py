@@ -0,0 +1,95 @@
+import bisect
+import os
+from datetime import datetime
+from core.config_manager import ConfigStore
+from utils.helpers import RED, RESET
+
+# Schedules persist next to this project, not in xmrig's config.json
+SCHEDULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../schedules.json")
+MINUTES_PER_DAY = 24 * 60
+
+schedule_store = ConfigStore(SCHEDULES_FILE, debounce=0)
+
+
+def parse_minutes(hhmm):
+    """Convert 'HH:MM' into minutes since midnight, raising ValueError if malformed."""
+    parsed = datetime.strptime(hhmm, "%H:%M")
+    return parsed.hour * 60 + parsed.minute
+
+
+def make_schedule(key, start_time, end_time):
+    """Build a schedule entry for the pool identified by `key`."""
+    return {"pool": key, "start_time": start_time, "end_time": end_time,
+            "start": parse_minutes(start_time), "end": parse_minutes(end_time)}
+
+
+def load_schedules():
+    """Load the persisted schedules in one read. Missing, empty or malformed file means no schedules."""
+    try:
+        data = schedule_store.load() or {}
+        return [make_schedule(entry["pool"], entry["start_time"], entry["end_time"])
+                for entry in data.get("schedules", [])]
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"{RED}Error: could not read schedules from {schedule_store.path} ({e}); starting with none.{RESET}")
+        return []
+
+
+def save_schedules(schedules):
+    """Persist the schedules atomically."""
+    entries = [{"pool": sched["pool"], "start_time": sched["start_time"], "end_time": sched["end_time"]}
+               for sched in schedules]
+    schedule_store.save({"schedules": entries})
+
+
+def _pieces(start, end):
+    """Split a daily window into [start, end) pieces that don't cross midnight."""
+    # Handle overnight ranges (e.g., 21:00 to 03:00)
+    if start <= end:
+        return [(start, end)] if start < end else []
+    return [(start, MINUTES_PER_DAY)] + ([(0, end)] if end else [])
+
+
+class ScheduleIndex:
+    """Minute-of-day interval index over a list of schedules.
+
+    The day is cut at every window start and end into elementary segments, each
+    holding the schedules that cover it in the order they were added (the last
+    one owns the top slot). Lookups bisect the segment boundaries, so finding the
+    owner of a minute or the next transition is O(log n), and checking a window
+    for conflicts is O(log n + k) for k overlapping schedules.
+    """
+
+    def __init__(self, schedules=()):
+        self.rebuild(schedules)
+
+    def rebuild(self, schedules):
+        pieces = [(start, end, sched) for sched in schedules for start, end in _pieces(sched["start"], sched["end"])]
+        self.boundaries = sorted({0} | {point for start, end, _ in pieces for point in (start, end)} - {MINUTES_PER_DAY})
+        covers = [[] for _ in self.boundaries]
+        for start, end, sched in pieces:
+            for i in range(bisect.bisect_left(self.boundaries, start), bisect.bisect_left(self.boundaries, end)):
+                covers[i].append(sched)
+        self.covers = [tuple(cover) for cover in covers]
+        self.empty = not pieces
+
+    def _segment(self, minute):
+        return bisect.bisect_right(self.boundaries, minute) - 1
+
+    def owner_at(self, minute):
+        """Return the schedule owning `minute` (minutes since midnight), or None."""
+        cover = self.covers[self._segment(minute)]
+        return cover[-1] if cover else None
+
+    def next_boundary(self, minute):
+        """Return the minute of day of the next window start or end strictly after `minute`."""
+        i = bisect.bisect_right(self.boundaries, minute)
+        return self.boundaries[i] if i < len(self.boundaries) else self.boundaries[0]
+
+    def conflicts(self, start, end):
+        """Return the schedules whose windows overlap the window start-end."""
+        found = {}
+        for piece_start, piece_end in _pieces(start, end):
+            for i in range(self._segment(piece_start), bisect.bisect_left(self.boundaries, piece_end)):
+                for sched in self.covers[i]:
+                    found[id(sched)] = sched
+        return list(found.values())
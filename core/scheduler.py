@@ -1,29 +1,125 @@
-from datetime import datetime
-import schedule
+from collections import deque
+from datetime import datetime, timedelta
+import threading
 import time
-from core.pool_manager import set_pool_on_top
-from utils.helpers import CYAN, RESET, MAGENTA
+from core.config_manager import config_store
+from core.pool_manager import find_pool, pool_key, set_pool_on_top
+from core.schedule_store import ScheduleIndex, load_schedules, make_schedule, save_schedules
+from utils.helpers import CYAN, RESET, MAGENTA, ORANGE, RED
+from utils.metrics import counter, histogram
+
+schedules = load_schedules()  # To store active schedules, persisted in schedules.json
+scheduler_lag = deque(maxlen=100)  # Seconds late each transition was handled
+MAX_SLEEP = 3600  # Re-check at least hourly in case the wall clock jumps
+
+scheduler_wakeups = counter("scheduler_wakeups_total", "Scheduler loop iterations (transitions, edits and hourly re-checks).")
+scheduler_lag_seconds = histogram("scheduler_lag_seconds", "How late schedule transitions were handled.")
+
+_index = ScheduleIndex(schedules)
+_applied = None  # Schedule last put on top; a re-check in the same window leaves later failovers alone
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_listeners = []  # Callbacks run whenever the schedules change
+
+
+def _next_instant(minute_of_day, after):
+    """Timestamp of the next occurrence of `minute_of_day` strictly after the timestamp `after`."""
+    now = datetime.fromtimestamp(after)
+    candidate = now.replace(hour=minute_of_day // 60, minute=minute_of_day % 60, second=0, microsecond=0)
+    if candidate.timestamp() <= after:
+        candidate += timedelta(days=1)
+    return candidate.timestamp()
+
+
+def _minute_of_day(moment):
+    return moment.hour * 60 + moment.minute
+
+
+def add_listener(callback):
+    """Call `callback()` (from any thread) whenever schedules are added or removed."""
+    _listeners.append(callback)
+
+
+def remove_listener(callback):
+    _listeners.remove(callback)
+
+
+def _notify():
+    _wakeup.set()
+    for callback in list(_listeners):
+        callback()
+
+
+def _describe(key):
+    """Human-readable name for a pool identity key."""
+    return key.split("|", 1)[0]
+
+
+def active_schedule(now=None):
+    """Return the schedule that owns the top slot right now (the latest one added wins), or None."""
+    now = datetime.now() if now is None else now
+    with _lock:
+        return _index.owner_at(_minute_of_day(now))
+
+
+def _apply_active_schedule(config):
+    """Move the active schedule's pool to the top when its window opens or the schedules change.
+
+    Hourly re-checks inside the same window change nothing, so a failover or
+    ranking since the window opened isn't undone.
+    """
+    global _applied
+    sched = active_schedule()
+    if config is None or sched is _applied:
+        return False
+    _applied = sched
+    if sched is None:
+        return False
+    with config_store.lock:
+        idx = find_pool(config, sched["pool"])
+        if idx is None:
+            print(f"{RED}Scheduled pool {_describe(sched['pool'])} is no longer in the configuration.{RESET}")
+            return False
+        if idx == 1:
+            return False
+        return set_pool_on_top(config, idx, cause="schedule")
 
-schedules = []  # To store active schedules
 
 def schedule_pool(config, pool_index, start_time, end_time):
     """Schedule a pool to move to the top between specific hours."""
-    def job():
-        now = datetime.now().time()
-        start = datetime.strptime(start_time, "%H:%M").time()
-        end = datetime.strptime(end_time, "%H:%M").time()
-
-        # Handle overnight ranges (e.g., 21:00 to 03:00)
-        if start > end:
-            if now >= start or now < end:
-                set_pool_on_top(config, pool_index)
-        else:
-            if start <= now < end:
-                set_pool_on_top(config, pool_index)
-
-    schedule.every(1).minute.do(job)
-    schedules.append({"pool_index": pool_index, "start_time": start_time, "end_time": end_time})
+    pools = config.get("pools", [])
+    if not 1 <= pool_index <= len(pools):
+        print(f"{RED}Invalid number. Enter a number between 1 and {len(pools)}.{RESET}")
+        return False
+    sched = make_schedule(pool_key(pools[pool_index - 1]), start_time, end_time)
+
+    with _lock:
+        conflicts = _index.conflicts(sched["start"], sched["end"])
+        schedules.append(sched)
+        save_schedules(schedules)
+        _index.rebuild(schedules)
+    _notify()  # Apply immediately if the new window is already open
     print(f"{MAGENTA}Scheduled pool {pool_index} to be moved to the top between {start_time} and {end_time}.{RESET}")
+    for other in conflicts:
+        print(f"{ORANGE}Warning: overlaps the schedule for {_describe(other['pool'])} from "
+              f"{other['start_time']} to {other['end_time']}; the newest schedule takes priority.{RESET}")
+    return True
+
+
+def remove_schedule(number):
+    """Remove the schedule with the given 1-based number from view_schedules."""
+    with _lock:
+        if not 1 <= number <= len(schedules):
+            print(f"{RED}Invalid number. Enter a number between 1 and {len(schedules)}.{RESET}")
+            return False
+        sched = schedules.pop(number - 1)
+        save_schedules(schedules)
+        _index.rebuild(schedules)
+    _notify()
+    print(f"{MAGENTA}Removed schedule for {_describe(sched['pool'])} from "
+          f"{sched['start_time']} to {sched['end_time']}.{RESET}")
+    return True
+
 
 def view_schedules():
     """View all active schedules."""
@@ -32,11 +128,58 @@ def view_schedules():
     else:
         print(f"{CYAN}Active Schedules:{RESET}")
         for idx, sched in enumerate(schedules, start=1):
-            print(f"  {idx}. Pool {sched['pool_index']} from {sched['start_time']} to {sched['end_time']}.")
+            print(f"  {idx}. Pool {_describe(sched['pool'])} from {sched['start_time']} to {sched['end_time']}.")
+        now = time.time()
+        next_at = _next_instant(_index.next_boundary(_minute_of_day(datetime.fromtimestamp(now))), now)
+        print(f"  Next transition at {datetime.fromtimestamp(next_at).strftime('%H:%M')}.")
+        if scheduler_lag:
+            print(f"  Last transition handled {scheduler_lag[-1] * 1000:.0f} ms late "
+                  f"(worst {max(scheduler_lag) * 1000:.0f} ms).")
+
+
+def _plan(expected):
+    """Record the lag of a due transition and return the next expected transition and sleep time."""
+    now = time.time()
+    scheduler_wakeups.inc()
+    if expected is not None and now >= expected:
+        scheduler_lag.append(now - expected)
+        scheduler_lag_seconds.observe(now - expected)
+    with _lock:
+        if _index.empty:
+            return None, None
+        minute = _minute_of_day(datetime.fromtimestamp(now))
+        expected = _next_instant(_index.next_boundary(minute), now)
+    return expected, min(expected - now, MAX_SLEEP)
+
 
 def run_scheduler():
-    """Run the scheduler continuously."""
+    """Run the scheduler continuously, sleeping until the next window starts or ends."""
     print(f"{CYAN}Scheduler is running in the background...{RESET}")
+    expected = None
     while True:
-        schedule.run_pending()
-        time.sleep(1)
+        _wakeup.clear()
+        expected, timeout = _plan(expected)
+        _apply_active_schedule(config_store.load())
+        _wakeup.wait(timeout)
+
+
+async def run_scheduler_async():
+    """Run the scheduler as a task on the current asyncio event loop."""
+    import asyncio  # Only the daemon needs it; keeps CLI startup fast
+
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    listener = lambda: loop.call_soon_threadsafe(changed.set)
+    add_listener(listener)
+    expected = None
+    try:
+        while True:
+            changed.clear()
+            expected, timeout = _plan(expected)
+            _apply_active_schedule(config_store.load())
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        remove_listener(listener)
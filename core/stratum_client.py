@@ -0,0 +1,207 @@
+import asyncio
+import json
+import ssl
+import statistics
+import time
+from collections import deque
+from core.pool_manager import rank_pools
+from core.pool_prober import HYSTERESIS, percentile, tls_context
+from utils.helpers import BOLD, CYAN, RED, RESET, get_domain, parse_pool_url
+
+AGENT = "xmr-pool-switcher"
+STRATUM_DURATION = 300  # Seconds to stay logged in; a few Monero blocks at ~2 minutes each
+LOGIN_TIMEOUT = 10.0
+MAX_SAMPLES = 100  # Job timestamps and lag samples kept per pool
+
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def job_key(job):
+    """Identify the chain tip a job builds on: the previous block hash in its blob, else its height."""
+    try:
+        data = bytes.fromhex(job.get("blob", ""))
+        offset = 0
+        for _ in range(3):  # Major version, minor version, timestamp
+            _, offset = _read_varint(data, offset)
+        prev_id = data[offset:offset + 32]
+        if len(prev_id) == 32:
+            return prev_id.hex()
+    except (ValueError, IndexError):
+        pass
+    return job.get("height")
+
+
+class JobTracker:
+    """Remember when any pool first pushed a job for each chain tip."""
+
+    def __init__(self):
+        self.first_seen = {}
+
+    def observe(self, key, seen_at):
+        """Return how far behind the first pool this observation is, in ms."""
+        first = self.first_seen.setdefault(key, seen_at)
+        return (seen_at - first) * 1000
+
+
+class StratumStats:
+    """Login round-trip, job-push interval and stale-job lag for a single pool."""
+
+    def __init__(self):
+        self.login_rtt = None  # ms
+        self.error = None
+        self.job_times = deque(maxlen=MAX_SAMPLES)
+        self.lags = deque(maxlen=MAX_SAMPLES)  # ms behind the first pool, per new chain tip
+        self.last_key = None
+
+    def record_job(self, key, seen_at, tracker):
+        self.job_times.append(seen_at)
+        if key is not None and key != self.last_key:
+            self.last_key = key
+            self.lags.append(tracker.observe(key, seen_at))
+
+    @property
+    def job_interval(self):
+        """Median seconds between job notifications."""
+        times = list(self.job_times)
+        if len(times) < 2:
+            return None
+        return statistics.median(b - a for a, b in zip(times, times[1:]))
+
+    @property
+    def lag_p50(self):
+        return percentile(list(self.lags), 50)
+
+    @property
+    def lag_p95(self):
+        return percentile(list(self.lags), 95)
+
+    def score(self):
+        """Score used for ranking (lower is better): login RTT plus median stale-job lag."""
+        if self.login_rtt is None:
+            return float("inf")
+        return self.login_rtt + (self.lag_p50 or 0.0)
+
+
+def login_request(pool):
+    """Build the stratum login for a pool from its config entry."""
+    params = {
+        "login": pool.get("user", ""),
+        "pass": pool.get("pass", "x"),
+        "agent": AGENT,
+        "algo": ["rx/0"],
+    }
+    if pool.get("rig-id"):
+        params["rigid"] = pool["rig-id"]
+    return {"id": 1, "jsonrpc": "2.0", "method": "login", "params": params}
+
+
+async def measure_pool(pool, tracker, duration=STRATUM_DURATION, timeout=LOGIN_TIMEOUT):
+    """Log in to a pool and watch its job notifications for `duration` seconds. Never submits shares."""
+    stats = StratumStats()
+    try:
+        host, port = parse_pool_url(pool.get("url", ""))
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=tls_context() if pool.get("tls") else None), timeout
+        )
+    except (ValueError, OSError, asyncio.TimeoutError, ssl.SSLError) as e:
+        stats.error = str(e) or "connection timed out"
+        return stats
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    try:
+        started = time.perf_counter()
+        writer.write((json.dumps(login_request(pool)) + "\n").encode())
+        await writer.drain()
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            wait = remaining if stats.login_rtt is not None else min(remaining, timeout)
+            try:
+                line = await asyncio.wait_for(reader.readline(), wait)
+            except asyncio.TimeoutError:
+                if stats.login_rtt is None:
+                    stats.error = "login timed out"
+                break
+            if not line:
+                stats.error = "connection closed by pool"
+                break
+            seen_at = time.perf_counter()
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+            if message.get("id") == 1 and stats.login_rtt is None:
+                error = message.get("error")
+                if error:
+                    # Most pools send {"code", "message"}, some just a string
+                    stats.error = error.get("message", "login rejected") if isinstance(error, dict) else str(error)
+                    break
+                stats.login_rtt = (seen_at - started) * 1000
+                result = message.get("result")
+                job = result.get("job") if isinstance(result, dict) else None
+                if isinstance(job, dict):
+                    # Arrives with the login reply, so its "lag" is only login RTT: just note its tip
+                    stats.last_key = job_key(job)
+            elif message.get("method") == "job":
+                job = message.get("params")
+                if isinstance(job, dict):
+                    stats.record_job(job_key(job), seen_at, tracker)
+    except (OSError, ValueError, ssl.SSLError) as e:  # ValueError: a line over the stream limit
+        stats.error = str(e)
+    finally:
+        writer.close()
+    return stats
+
+
+async def measure_all(pools, duration=STRATUM_DURATION, timeout=LOGIN_TIMEOUT):
+    """Measure every pool concurrently; returns a StratumStats per pool, in order."""
+    tracker = JobTracker()
+    return await asyncio.gather(*(measure_pool(pool, tracker, duration, timeout) for pool in pools))
+
+
+def _format(value, unit):
+    return f"{value:.1f} {unit}" if value is not None else "n/a"
+
+
+def print_stratum_stats(pools, results):
+    """Print the stratum measurements for each pool."""
+    print(f"\n{CYAN}Stratum job latency:{RESET}")
+    for idx, (pool, stats) in enumerate(zip(pools, results), start=1):
+        domain = get_domain(pool.get("url", "N/A"))
+        if stats.error and stats.login_rtt is None:
+            print(f"  {BOLD}{idx}. {domain}{RESET}{RED}  failed: {stats.error}{RESET}")
+            continue
+        print(f"  {BOLD}{idx}. {domain}{RESET}  login {_format(stats.login_rtt, 'ms')}"
+              f"  job interval {_format(stats.job_interval, 's')}"
+              f"  stale lag p50 {_format(stats.lag_p50, 'ms')} p95 {_format(stats.lag_p95, 'ms')}")
+
+
+def run_stratum_probe(config, duration=STRATUM_DURATION, reorder=True):
+    """Log in to every pool at once, measure job latency and rank the pools by it."""
+    pools = list(config.get("pools", []))
+    if not pools:
+        print(f"{RED}No pools found in the configuration.{RESET}")
+        return None
+    print(f"{CYAN}Watching stratum jobs from {len(pools)} pools for {duration}s...{RESET}")
+    try:
+        results = asyncio.run(measure_all(pools, duration))
+    except KeyboardInterrupt:
+        print(f"\n{CYAN}Measurement stopped.{RESET}")
+        return None
+    print_stratum_stats(pools, results)
+    if reorder and config.get("pools") == pools:
+        rank_pools(config, [stats.score() for stats in results], HYSTERESIS)
+    return results
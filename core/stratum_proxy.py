@@ -0,0 +1,511 @@
+import argparse
+import asyncio
+import json
+import ssl
+import sys
+from collections import deque
+from core.config_manager import config_store, load_config
+from core.pool_manager import add_listener, pool_key, remove_listener
+from core.pool_prober import tls_context
+from core.stratum_client import login_request
+from utils.helpers import CYAN, GREEN, ORANGE, RED, RESET, get_domain, parse_pool_url
+from utils.metrics import counter, gauge
+
+PROXY_HOST = "0.0.0.0"  # Rigs on the LAN connect here
+PROXY_PORT = 3334
+NONCE_OFFSET = 39  # Byte offset of the 4-byte nonce in a Monero hashing blob
+SLOTS = 256  # Miners per upstream connection: one value of the nonce's top byte each
+CONNECT_TIMEOUT = 10.0
+RETIRE_GRACE = 2.0  # Seconds a replaced pool connection still takes shares for its jobs, found just before the switch
+RETIRE_TIMEOUT = 10.0  # Seconds it then stays open for the shares still in flight
+RETRY_INITIAL = 1  # Seconds before reconnecting to the pools; doubles up to RETRY_MAX
+RETRY_MAX = 60
+CONFIG_POLL = 2.0  # Seconds between checks of config.json for a new top pool
+RECENT_JOBS = 4  # Job ids per upstream that shares are still forwarded for
+MAX_LINE = 16 * 1024  # Bytes; stratum messages are well under this
+MAX_BUFFERED = 256 * 1024  # Bytes queued to a miner that stopped reading before it is dropped
+
+proxy_miners = gauge("proxy_miners", "Miners connected to the stratum proxy.")
+proxy_upstreams = gauge("proxy_upstreams", "Pool connections held by the stratum proxy.")
+proxy_shares = counter("proxy_shares_total", "Shares from proxied miners, by result.", ("result",))
+proxy_switches = counter("proxy_switches_total", "Upstream reconnects to a newly promoted pool.")
+
+
+class StratumError(Exception):
+    """A pool rejected a request, or the connection to it failed."""
+
+
+def _encode(message):
+    return (json.dumps(message) + "\n").encode()
+
+
+def split_job(job, slot):
+    """`job` with the nonce's top byte set to `slot`; miners in nicehash mode never change that byte."""
+    offset = (NONCE_OFFSET + 3) * 2
+    blob = job["blob"]
+    return dict(job, blob=blob[:offset] + f"{slot:02x}" + blob[offset + 2:])
+
+
+def nonce_slot(nonce):
+    """Top byte of a submitted nonce (8 hex digits, little-endian), or None if malformed."""
+    if not isinstance(nonce, str) or len(nonce) != 8:
+        return None
+    try:
+        return int(nonce[6:8], 16)
+    except ValueError:
+        return None
+
+
+def usable_pools(config):
+    return [pool for pool in config.get("pools", []) if pool.get("enabled") is not False]
+
+
+def pool_target(pool):
+    """What an upstream connects to: the pool's identity and its URL, which a switch to a mirror changes alone."""
+    return pool_key(pool), pool.get("url")
+
+
+class PoolSession:
+    """A logged-in connection to one pool; requests are matched to replies by id."""
+
+    def __init__(self, pool, reader, writer, on_job):
+        self.pool = dict(pool)  # As connected: config edits made in place (set_pool_url) must not look connected
+        self.reader = reader
+        self.writer = writer
+        self.on_job = on_job
+        self.login_id = None
+        self.job = None
+        self.recent_jobs = deque(maxlen=RECENT_JOBS)
+        self.closed = asyncio.Event()
+        self._next_id = 1
+        self._pending = {}
+        self._task = None
+        self._retiring = None
+
+    @classmethod
+    async def open(cls, pool, on_job, timeout=CONNECT_TIMEOUT):
+        """Connect and log in; returns once the pool has sent its first job."""
+        host, port = parse_pool_url(pool.get("url", ""))
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=tls_context() if pool.get("tls") else None, limit=MAX_LINE), timeout
+        )
+        session = cls(pool, reader, writer, on_job)
+        session._task = asyncio.create_task(session._read_loop())
+        try:
+            result = await asyncio.wait_for(session.request("login", login_request(pool)["params"]), timeout)
+            if not isinstance(result, dict) or not isinstance(result.get("job"), dict):
+                raise StratumError("login reply carried no job")
+        except BaseException:
+            session.close()
+            raise
+        session.login_id = result.get("id")
+        session._set_job(result["job"])
+        return session
+
+    def _set_job(self, job):
+        self.job = job
+        self.recent_jobs.append(job.get("job_id"))
+
+    async def request(self, method, params):
+        if self.closed.is_set():
+            raise StratumError("connection to the pool closed")
+        request_id = self._next_id
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self.writer.write(_encode({"id": request_id, "jsonrpc": "2.0", "method": method, "params": params}))
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                if message.get("method") == "job":
+                    if self.login_id is not None and isinstance(message.get("params"), dict):
+                        self._set_job(message["params"])
+                        self.on_job(self)
+                    continue
+                future = self._pending.get(message.get("id"))
+                if future is not None and not future.done():
+                    error = message.get("error")
+                    if error:
+                        future.set_exception(StratumError(error.get("message", "rejected") if isinstance(error, dict)
+                                                          else str(error)))
+                    else:
+                        future.set_result(message.get("result") or {})
+        except (OSError, ValueError, ssl.SSLError):
+            pass  # ValueError: a line over MAX_LINE
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(StratumError("connection to the pool closed"))
+            self.writer.close()
+            self.closed.set()
+
+    def retire(self, grace=RETIRE_GRACE, timeout=RETIRE_TIMEOUT):
+        """Keep taking shares for its jobs for `grace` seconds, then close once they are answered or after `timeout`."""
+        self._retiring = asyncio.create_task(self._close_when_answered(grace, timeout))
+
+    @property
+    def retiring(self):
+        return self._retiring is not None
+
+    async def _close_when_answered(self, grace, timeout):
+        await asyncio.sleep(grace)
+        pending = list(self._pending.values())
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        self.close()
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+
+
+class Miner:
+    """A downstream xmrig connection."""
+
+    __slots__ = ("id", "writer", "upstream", "slot", "rig")
+
+    def __init__(self, miner_id, writer):
+        self.id = miner_id
+        self.writer = writer
+        self.upstream = None
+        self.slot = None
+        self.rig = None
+
+    def send(self, message):
+        if self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            self.writer.close()  # Not reading its jobs; xmrig reconnects
+            return
+        self.writer.write(_encode(message))
+
+    def send_job(self, job):
+        self.send({"jsonrpc": "2.0", "method": "job", "params": dict(job, id=self.id)})
+
+
+class Upstream:
+    """One pool connection shared by up to SLOTS miners, each searching its own slice of the nonce space.
+
+    It stays connected to the first reachable pool in the proxy's order and
+    reconnects with backoff when the pool drops it. switch() logs in to another
+    pool first and only then drops the old connection, once the shares found
+    on its jobs (in flight, or arriving within RETIRE_GRACE) are answered, so
+    miners go straight from the old pool's job to the new pool's without
+    losing a share.
+    """
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.session = None
+        self.retired = []  # Replaced sessions still taking shares for their jobs
+        self.miners = {}  # Slot -> Miner
+        self._free = list(range(SLOTS - 1, -1, -1))
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._keep_connected())
+
+    @property
+    def full(self):
+        return not self._free
+
+    def attach(self, miner):
+        miner.slot = self._free.pop()
+        miner.upstream = self
+        self.miners[miner.slot] = miner
+
+    def detach(self, miner):
+        del self.miners[miner.slot]
+        self._free.append(miner.slot)
+        miner.upstream = None
+
+    async def wait_ready(self, timeout=CONNECT_TIMEOUT):
+        await asyncio.wait_for(self._ready.wait(), timeout)
+
+    def job_for(self, slot):
+        return split_job(self.session.job, slot)
+
+    def broadcast(self):
+        for slot, miner in list(self.miners.items()):
+            miner.send_job(self.job_for(slot))
+
+    def _on_job(self, session):
+        if session is self.session:
+            self.broadcast()
+
+    def _use(self, session):
+        old, self.session = self.session, session
+        self._ready.set()
+        self.retired = [retired for retired in self.retired if not retired.closed.is_set()]
+        if old is not None and not old.closed.is_set():
+            old.retire(RETIRE_GRACE, RETIRE_TIMEOUT)  # Shares found on its jobs still get answered by the old pool
+            self.retired.append(old)
+        self.broadcast()
+
+    def session_for(self, job_id):
+        """The session that sent job `job_id`: the current one, or one retired by a switch that is still open."""
+        for session in [self.session, *self.retired]:
+            if session is not None and not session.closed.is_set() and job_id in session.recent_jobs:
+                return session
+        return None
+
+    async def _open(self, pool):
+        try:
+            return await PoolSession.open(pool, self._on_job)
+        except (OSError, ValueError, ssl.SSLError, asyncio.TimeoutError, StratumError) as e:
+            print(f"{RED}Proxy: cannot log in to {get_domain(pool.get('url', ''))}: {e or 'timed out'}{RESET}")
+            return None
+
+    async def _keep_connected(self):
+        delay = RETRY_INITIAL
+        while True:
+            session = None
+            for pool in list(self.proxy.pools):
+                session = await self._open(pool)
+                if session is not None:
+                    break
+            if session is None:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX)
+                continue
+            delay = RETRY_INITIAL
+            self._use(session)
+            while True:
+                current = self.session
+                await current.closed.wait()
+                if self.session is current:
+                    break  # Lost rather than replaced by switch()
+            self._ready.clear()
+            print(f"{ORANGE}Proxy: lost {get_domain(current.pool.get('url', ''))}; reconnecting.{RESET}")
+
+    async def switch(self, pool):
+        """Log in to `pool`, then move every miner on this connection over. Returns True on success."""
+        if self.session is not None and pool_target(self.session.pool) == pool_target(pool):
+            return True
+        session = await self._open(pool)
+        if session is None:
+            return False
+        self._use(session)
+        proxy_switches.inc()
+        return True
+
+    def close(self):
+        self._task.cancel()
+        for session in [self.session, *self.retired]:
+            if session is not None:
+                session.close()
+
+
+class StratumProxy:
+    """Local stratum endpoint multiplexing many rigs onto a few pool connections.
+
+    Rigs point a single pool entry at the proxy with "nicehash": true.
+    Every SLOTS miners share one upstream connection, so promoting a pool
+    (in config.json or through set_pool_on_top in this process) costs one
+    login per SLOTS miners, and every rig is on the new pool at its next job.
+    """
+
+    def __init__(self, config, host=PROXY_HOST, port=PROXY_PORT, follow_file=True):
+        self.config = config
+        self.host = host
+        self.port = port
+        self.follow_file = follow_file
+        self.pools = usable_pools(config)
+        self.top = pool_target(self.pools[0]) if self.pools else None
+        self.upstreams = []
+        self.miners = {}
+        self.server = None
+        self._handlers = set()
+        self._next_miner = 1
+        self._changed = None
+        self._listener = None
+        self._watcher = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._listener = lambda config, cause: loop.call_soon_threadsafe(self._changed.set)
+        add_listener(self._listener)
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_LINE)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._watcher = asyncio.create_task(self._watch_config())
+        return self
+
+    async def stop(self):
+        remove_listener(self._listener)
+        self._watcher.cancel()
+        self.server.close()
+        for upstream in self.upstreams:
+            upstream.close()
+        for miner in list(self.miners.values()):
+            miner.writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def promote(self, pools):
+        """Follow a new pool order: every upstream reconnects to the new top pool.
+
+        The new top only counts as followed once every upstream is on it, so a
+        failed login is retried at the next config check.
+        """
+        self.pools = pools
+        print(f"{CYAN}Proxy: switching {len(self.upstreams)} upstream(s) to {get_domain(pools[0].get('url', ''))}...{RESET}")
+        switched = await asyncio.gather(*(upstream.switch(pools[0]) for upstream in self.upstreams))
+        if all(switched):
+            self.top = pool_target(pools[0])
+            print(f"{GREEN}Proxy: {len(self.miners)} miner(s) now on {get_domain(pools[0].get('url', ''))}.{RESET}")
+        return all(switched)
+
+    async def _watch_config(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), CONFIG_POLL)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+            config = (config_store.load() if self.follow_file else None) or self.config
+            pools = usable_pools(config)
+            if not pools:
+                continue
+            if pool_target(pools[0]) != self.top:
+                await self.promote(pools)
+            else:
+                self.pools = pools  # Failover order below the top may have changed
+
+    def _upstream_for(self, miner):
+        for upstream in self.upstreams:
+            if not upstream.full:
+                break
+        else:
+            upstream = Upstream(self)
+            self.upstreams.append(upstream)
+            proxy_upstreams.set(len(self.upstreams))
+        upstream.attach(miner)
+        return upstream
+
+    def _release(self, miner):
+        upstream = miner.upstream
+        if upstream is None:
+            return
+        upstream.detach(miner)
+        if not upstream.miners and len(self.upstreams) > 1:
+            upstream.close()
+            self.upstreams.remove(upstream)
+            proxy_upstreams.set(len(self.upstreams))
+
+    async def _handle(self, reader, writer):
+        self._handlers.add(asyncio.current_task())
+        miner = Miner(str(self._next_miner), writer)
+        self._next_miner += 1
+        self.miners[miner.id] = miner
+        proxy_miners.set(len(self.miners))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(request, dict):
+                    await self._dispatch(miner, request)
+        except (OSError, ValueError):
+            pass
+        finally:
+            del self.miners[miner.id]
+            proxy_miners.set(len(self.miners))
+            self._release(miner)
+            writer.close()
+            self._handlers.discard(asyncio.current_task())
+
+    async def _dispatch(self, miner, request):
+        method = request.get("method")
+        params = request.get("params") or {}
+        reply = {"id": request.get("id"), "jsonrpc": "2.0", "error": None}
+        if method == "login":
+            upstream = miner.upstream or self._upstream_for(miner)
+            miner.rig = params.get("rigid") or params.get("login")
+            try:
+                await upstream.wait_ready()
+            except asyncio.TimeoutError:
+                reply["error"] = {"code": -1, "message": "No pool available"}
+            else:
+                reply["result"] = {"id": miner.id, "job": dict(upstream.job_for(miner.slot), id=miner.id),
+                                   "extensions": ["algo", "nicehash", "keepalive"], "status": "OK"}
+        elif method == "submit":
+            asyncio.create_task(self._submit(miner, request))  # Replies may come back out of order
+            return
+        elif method == "keepalived":
+            reply["result"] = {"status": "KEEPALIVED"}
+        else:
+            reply["error"] = {"code": -1, "message": f"Unknown method {method}"}
+        miner.send(reply)
+
+    async def _submit(self, miner, request):
+        params = request.get("params") or {}
+        reply = {"id": request.get("id"), "jsonrpc": "2.0", "error": None}
+        session = miner.upstream.session_for(params.get("job_id")) if miner.upstream else None
+        if session is None:
+            reply["error"] = {"code": -1, "message": "Block expired"}
+            proxy_shares.inc(result="stale")
+        elif nonce_slot(params.get("nonce")) != miner.slot:
+            reply["error"] = {"code": -1, "message": "Invalid nonce; is the miner set to \"nicehash\": true?"}
+            proxy_shares.inc(result="invalid")
+        else:
+            try:
+                reply["result"] = await session.request("submit", dict(params, id=session.login_id))
+                proxy_shares.inc(result="accepted")
+            except StratumError as e:
+                reply["error"] = {"code": -1, "message": str(e)}
+                proxy_shares.inc(result="rejected")
+        miner.send(reply)
+
+    def status(self):
+        connected = [upstream.session.pool.get("url") for upstream in self.upstreams if upstream.session is not None]
+        return {"listen": f"{self.host}:{self.port}", "miners": len(self.miners),
+                "upstreams": len(self.upstreams), "pools": sorted(set(connected))}
+
+
+async def _serve(config, host, port):
+    proxy = await StratumProxy(config, host, port).start()
+    print(f"{GREEN}Stratum proxy listening on {host}:{proxy.port}; point rigs at it with \"nicehash\": true.{RESET}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await proxy.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Share a few pool connections between many local rigs.")
+    parser.add_argument("--host", default=PROXY_HOST)
+    parser.add_argument("--port", type=int, default=PROXY_PORT)
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    if config is None:
+        return 1
+    if not usable_pools(config):
+        print(f"{RED}No pools found in the configuration.{RESET}")
+        return 1
+    try:
+        asyncio.run(_serve(config, args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"\n{CYAN}Stratum proxy stopped.{RESET}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from core.config_manager import config_store
+from utils.helpers import GREEN, ORANGE, RED, RESET
+
+# xmrig lives next to its config.json, one level above this project
+XMRIG_DIR = os.path.dirname(config_store.path)
+XMRIG_PATH = os.path.join(XMRIG_DIR, "xmrig")
+LOG_FILE = os.path.join(XMRIG_DIR, "xmrig.log")
+PIDFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../xmrig.pid")
+
+BACKOFF_INITIAL = 1.0  # Seconds before the first restart, doubled per consecutive crash
+BACKOFF_MAX = 300.0
+STABLE_AFTER = 60.0  # A run this long resets the backoff
+CRASH_WINDOW = 300.0  # Seconds over which crashes are counted...
+CRASH_LIMIT = 5  # ...and how many of them mean a crash loop
+
+
+def _process_info(pid):
+    """Return (name, create_time) for a PID, or None if it doesn't exist."""
+    import psutil
+    try:
+        process = psutil.Process(pid)
+        return process.name(), process.create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+def find_xmrig(exclude=()):
+    """Scan the process table for an xmrig process not in `exclude`; returns its PID or None. Slow, so used once."""
+    import psutil
+    for proc in psutil.process_iter(["name"]):
+        if "xmrig" in (proc.info["name"] or "").lower() and proc.pid not in exclude:
+            return proc.pid
+    return None
+
+
+class XmrigSupervisor:
+    """Own the xmrig process: start it, track it by PID and restart it when it crashes.
+
+    The PID (and its start time, to survive PID reuse) is kept in a pidfile, so a
+    later run attaches to the same miner without scanning the process table and
+    liveness checks are O(1). xmrig runs in the foreground of its own session
+    with its output in xmrig.log. Crashes are restarted with exponential backoff;
+    too many crashes within CRASH_WINDOW is a crash loop and stops the restarts.
+    """
+
+    def __init__(self, binary=XMRIG_PATH, args=(), cwd=None, pidfile=PIDFILE, log_file=LOG_FILE):
+        self.binary = os.path.abspath(binary)
+        self.args = list(args)
+        self.cwd = cwd or os.path.dirname(self.binary)
+        self.pidfile = os.path.abspath(pidfile)
+        self.log_file = log_file
+        self.process = None  # Popen when we started xmrig ourselves
+        self.pid = None
+        self.create_time = None
+        self.started_at = None
+        self.exit_codes = deque(maxlen=20)  # (timestamp, exit code or None if unknown)
+        self.start_error = None  # Why the last restart failed, until one succeeds
+        self.crash_times = deque()
+        self.consecutive_crashes = 0
+        self.restart_at = None
+        self.crash_loop = False
+        self._lock = threading.RLock()
+
+    def _write_pidfile(self):
+        with open(self.pidfile, "w") as file:
+            json.dump({"pid": self.pid, "create_time": self.create_time, "binary": self.binary}, file)
+
+    def _clear_pidfile(self):
+        if os.path.exists(self.pidfile):
+            os.unlink(self.pidfile)
+
+    def attach(self):
+        """Adopt the xmrig recorded in the pidfile if it is still alive. Returns True on success."""
+        with self._lock:
+            if self.is_running():
+                return True
+            try:
+                with open(self.pidfile, "r") as file:
+                    recorded = json.load(file)
+            except (OSError, ValueError):
+                return False
+            info = _process_info(recorded.get("pid"))
+            if info is None or info[1] != recorded.get("create_time"):
+                return False  # Gone, or the PID now belongs to another process
+            self.process = None
+            self.pid, self.create_time = recorded["pid"], recorded["create_time"]
+            self.started_at = time.time()
+            return True
+
+    def adopt(self, pid):
+        """Track an xmrig we didn't start (e.g. found by find_xmrig) and record it in the pidfile."""
+        with self._lock:
+            info = _process_info(pid)
+            if info is None:
+                return False
+            self.process = None
+            self.pid, self.create_time = pid, info[1]
+            self.started_at = time.time()
+            self._write_pidfile()
+            return True
+
+    def is_running(self):
+        """O(1) liveness check of the tracked xmrig."""
+        with self._lock:
+            if self.process is not None:
+                return self.process.poll() is None
+            if self.pid is None:
+                return False
+            import psutil
+            try:
+                # A different start time means xmrig is gone and the PID was reused
+                return psutil.Process(self.pid).create_time() == self.create_time
+            except psutil.NoSuchProcess:  # Includes zombies
+                return False
+            except psutil.AccessDenied:
+                return True  # Alive, but owned by another user
+
+    def start(self):
+        """Start xmrig unless it is already running. Returns True if it is running afterwards."""
+        with self._lock:
+            if self.is_running():
+                return True
+            if not os.path.isfile(self.binary):
+                raise FileNotFoundError(f"'xmrig' not found at {self.binary}")
+            with open(self.log_file, "ab") as log:
+                self.process = subprocess.Popen([self.binary, *self.args], cwd=self.cwd, stdin=subprocess.DEVNULL,
+                                                stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+            self.pid = self.process.pid
+            info = _process_info(self.pid)
+            self.create_time = info[1] if info else None
+            self.started_at = time.time()
+            self.restart_at = None
+            self.start_error = None
+            self._write_pidfile()
+            return True
+
+    def stop(self, timeout=10.0):
+        """Stop xmrig (SIGTERM, then SIGKILL after `timeout`) and stop restarting it."""
+        with self._lock:
+            self.restart_at = None
+            if self.process is not None:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                    self.process.wait()
+                self.exit_codes.append((time.time(), self.process.returncode))
+            elif self.is_running():
+                import psutil
+                try:
+                    process = psutil.Process(self.pid)
+                    process.terminate()
+                    process.wait(timeout)
+                except psutil.TimeoutExpired:
+                    process.kill()
+                except psutil.NoSuchProcess:
+                    pass
+            self.process = self.pid = None
+            self._clear_pidfile()
+
+    def _record_exit(self, code):
+        now = time.time()
+        self.exit_codes.append((now, code))
+        self.process = self.pid = None
+        if code == 0:
+            self._clear_pidfile()
+            return  # Clean exit: xmrig was asked to quit, don't restart it
+        # An adopted xmrig's exit code isn't ours to collect; vanishing unasked is treated as a crash
+        self._record_crash(now, "exited with an unknown code" if code is None else f"exited with code {code}")
+
+    def _record_crash(self, now, reason):
+        ran_for = now - (self.started_at or now)
+        self.started_at = None  # A failed restart didn't run at all
+        self.consecutive_crashes = 1 if ran_for >= STABLE_AFTER else self.consecutive_crashes + 1
+        self.crash_times.append(now)
+        while self.crash_times and self.crash_times[0] < now - CRASH_WINDOW:
+            self.crash_times.popleft()
+        if len(self.crash_times) >= CRASH_LIMIT:
+            self.crash_loop = True
+            self._clear_pidfile()
+            print(f"{RED}xmrig crashed {len(self.crash_times)} times in {CRASH_WINDOW:.0f}s "
+                  f"(last it {reason}); not restarting it.{RESET}")
+            return
+        delay = min(BACKOFF_MAX, BACKOFF_INITIAL * 2 ** (self.consecutive_crashes - 1))
+        self.restart_at = now + delay
+        print(f"{ORANGE}xmrig {reason}; restarting in {delay:.0f}s.{RESET}")
+
+    def check(self):
+        """Reap a dead xmrig, record its exit code and restart it when its backoff has passed."""
+        with self._lock:
+            if self.process is not None and self.process.poll() is not None:
+                self._record_exit(self.process.returncode)
+            elif self.process is None and self.pid is not None and not self.is_running():
+                self._record_exit(None)
+            if self.restart_at is not None and time.time() >= self.restart_at and not self.crash_loop:
+                try:
+                    self.start()
+                    print(f"{GREEN}xmrig restarted (pid {self.pid}).{RESET}")
+                except OSError as e:
+                    self.restart_at = None
+                    self.start_error = str(e)
+                    self._record_crash(time.time(), f"failed to start: {e}")
+
+    def reset(self):
+        """Clear crash-loop state so restarts resume."""
+        with self._lock:
+            self.crash_loop = False
+            self.crash_times.clear()
+            self.consecutive_crashes = 0
+
+    def supervise(self, interval=1.0, stop_event=None):
+        """Call check() every `interval` seconds until `stop_event` is set."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.wait(interval):
+            self.check()
+
+    def start_background(self, interval=1.0):
+        """Supervise on a daemon thread; returns the Event that stops it."""
+        stop_event = threading.Event()
+        threading.Thread(target=self.supervise, args=(interval, stop_event), daemon=True).start()
+        return stop_event
+
+
+supervisor = XmrigSupervisor()
+
+
+def force_foreground(store=config_store):
+    """Set "background": false in config.json; returns True if it had to change.
+
+    A self-forking xmrig exits 0 right after forking, which would leave the
+    supervisor tracking a dead PID, so every start goes through this first.
+    """
+    with store.transaction() as config:
+        if config is None:
+            raise FileNotFoundError(f"config.json not found at {store.path}")
+        if config.get("background") is False:
+            return False
+        config["background"] = False
+        return True
+
+
+def ensure_attached():
+    """Attach to the running xmrig via the pidfile, scanning the process table only as a last resort."""
+    if supervisor.attach():
+        return True
+    pid = find_xmrig()
+    return pid is not None and supervisor.adopt(pid)
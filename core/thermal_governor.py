@@ -0,0 +1,286 @@
+import argparse
+import glob
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from core.autotune import SYSFS_ROOT, _read
+from core.config_manager import config_store, load_config
+from core.live_switch import LiveSwitcher
+from core.pool_manager import set_cpu_layout
+from utils.helpers import BOLD, CYAN, GREEN, ORANGE, RED, RESET
+from utils.metrics import counter, gauge
+from utils.xmrig_api import XmrigApi, XmrigApiError
+
+THERMAL_ROOT = "/sys/class/thermal"  # Holds thermal_zone*/; tests point this at a fake tree
+GOVERNOR_INTERVAL = 10  # Seconds between samples
+SETTLE = 60  # Seconds after a thread change before hashrate samples count (xmrig restarts its workers)
+DWELL = 300  # Minimum seconds between thread changes
+TEMP_HIGH = 85.0  # Degrees C at which threads that don't pay for their heat are shed
+TEMP_HYSTERESIS = 5.0  # Threads are only added back below TEMP_HIGH minus this
+TEMP_CRITICAL = 95.0  # Degrees C at which a thread is shed whatever it adds
+FREQ_DROP = 0.1  # Clock 10% below the best seen at this thread count or more means throttling
+MIN_GAIN = 0.5  # A thread must add half the average per-thread hashrate to be kept
+MEASUREMENT_TTL = 1800  # Seconds a thread count's hashrate is trusted; throttling changes through the day
+HASHRATE_SAMPLES = 30  # Samples whose median is a thread count's hashrate (5 minutes at the default interval)
+
+# thermal_zone types that measure the CPU package or cores; other zones only count if none of these exist
+CPU_ZONES = ("x86_pkg_temp", "coretemp", "k10temp", "cpu-thermal", "cpu_thermal", "cpu", "soc_thermal", "acpitz")
+
+governor_threads = gauge("governor_threads", "Mining threads chosen by the thermal governor.")
+cpu_temperature = gauge("cpu_temperature_celsius", "Hottest CPU thermal zone.")
+governor_changes = counter("governor_changes_total", "Thread changes made by the thermal governor, by direction.",
+                           ("direction",))
+
+
+def read_temperature(root=THERMAL_ROOT):
+    """Hottest CPU thermal zone in degrees C, or None if there is none."""
+    readings = {}
+    for path in glob.glob(os.path.join(root, "thermal_zone[0-9]*")):
+        temp = _read(os.path.join(path, "temp"))
+        if temp and temp.lstrip("-").isdigit():
+            readings.setdefault(_read(os.path.join(path, "type"), ""), []).append(int(temp) / 1000)
+    cpu = [temp for zone, temps in readings.items() if zone in CPU_ZONES for temp in temps]
+    temps = cpu or [temp for temps in readings.values() for temp in temps]
+    return max(temps) if temps else None
+
+
+def read_frequency(cpus, root=SYSFS_ROOT):
+    """Mean current clock of `cpus` as a fraction of their maximum, or None without cpufreq."""
+    ratios = []
+    for cpu in cpus:
+        base = os.path.join(root, f"cpu/cpu{cpu}/cpufreq")
+        current, maximum = _read(os.path.join(base, "scaling_cur_freq")), _read(os.path.join(base, "cpuinfo_max_freq"))
+        if current and maximum and current.isdigit() and maximum.isdigit() and int(maximum):
+            ratios.append(int(current) / int(maximum))
+    return sum(ratios) / len(ratios) if ratios else None
+
+
+def layout_cpus(config):
+    """CPUs the "cpu" section pins threads to, in order; all CPUs if it pins none."""
+    threads = (config.get("cpu") or {}).get("threads")
+    if isinstance(threads, list) and threads:
+        cpus = [thread.get("affine_to_cpu", idx) if isinstance(thread, dict) else idx
+                for idx, thread in enumerate(threads)]
+        if all(isinstance(cpu, int) and cpu >= 0 for cpu in cpus):
+            return cpus
+    return list(range(os.cpu_count() or 1))
+
+
+class ThreadGovernor:
+    """Shed or add mining threads by what the last thread adds against the heat it costs.
+
+    The layout in config.json when the governor starts is the ceiling; running
+    with n threads uses its first n CPUs. The hashrate xmrig reports is kept per
+    thread count (the median once each change has settled), so the marginal
+    hashrate of the n-th thread is H(n) - H(n-1). When the CPU is hot or its
+    clock has dropped, a thread adding less than `min_gain` of the average
+    per-thread rate (or whose gain isn't known yet) is shed, and restored if
+    it turns out to pay off; above `temp_critical` one is shed regardless.
+    Below `temp_high - temp_hysteresis` a thread is added back unless it was
+    measured not to pay off. Changes are at least `dwell` seconds apart.
+    Measurements expire after `measurement_ttl`, and are dropped when the CPU
+    goes from cool to hot or back, so rates from different conditions are
+    never compared.
+
+    With `push`, changes go to the running xmrig through its HTTP API;
+    config.json is always rewritten, so xmrig picks them up either way.
+    """
+
+    def __init__(self, config, api=None, push=True, thermal_root=THERMAL_ROOT, sysfs_root=SYSFS_ROOT,
+                 min_threads=1, dwell=DWELL, settle=SETTLE, temp_high=TEMP_HIGH, temp_hysteresis=TEMP_HYSTERESIS,
+                 temp_critical=TEMP_CRITICAL, min_gain=MIN_GAIN, measurement_ttl=MEASUREMENT_TTL, clock=time.monotonic):
+        self.config = config
+        self.api = api or XmrigApi.from_config(config)
+        self.live = LiveSwitcher(config, self.api) if push else None
+        self.thermal_root = thermal_root
+        self.sysfs_root = sysfs_root
+        self.layout = layout_cpus(config)
+        self.threads = len(self.layout)
+        self.min_threads = max(1, min(min_threads, self.threads))
+        self.dwell = dwell
+        self.settle = settle
+        self.temp_high = temp_high
+        self.temp_hysteresis = temp_hysteresis
+        self.temp_critical = temp_critical
+        self.min_gain = min_gain
+        self.measurement_ttl = measurement_ttl
+        self.clock = clock
+        self.hashrates = {}  # Thread count -> (median H/s, time measured)
+        self.peak_freq = {}  # Thread count -> best clock ratio seen with that many threads
+        self.window = deque(maxlen=HASHRATE_SAMPLES)  # Hashrate samples since the last change settled
+        self.state = None  # "hot" or "cool"; in between, the last of the two
+        self.last_change = clock()
+        self.last_sample = None
+        self.last_error = None
+
+    def sample(self):
+        """Read temperature, clock and hashrate. Hashrate is None if xmrig's API didn't answer."""
+        try:
+            total = ((self.api.summary() or {}).get("hashrate") or {}).get("total") or [None]
+            hashrate = total[0]
+            self.last_error = None
+        except XmrigApiError as e:
+            hashrate, self.last_error = None, str(e)
+        return {
+            "time": self.clock(),
+            "temp": read_temperature(self.thermal_root),
+            "freq": read_frequency(self.layout[:self.threads], self.sysfs_root),
+            "hashrate": hashrate,
+        }
+
+    def measured(self, threads):
+        """Median hashrate with `threads` threads, if measured within measurement_ttl."""
+        entry = self.hashrates.get(threads)
+        if entry is None or self.clock() - entry[1] > self.measurement_ttl:
+            return None
+        return entry[0]
+
+    def marginal(self, threads):
+        """Hashrate the `threads`-th thread adds, or None unless both counts were measured recently."""
+        with_it, without = self.measured(threads), self.measured(threads - 1)
+        if with_it is None or without is None:
+            return None
+        return with_it - without
+
+    def _pays_off(self, gain):
+        current = self.measured(self.threads)
+        return current is not None and gain >= self.min_gain * current / self.threads
+
+    def decide(self, sample):
+        """Record `sample` and return the thread count to run, which may be the current one."""
+        self.last_sample = sample
+        if sample["temp"] is not None:
+            cpu_temperature.set(sample["temp"])
+        now = sample["time"]
+        if now - self.last_change < self.settle:
+            return self.threads
+        if sample["freq"] is not None:
+            self.peak_freq[self.threads] = max(self.peak_freq.get(self.threads, 0), sample["freq"])
+        temp = sample["temp"]
+        # Fewer threads clock at least as high as more, so a count first seen throttled is still caught
+        peak = max((freq for threads, freq in self.peak_freq.items() if threads >= self.threads), default=0)
+        throttled = sample["freq"] is not None and sample["freq"] < peak * (1 - FREQ_DROP)
+        hot = throttled or (temp is not None and temp >= self.temp_high)
+        cool = not throttled and (temp is None or temp <= self.temp_high - self.temp_hysteresis)
+        if (hot and self.state == "cool") or (cool and self.state == "hot"):
+            self.hashrates.clear()  # Rates measured in other conditions would give bogus marginals
+            self.window.clear()
+        self.state = "hot" if hot else "cool" if cool else self.state
+        if sample["hashrate"]:
+            self.window.append(sample["hashrate"])
+            self.hashrates[self.threads] = (statistics.median(self.window), now)
+        if temp is not None and temp >= self.temp_critical:
+            return max(self.min_threads, self.threads - 1)  # Critical heat overrides the dwell time
+        if now - self.last_change < self.dwell or self.measured(self.threads) is None:
+            return self.threads
+        gain = self.marginal(self.threads)
+        gain_up = self.marginal(self.threads + 1) if self.threads < len(self.layout) else None
+        if self.threads > self.min_threads:
+            if gain is not None and not self._pays_off(gain):
+                return self.threads - 1  # The last thread only adds heat, hot or not
+            if hot and gain is None and not (gain_up is not None and self._pays_off(gain_up)):
+                return self.threads - 1  # Find out what it adds
+        if gain_up is not None and self._pays_off(gain_up):
+            return self.threads + 1  # The thread shed to measure it was worth its heat
+        if cool and self.threads < len(self.layout) and gain_up is None:
+            return self.threads + 1
+        return self.threads
+
+    def apply(self, threads):
+        """Switch to `threads` threads: rewrite config.json and, with push, update xmrig live."""
+        direction = "shed" if threads < self.threads else "add"
+        set_cpu_layout(self.config, self.layout[:threads])
+        if self.live is not None:
+            try:
+                self.live.push()
+            except XmrigApiError as e:
+                self.last_error = str(e)
+                print(f"{ORANGE}Live push failed ({e}); xmrig will pick the change up from config.json.{RESET}")
+        self.threads = threads
+        self.window.clear()
+        self.last_change = self.clock()
+        governor_threads.set(threads)
+        governor_changes.inc(direction=direction)
+
+    def step(self):
+        """Sample once and change the thread count if warranted. Returns the new count, or None."""
+        sample = self.sample()
+        target = self.decide(sample)
+        if target == self.threads:
+            return None
+        temp = f"{sample['temp']:.0f}°C" if sample["temp"] is not None else "unknown temperature"
+        color = ORANGE if target < self.threads else GREEN
+        print(f"{color}Governor: {self.threads} -> {target} threads ({temp}).{RESET}")
+        self.apply(target)
+        return target
+
+    def run(self, interval=GOVERNOR_INTERVAL, stop_event=None):
+        """Sample every `interval` seconds until `stop_event` is set."""
+        stop_event = stop_event or threading.Event()
+        governor_threads.set(self.threads)
+        print(f"{CYAN}Thread governor on {self.threads} threads, sampling every {interval}s...{RESET}")
+        while not stop_event.is_set():
+            self.step()
+            stop_event.wait(interval)
+
+    def status(self):
+        sample = self.last_sample or {}
+        return {
+            "threads": self.threads,
+            "max_threads": len(self.layout),
+            "state": self.state,
+            "temp": sample.get("temp"),
+            "freq": sample.get("freq"),
+            "hashrates": {threads: round(self.measured(threads), 1) for threads in sorted(self.hashrates)
+                          if self.measured(threads) is not None},
+            "error": self.last_error,
+        }
+
+
+def print_readings(thermal_root=THERMAL_ROOT, sysfs_root=SYSFS_ROOT, cpus=None):
+    """Print the temperature and clock the governor would see."""
+    temp = read_temperature(thermal_root)
+    freq = read_frequency(cpus if cpus is not None else range(os.cpu_count() or 1), sysfs_root)
+    print(f"{CYAN}Thermal readings:{RESET}")
+    print(f"  {BOLD}CPU temperature:{RESET} {f'{temp:.1f}°C' if temp is not None else 'no thermal zones'}")
+    print(f"  {BOLD}Clock:{RESET} {f'{freq:.0%} of maximum' if freq is not None else 'no cpufreq'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shed or add mining threads as the CPU heats up and throttles.")
+    parser.add_argument("--thermal-root", default=THERMAL_ROOT, help="directory holding thermal_zone*/")
+    parser.add_argument("--sysfs", default=SYSFS_ROOT, help="sysfs directory holding cpu/")
+    parser.add_argument("--interval", type=float, default=GOVERNOR_INTERVAL, help="seconds between samples")
+    parser.add_argument("--min-threads", type=int, default=1)
+    parser.add_argument("--dwell", type=float, default=DWELL, help="minimum seconds between changes")
+    parser.add_argument("--temp-high", type=float, default=TEMP_HIGH, help="degrees C considered hot")
+    parser.add_argument("--no-push", action="store_true", help="only rewrite config.json, don't use xmrig's API")
+    parser.add_argument("--readings", action="store_true", help="print the current readings and exit")
+    args = parser.parse_args(argv)
+
+    if args.readings:
+        print_readings(args.thermal_root, args.sysfs)
+        return 0
+    config = load_config()
+    if config is None:
+        return 1
+    try:
+        governor = ThreadGovernor(config, push=not args.no_push, thermal_root=args.thermal_root, sysfs_root=args.sysfs,
+                                  min_threads=args.min_threads, dwell=args.dwell, temp_high=args.temp_high)
+    except XmrigApiError as e:
+        print(f"{RED}{e}{RESET}")
+        return 1
+    try:
+        governor.run(args.interval)
+    except KeyboardInterrupt:
+        print(f"\n{CYAN}Governor stopped on {governor.threads} threads.{RESET}")
+    finally:
+        config_store.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
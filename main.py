@@ -1,35 +1,51 @@
+import time
+
+_STARTED = time.perf_counter()  # Measured before anything else is imported
+
+import argparse
+import glob
+import hashlib
+import os
 import subprocess
 import sys
 import threading
-import os
-from core.config_manager import load_config, save_config
-from core.pool_manager import show_pools, set_pool_on_top
-from core.scheduler import schedule_pool, view_schedules, run_scheduler
-from utils.helpers import MONERO_LOGO, ORANGE, RESET, RED, GREEN, BOLD
-from utils.monero_data import get_monero_data
-import psutil
-import json
+from utils.helpers import MONERO_LOGO, ORANGE, RESET, RED, GREEN, BOLD, CYAN
 
+# Everything under core/ is imported inside the functions that need it, so a
+# scripted command only pays for the modules it uses.
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+VENV_PATH = os.path.join(PROJECT_DIR, "venv")
+ENVIRONMENT_STAMP = os.path.join(VENV_PATH, ".switcher-environment")  # Fingerprint of the last successful setup
+REQUIRED_MODULES = ["psutil", "schedule", "requests"]
+STARTUP_BUDGET_MS = 50  # Process-start-to-result budget for daemon-backed commands, checked by --timing
+NODE_PIDFILES = os.path.join(PROJECT_DIR, "xmrig-*.pid")  # Per-node instances launched by the numa tool
 
-def create_and_setup_virtualenv(required_modules):
-    """Create a virtual environment and install required modules."""
-    venv_path = "venv"
 
+def _venv_executable(name):
+    return os.path.join(VENV_PATH, "bin", name) if os.name != "nt" else os.path.join(VENV_PATH, "Scripts", name)
+
+
+def environment_fingerprint():
+    """Changes whenever the venv is recreated or REQUIRED_MODULES changes."""
     try:
-        # Check if the virtual environment already exists
-        if not os.path.exists(venv_path):
+        created = os.stat(os.path.join(VENV_PATH, "pyvenv.cfg")).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return hashlib.sha1(f"{created}|{'|'.join(sorted(REQUIRED_MODULES))}".encode()).hexdigest()
+
+
+def create_and_setup_virtualenv(required_modules):
+    """Create the virtual environment if needed and install required modules in one pip run."""
+    try:
+        if not os.path.exists(_venv_executable("python")):
             print("Setting up a virtual environment...")
-            subprocess.check_call([sys.executable, "-m", "venv", venv_path])
+            subprocess.check_call([sys.executable, "-m", "venv", VENV_PATH])
             print("Virtual environment created successfully.")
 
-        # Activate the virtual environment
-        pip_executable = os.path.join(venv_path, "bin", "pip") if os.name != "nt" else os.path.join(venv_path, "Scripts", "pip")
-
-        # Install required modules
         print("Installing required modules...")
-        subprocess.check_call([pip_executable, "install", "--upgrade", "pip"])  # Upgrade pip in venv
-        for module in required_modules:
-            subprocess.check_call([pip_executable, "install", module])
+        subprocess.check_call([_venv_executable("pip"), "install", "--quiet", *required_modules])
+        with open(ENVIRONMENT_STAMP, "w") as file:
+            file.write(environment_fingerprint())
         print("All required modules installed successfully.")
 
     except subprocess.CalledProcessError as e:
@@ -38,95 +54,76 @@ def create_and_setup_virtualenv(required_modules):
 
 
 def ensure_environment():
-    """Ensure the virtual environment and required modules are available."""
-    venv_path = "venv"
+    """Ensure the virtual environment and required modules are available, then run inside it.
 
-    # If virtual environment exists, ensure we're using it
-    if os.path.exists(venv_path):
-        venv_python = os.path.join(venv_path, "bin", "python") if os.name != "nt" else os.path.join(venv_path, "Scripts", "python")
+    pip only runs when the stamp written after the last successful install no
+    longer matches; otherwise this costs a stat and a small read. Set
+    SWITCHER_NO_VENV=1 to use the current interpreter as is.
+    """
+    if os.environ.get("SWITCHER_NO_VENV"):
+        return
+    try:
+        with open(ENVIRONMENT_STAMP, "r") as file:
+            stamp = file.read().strip()
+    except FileNotFoundError:
+        stamp = None
+    if stamp is None or stamp != environment_fingerprint():
+        create_and_setup_virtualenv(REQUIRED_MODULES)
 
-        # Check if the current Python executable is the one in the venv
-        if sys.executable != os.path.abspath(venv_python):
-            print("Activating virtual environment...")
-            os.execl(venv_python, venv_python, *sys.argv)
-    else:
-        # Create and set up the virtual environment
-        required_modules = ["psutil", "schedule", "requests"]
-        create_and_setup_virtualenv(required_modules)
+    venv_python = _venv_executable("python")
+    if os.path.abspath(sys.executable) != os.path.abspath(venv_python):
+        os.execl(venv_python, venv_python, *sys.argv)
 
 
 def is_xmrig_active():
     """Check if xmrig is currently active."""
-    for proc in psutil.process_iter(['name']):
-        if 'xmrig' in proc.info['name'].lower():
-            return True
-    return False
+    from core.supervisor import ensure_attached, supervisor
+    return ensure_attached() and supervisor.is_running()
 
 def update_background_in_config():
-    """Ensure the 'background' parameter in config.json is set to true."""
+    """Ensure the 'background' parameter in config.json is set to false.
+
+    The supervisor detaches xmrig itself; a self-forking xmrig couldn't be tracked by PID.
+    """
+    from core.config_manager import config_store
+    from core.supervisor import force_foreground
     try:
-        # Resolve the parent directory and locate config.json
-        parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        config_path = os.path.join(parent_dir, 'config.json')
-
-        # Load the existing config.json
-        if not os.path.isfile(config_path):
-            raise FileNotFoundError(f"config.json not found at {config_path}")
-
-        with open(config_path, 'r') as file:
-            config = json.load(file)
-
-        # Update the 'background' parameter
-        if config.get("background") != True:
-            config["background"] = True
-            with open(config_path, 'w') as file:
-                json.dump(config, file, indent=4)
-            print(f"{ORANGE}'background' parameter set to true in config.json.{RESET}")
+        # Update the 'background' parameter; unchanged content is not rewritten
+        if force_foreground():
+            print(f"{ORANGE}'background' parameter set to false in config.json.{RESET}")
         else:
-            print(f"{GREEN}'background' parameter is already set to true in config.json.{RESET}")
-        return config_path
+            print(f"{GREEN}'background' parameter is already set to false in config.json.{RESET}")
+        return config_store.path
     except Exception as e:
         print(f"{RED}Failed to update 'background' parameter in config.json. Error: {e}{RESET}")
         raise
 
 def start_xmrig():
-    """Attempt to start xmrig with the 'background' parameter enabled."""
+    """Start xmrig under the supervisor, which restarts it if it crashes."""
+    from core.supervisor import supervisor
     try:
         # Update the config.json background parameter
-        config_path = update_background_in_config()
-
-        # Resolve the parent directory
-        parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        xmrig_path = os.path.join(parent_dir, 'xmrig')
-
-        # Check if the xmrig binary exists
-        if not os.path.isfile(xmrig_path):
-            raise FileNotFoundError(f"'xmrig' not found at {xmrig_path}")
-
-        print(f"{ORANGE}Starting xmrig from {xmrig_path}...{RESET}")
+        update_background_in_config()
 
-        # Start xmrig
-        subprocess.Popen([xmrig_path], cwd=parent_dir)
-        print(f"{GREEN}xmrig started successfully. It is running in the background as configured in config.json.{RESET}")
+        print(f"{ORANGE}Starting xmrig from {supervisor.binary}...{RESET}")
+        supervisor.start()
+        supervisor.start_background()
+        print(f"{GREEN}xmrig started successfully (pid {supervisor.pid}), logging to {supervisor.log_file}.{RESET}")
     except Exception as e:
         print(f"{RED}Failed to start xmrig. Error: {e}{RESET}")
 
 
 def set_cores(config):
     """Set the number of cores for mining."""
+    import psutil
+    from core.pool_manager import set_cpu_threads
     max_cores = psutil.cpu_count(logical=True)
     print(f"\n{ORANGE}Your system has {max_cores} logical CPU cores.{RESET}")
     try:
         cores = int(input(f"Enter the number of cores to use (1-{max_cores}): "))
         if cores < 1 or cores > max_cores:
             raise ValueError("Invalid core count.")
-        threads = [{"low_power_mode": False, "affine_to_cpu": i} for i in range(cores)]
-        config["cpu"] = {
-            "enabled": True,
-            "huge-pages": True,
-            "threads": threads
-        }
-        save_config(config)
+        set_cpu_threads(config, cores)
         print(f"{GREEN}Configuration updated to use {cores} cores.{RESET}")
     except ValueError as e:
         print(f"{RED}Error: {e}. Please enter a valid number.{RESET}")
@@ -139,12 +136,28 @@ def show_commands_menu():
     print(f"2. Set a pool on top of the list")
     print(f"3. Schedule a pool to move to the top between hours")
     print(f"4. View active schedules")
+    print(f"8. View history report (pools, shares, hashrate, price)")
     print(f"{ORANGE}5. Get Monero market data{RESET}")
     print(f"6. Set number of cores for mining")
+    print(f"9. Probe pool latency and rank pools")
+    print(f"10. Measure stratum job latency and rank pools")
+    print(f"11. Remove a schedule")
+    print(f"12. Rank pools by profitability")
+    print(f"13. Auto-tune mining threads (benchmarks xmrig)")
     print(f"{BOLD}7. Exit{RESET}")
 
 def main():
     """Main function to handle user input and commands."""
+    from core.autotune import run_autotune
+    from core.config_manager import load_config
+    from core.history import show_history
+    from core.pool_manager import show_pools, set_pool_on_top
+    from core.pool_prober import run_probe
+    from core.profitability import run_profitability
+    from core.scheduler import schedule_pool, view_schedules, remove_schedule
+    from core.stratum_client import run_stratum_probe
+    from utils.monero_data import get_monero_data
+
     print(MONERO_LOGO)
 
     # Check if xmrig is active
@@ -196,14 +209,281 @@ def main():
         elif command == "7":
             print(f"{ORANGE}Exiting...{RESET}")
             break
+        elif command == "8":
+            show_history()
+        elif command == "9":
+            run_probe(config)
+        elif command == "10":
+            run_stratum_probe(config)
+        elif command == "11":
+            view_schedules()
+            try:
+                number = int(input("\nEnter the schedule number to remove: "))
+                remove_schedule(number)
+            except ValueError:
+                print(f"{RED}Invalid input. Please enter a valid number.{RESET}")
+        elif command == "12":
+            run_profitability(config)
+        elif command == "13":
+            run_autotune(config, force=input("Re-run benchmarks even if cached? (y/n): ").strip().lower() == "y")
         else:
             print(f"{RED}Invalid command. Please try again.{RESET}")
             show_commands_menu()
 
 
-if __name__ == "__main__":
-    ensure_environment()
-
+def print_local_status(config):
+    """Print what the daemon's status command reports, read straight from disk."""
+    from core.scheduler import active_schedule
+    from core.supervisor import supervisor
+    running = is_xmrig_active()
+    print(f"{CYAN}Pool switcher (no daemon running):{RESET}")
+    pid = f" (pid {supervisor.pid})" if running else ""
+    print(f"  xmrig: {GREEN + 'running' if running else RED + 'not running'}{RESET}{pid}")
+    pools = config.get("pools", [])
+    print(f"  Top pool: {pools[0].get('url') if pools else None}")
+    active = active_schedule()
+    print(f"  Active schedule: {active['start_time']}-{active['end_time']}" if active else "  Active schedule: none")
+    print(f"  Mining threads: {len(config.get('cpu', {}).get('threads', []))}")
+
+
+def run_local(args):
+    """Run a daemon command in this process; used when no daemon is running."""
+    from core.config_manager import load_config
+    from core.pool_manager import set_cpu_threads, set_pool_on_top, show_pools
+    from core.scheduler import remove_schedule, schedule_pool, view_schedules
+    if args.command in ("promote", "schedule", "unschedule", "cores") and glob.glob(NODE_PIDFILES):
+        # core.numa pulls in autotune and the supervisor: only worth it when there are instances to update
+        from core.numa import follow_pool_changes
+        follow_pool_changes()
+    if args.command == "schedules":
+        view_schedules()
+        return 0
+    if args.command == "unschedule":
+        return 0 if remove_schedule(args.number) else 1
+    config = load_config()
+    if config is None:
+        return 1
+    if args.command == "status":
+        print_local_status(config)
+    elif args.command == "pools":
+        show_pools(config)
+    elif args.command == "promote":
+        return 0 if set_pool_on_top(config, args.index) else 1
+    elif args.command == "schedule":
+        try:
+            return 0 if schedule_pool(config, args.index, args.start_time, args.end_time) else 1
+        except ValueError as e:
+            print(f"{RED}Error: {e}{RESET}")
+            return 1
+    elif args.command == "cores":
+        try:
+            set_cpu_threads(config, args.cores)
+        except ValueError as e:
+            print(f"{RED}Error: {e}{RESET}")
+            return 1
+        print(f"{GREEN}Configuration updated to use {args.cores} cores.{RESET}")
+    return 0
+
+
+def run_command(args):
+    """Run a daemon command through the daemon if one is listening, else locally."""
+    from core.control_client import ControlError, DaemonUnreachable, send_command
+    from switcherctl import COMMANDS
+    command, arg_names, printer = COMMANDS[args.command]
+    try:
+        result = send_command(command, **{name: getattr(args, name) for name in arg_names})
+    except DaemonUnreachable:
+        return run_local(args)
+    except ControlError as e:
+        print(f"{RED}Error: {e}{RESET}", file=sys.stderr)
+        return 1
+    printer(result)
+    return 0
+
+
+def run_tool(args):
+    """Commands that do their work in this process, daemon or not."""
+    from core.config_manager import load_config
+    if args.command == "market":
+        from utils.monero_data import get_monero_data
+        get_monero_data()
+        return 0
+    if args.command == "start":
+        if is_xmrig_active():
+            print(f"{GREEN}xmrig is already running.{RESET}")
+            return 0
+        start_xmrig()
+        return 0 if is_xmrig_active() else 1
+    config = load_config()
+    if config is None:
+        return 1
+    if args.command == "probe":
+        from core.pool_prober import run_probe
+        run_probe(config)
+    elif args.command == "stratum":
+        from core.stratum_client import run_stratum_probe
+        run_stratum_probe(config)
+    elif args.command == "profitability":
+        from core.profitability import run_profitability
+        run_profitability(config)
+    return 0
+
+
+def run_interactive(args):
+    """The interactive menu, with the scheduler and background recorders running."""
+    from core.config_manager import config_store
+    from core.history import start_recording
+    from core.scheduler import run_scheduler
+    from utils.monero_data import market_data
     scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
     scheduler_thread.start()
+    market_data.start()
+    start_recording()
+    if args.live and config_store.exists():
+        from core.live_switch import LiveSwitcher
+        from utils.xmrig_api import XmrigApiError
+        try:
+            LiveSwitcher(config_store.load()).start_background()
+        except XmrigApiError as e:
+            print(f"{RED}Live switching disabled: {e}{RESET}")
+    if args.failover and config_store.exists():
+        from core.health_monitor import HealthMonitor
+        from utils.xmrig_api import XmrigApiError
+        try:
+            threading.Thread(target=HealthMonitor(config_store.load()).run, daemon=True).start()
+        except XmrigApiError as e:
+            print(f"{RED}Health failover disabled: {e}{RESET}")
     main()
+    return 0
+
+
+# Commands with their own option parsing: module whose main(argv) gets the remaining arguments
+TOOLS = {
+    "autotune": ("core.autotune", "benchmark CPU layouts and apply the fastest"),
+    "history": ("core.history", "report pool, share, hashrate and price history"),
+    "proxy": ("core.stratum_proxy", "share a few pool connections between many rigs"),
+    "live": ("core.live_switch", "switch pools in the running xmrig and time the first share"),
+    "gossip": ("core.gossip", "share pool health with other switchers on the LAN"),
+    "governor": ("core.thermal_governor", "shed or add threads as the CPU heats up and throttles"),
+    "difficulty": ("core.diff_tuner", "set each pool's fixed difficulty from the measured hashrate"),
+    "mirrors": ("core.mirrors", "point pools at their fastest regional mirror"),
+    "log": ("core.log_tailer", "summarize xmrig.log per pool"),
+    "numa": ("core.numa", "plan or launch one xmrig per NUMA node"),
+    "backtest": ("core.backtest", "replay switching policies over recorded series"),
+    "fleet": ("core.fleet", "manage several rigs"),
+}
+QUICK_COMMANDS = ("status", "pools", "promote", "schedules", "schedule", "unschedule", "cores")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Monero pool switcher for xmrig. Without a command, opens the interactive menu.",
+        epilog="Tools with their own options (see '<tool> --help'): " + ", ".join(TOOLS))
+    parser.add_argument("--metrics", action="store_true", help="serve Prometheus metrics on 127.0.0.1:9479")
+    parser.add_argument("--failover", action="store_true", help="fail over from unhealthy pools (needs xmrig's HTTP API)")
+    parser.add_argument("--live", action="store_true", help="push switches to xmrig's HTTP API instead of waiting for it to reload config.json")
+    parser.add_argument("--daemon", action="store_true", help="same as the daemon command")
+    parser.add_argument("--auto-rank", action="store_true", help="with --daemon: re-rank pools by latency periodically")
+    parser.add_argument("--timing", action="store_true", help="report how long the command took")
+    # Accept --timing after the command too; SUPPRESS keeps the subcommand from resetting it
+    timing = argparse.ArgumentParser(add_help=False)
+    timing.add_argument("--timing", action="store_true", default=argparse.SUPPRESS, help="report how long the command took")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.add_parser("status", parents=[timing], help="show xmrig, pool and schedule status")
+    commands.add_parser("pools", parents=[timing], help="list pools")
+    commands.add_parser("promote", parents=[timing], help="move a pool to the top").add_argument("index", type=int)
+    commands.add_parser("schedules", parents=[timing], help="list schedules")
+    add = commands.add_parser("schedule", parents=[timing], help="schedule a pool between hours")
+    add.add_argument("index", type=int)
+    add.add_argument("start_time", help="HH:MM")
+    add.add_argument("end_time", help="HH:MM")
+    commands.add_parser("unschedule", parents=[timing], help="remove a schedule").add_argument("number", type=int)
+    commands.add_parser("cores", parents=[timing], help="set the number of mining threads").add_argument("cores", type=int)
+    commands.add_parser("start", parents=[timing], help="start xmrig under the supervisor")
+    commands.add_parser("market", parents=[timing], help="show Monero market data")
+    commands.add_parser("probe", parents=[timing], help="probe pool latency and rank pools")
+    commands.add_parser("stratum", parents=[timing], help="measure stratum job latency and rank pools")
+    commands.add_parser("profitability", parents=[timing], help="rank pools by profitability")
+    daemon = commands.add_parser("daemon", parents=[timing], help="run headless; control it with this CLI or switcherctl.py")
+    # SUPPRESS keeps the subcommand from resetting flags given before it
+    daemon.add_argument("--auto-rank", action="store_true", default=argparse.SUPPRESS)
+    daemon.add_argument("--failover", action="store_true", default=argparse.SUPPRESS)
+    daemon.add_argument("--live", action="store_true", default=argparse.SUPPRESS)
+    daemon.add_argument("--proxy", action="store_true", default=False,
+                        help="also run the stratum proxy on port 3334 (see the proxy tool)")
+    daemon.add_argument("--gossip", action="store_true", default=False,
+                        help="share pool health with other switchers on the LAN (see the gossip tool)")
+    daemon.add_argument("--govern", action="store_true", default=False,
+                        help="adjust mining threads to temperature and throttling (see the governor tool)")
+    daemon.add_argument("--tune-difficulty", action="store_true", default=False,
+                        help="keep pools' fixed difficulty matched to the hashrate (see the difficulty tool)")
+    daemon.add_argument("--metrics", action="store_true", default=argparse.SUPPRESS)
+    return parser
+
+
+def _process_age():
+    """Seconds since the interpreter started, to the kernel's clock tick; None where /proc can't tell."""
+    try:
+        with open("/proc/self/stat", "r") as file:
+            fields = file.read().rsplit(")", 1)[1].split()
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def report_timing(command):
+    age = _process_age()
+    # Interpreter start-up and the imports before _STARTED count too; without /proc they can't be seen
+    elapsed = (age if age is not None else time.perf_counter() - _STARTED) * 1000
+    over = command in QUICK_COMMANDS and elapsed > STARTUP_BUDGET_MS
+    budget = f" (budget {STARTUP_BUDGET_MS} ms)" if command in QUICK_COMMANDS else ""
+    print(f"{RED if over else CYAN}{command or 'menu'}: {elapsed:.1f} ms{budget}{RESET}", file=sys.stderr)
+
+
+def cli(argv=None):
+    """Dispatch a command line; returns the exit code."""
+    argv = sys.argv[1:] if argv is None else argv
+    timing = "--timing" in argv
+    if argv and argv[0] in TOOLS:
+        import importlib
+        from core.numa import follow_pool_changes
+        follow_pool_changes()
+        code = importlib.import_module(TOOLS[argv[0]][0]).main([arg for arg in argv[1:] if arg != "--timing"])
+        if timing:
+            report_timing(argv[0])
+        return code
+
+    args = build_parser().parse_args(argv)
+    if args.daemon:
+        args.command = "daemon"
+    if args.metrics:
+        # Prometheus text format on http://127.0.0.1:9479/metrics
+        from utils.metrics import start_metrics_server
+        start_metrics_server()
+    if args.command not in QUICK_COMMANDS:
+        # Keep per-node instances (python3 -m core.numa --launch) on the pools this process picks;
+        # quick commands change pools in the daemon, or in run_local
+        from core.numa import follow_pool_changes
+        follow_pool_changes()
+
+    if args.command == "daemon":
+        from core.daemon import run_daemon
+        started = run_daemon(auto_rank=args.auto_rank, failover=args.failover, live=args.live,
+                             proxy=getattr(args, "proxy", False), gossip=getattr(args, "gossip", False),
+                             governor=getattr(args, "govern", False),
+                             tune_difficulty=getattr(args, "tune_difficulty", False))
+        return 0 if started else 1
+    if args.command in QUICK_COMMANDS:
+        code = run_command(args)
+    elif args.command:
+        code = run_tool(args)
+    else:
+        code = run_interactive(args)
+    if args.timing:
+        report_timing(args.command)
+    return code
+
+
+if __name__ == "__main__":
+    ensure_environment()
+    sys.exit(cli())
@@ -1,14 +1,12 @@
-import json
-import os
 from datetime import datetime
 from urllib.parse import urlparse
 import schedule
 import time
 import requests
+from core.config_manager import config_store, load_config, save_config
 
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_FILE = os.path.join(os.path.dirname(BASE_DIR), "config.json") 
+CONFIG_FILE = config_store.path
 print(f"Looking for config.json at: {CONFIG_FILE}")
 
 schedules = []
@@ -50,21 +48,6 @@ MONERO_LOGO = f"""
                     *********
 """
 
-def load_config():
-    """Load the configuration from the config.json file."""
-    if not os.path.exists(CONFIG_FILE):
-        print(f"{RED}Error: {CONFIG_FILE} not found.{RESET}")
-        return None
-    with open(CONFIG_FILE, "r") as file:
-        return json.load(file)
-
-def save_config(config):
-    """Save the updated configuration to the config.json file."""
-    with open(CONFIG_FILE, "w") as file:
-        json.dump(config, file, indent=4)
-    print(f"{GREEN}Configuration saved to {CONFIG_FILE}.{RESET}")
-
-
 def show_pools(config):
     """List all pools in the config.json."""
     pools = config.get("pools", [])
@@ -79,20 +62,21 @@ def show_pools(config):
 
 def set_pool_on_top(config, pool_index):
     """Move a specific pool to the top of the list."""
-    pools = config.get("pools", [])
-    if not pools:
-        print(f"{RED}No pools found in the configuration.{RESET}")
-        return False
-    if 1 <= pool_index <= len(pools):
-        pool = pools.pop(pool_index - 1)
-        pools.insert(0, pool)
-        config["pools"] = pools
-        print(f"{GREEN}Moved pool with domain {get_domain(pool['url'])} to the top of the list.{RESET}")
-        save_config(config)
-        return True
-    else:
-        print(f"{RED}Invalid number. Enter a number between 1 and {len(pools)}.{RESET}")
-        return False
+    with config_store.lock:
+        pools = config.get("pools", [])
+        if not pools:
+            print(f"{RED}No pools found in the configuration.{RESET}")
+            return False
+        if 1 <= pool_index <= len(pools):
+            pool = pools.pop(pool_index - 1)
+            pools.insert(0, pool)
+            config["pools"] = pools
+            print(f"{GREEN}Moved pool with domain {get_domain(pool['url'])} to the top of the list.{RESET}")
+            save_config(config)
+            return True
+        else:
+            print(f"{RED}Invalid number. Enter a number between 1 and {len(pools)}.{RESET}")
+            return False
 
 
 def schedule_pool(config, pool_index, start_time, end_time):
@@ -0,0 +1,116 @@
+import argparse
+import json
+import sys
+from core.control_client import SOCKET_PATH, ControlError, send_command
+from utils.helpers import BOLD, CYAN, GREEN, RED, RESET
+
+
+def print_pools(pools):
+    print(f"{CYAN}Current Pools:{RESET}")
+    for pool in pools:
+        latency = f"  p50 {pool['p50_ms']:.1f} ms  loss {pool['loss']:.0%}" if pool["p50_ms"] is not None else ""
+        print(f"  {BOLD}{pool['index']}. Domain:{RESET} {pool['domain']}{latency}")
+
+
+def print_schedules(schedules):
+    if not schedules:
+        print(f"{CYAN}No active schedules.{RESET}")
+        return
+    print(f"{CYAN}Active Schedules:{RESET}")
+    for sched in schedules:
+        print(f"  {sched['number']}. Pool {sched['pool'].split('|', 1)[0]} from {sched['start_time']} to {sched['end_time']}.")
+
+
+def print_status(status):
+    print(f"{CYAN}Pool switcher daemon:{RESET}")
+    running = {True: f"{GREEN}running{RESET}", False: f"{RED}not running{RESET}", None: "unknown"}
+    pid = f" (pid {status['xmrig_pid']})" if status.get("xmrig_pid") else ""
+    print(f"  xmrig: {running[status['xmrig_running']]}{pid}")
+    if status.get("xmrig_crash_loop"):
+        print(f"  {RED}xmrig is crash-looping; exit codes: {status['xmrig_exit_codes']}{RESET}")
+    if status.get("xmrig_start_error"):
+        print(f"  {RED}xmrig failed to start: {status['xmrig_start_error']}{RESET}")
+    print(f"  Top pool: {status['top_pool']}")
+    active = status["active_schedule"]
+    print(f"  Active schedule: {active['start_time']}-{active['end_time']}" if active else "  Active schedule: none")
+    print(f"  Mining threads: {status['threads']}")
+    health = status.get("health")
+    if health is not None:
+        problems = health["error"] or "; ".join(health["problems"]) or f"{GREEN}healthy{RESET}"
+        print(f"  Pool health: {problems}")
+    live = status.get("live")
+    if live is not None:
+        last = live["last_switch"]
+        if live["error"]:
+            print(f"  Live switching: {RED}{live['error']}{RESET}")
+        elif last:
+            share = f"{last['first_share_s']:.2f}s" if last["first_share_s"] is not None else last["result"]
+            print(f"  Last switch: {last['pool']} ({last['cause']}), pushed in {last['push_ms']:.1f} ms, first share {share}")
+    proxy = status.get("proxy")
+    if proxy is not None:
+        print(f"  Stratum proxy on {proxy['listen']}: {proxy['miners']} miner(s) over {proxy['upstreams']} connection(s)"
+              f" to {', '.join(proxy['pools']) or 'no pool'}")
+    gossip = status.get("gossip")
+    if gossip is not None:
+        down = f", {RED}down: {', '.join(gossip['down'])}{RESET}" if gossip["down"] else ""
+        print(f"  Gossip: {gossip['peers']} peer(s){down}")
+    governor = status.get("governor")
+    if governor is not None:
+        temp = f", {governor['temp']:.0f}°C" if governor["temp"] is not None else ""
+        error = f", {RED}{governor['error']}{RESET}" if governor["error"] else ""
+        print(f"  Governor: {governor['threads']}/{governor['max_threads']} threads{temp}{error}")
+    difficulty = status.get("difficulty")
+    if difficulty is not None:
+        tuned = f"tuned for {difficulty['tuned_for']:.0f} H/s" if difficulty["tuned_for"] else "not tuned yet"
+        error = f", {RED}{difficulty['error']}{RESET}" if difficulty["error"] else ""
+        print(f"  Fixed difficulty: {tuned}{error}")
+    print(f"  Uptime: {status['uptime']:.0f}s")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Control a running pool switcher daemon.")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="daemon control socket")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="show daemon status")
+    commands.add_parser("pools", help="list pools")
+    commands.add_parser("promote", help="move a pool to the top").add_argument("index", type=int)
+    commands.add_parser("schedules", help="list schedules")
+    add = commands.add_parser("schedule", help="schedule a pool between hours")
+    add.add_argument("index", type=int)
+    add.add_argument("start_time", help="HH:MM")
+    add.add_argument("end_time", help="HH:MM")
+    commands.add_parser("unschedule", help="remove a schedule").add_argument("number", type=int)
+    commands.add_parser("cores", help="set the number of mining threads").add_argument("cores", type=int)
+    return parser
+
+
+# CLI command -> (daemon command, argument names, printer)
+COMMANDS = {
+    "status": ("status", (), print_status),
+    "pools": ("list_pools", (), print_pools),
+    "promote": ("promote", ("index",), print_pools),
+    "schedules": ("list_schedules", (), print_schedules),
+    "schedule": ("add_schedule", ("index", "start_time", "end_time"), print_schedules),
+    "unschedule": ("remove_schedule", ("number",), print_schedules),
+    "cores": ("set_cores", ("cores",), lambda result: print(f"{GREEN}Configuration updated to use {result['threads']} cores.{RESET}")),
+}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    command, arg_names, printer = COMMANDS[args.command]
+    try:
+        result = send_command(command, args.socket, **{name: getattr(args, name) for name in arg_names})
+    except ControlError as e:
+        print(f"{RED}Error: {e}{RESET}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        printer(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
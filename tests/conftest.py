@@ -0,0 +1,37 @@
+import pytest
+from core import pool_manager
+from core.config_manager import config_store, serialize_config
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    """Point the shared config_store at a config.json in tmp_path; returns a function taking the config dict.
+
+    Every module imported config_store itself, so the store is retargeted in
+    place and restored afterwards; the real config.json is never touched.
+    Writes are immediate unless a debounce is given.
+    """
+    saved = {name: getattr(config_store, name) for name in ("path", "debounce", "_config", "_stamp", "_written")}
+    config_store.flush()
+
+    def make(config, debounce=0):
+        path = tmp_path / "config.json"
+        path.write_text(serialize_config(config))
+        config_store.flush()
+        config_store.path = str(path)
+        config_store.debounce = debounce
+        config_store._config = config_store._stamp = config_store._written = None
+        return config_store.load()
+
+    yield make
+    config_store.flush()
+    for name, value in saved.items():
+        setattr(config_store, name, value)
+
+
+@pytest.fixture(autouse=True)
+def restore_listeners():
+    """Drop pool_manager listeners a test registered (LiveSwitcher, proxy, NUMA instances...)."""
+    listeners = list(pool_manager._listeners)
+    yield
+    pool_manager._listeners[:] = listeners
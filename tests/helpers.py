@@ -0,0 +1,130 @@
+import asyncio
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+async def start_listener(stall=False, host="127.0.0.1", port=0):
+    """A local TCP listener standing in for a pool; with `stall` it accepts but never answers (a TLS hang)."""
+    async def handle(reader, writer):
+        if stall:
+            await reader.read()
+        writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def listener_url(server):
+    host, port = server.sockets[0].getsockname()[:2]
+    return f"{host}:{port}"
+
+
+def closed_port():
+    """A local port nothing listens on, so connections to it are refused."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class XmrigApiStandIn:
+    """A local xmrig HTTP API: /2/summary from the attributes a test sets, GET and PUT /1/config.
+
+    Subclasses override summary() to derive the connection from the running config.
+    """
+
+    def __init__(self, running_config=None):
+        self.running_config = running_config or {}
+        self.puts = 0
+        self.pool = "a.test:3333"
+        self.uptime = 120
+        self.failures = 0
+        self.accepted = 0
+        self.shares = 0
+        self.good = 0
+        self.diff = 100_000
+        self.hashrate = 5000.0
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._http.daemon_threads = True
+        threading.Thread(target=self._http.serve_forever, args=(0.05,), daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._http.server_address[1]}"
+
+    def summary(self):
+        return {
+            "connection": {"pool": self.pool, "uptime": self.uptime, "failures": self.failures, "accepted": self.accepted},
+            "results": {"shares_total": self.shares, "shares_good": self.good, "diff_current": self.diff},
+            "hashrate": {"total": [self.hashrate, self.hashrate, None]},
+        }
+
+    def put_config(self, config):
+        self.running_config = config
+        self.puts += 1
+
+    def close(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like xmrig
+
+            def _reply(self, body, status=200):
+                data = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                routes = {"/2/summary": stand_in.summary, "/1/config": lambda: stand_in.running_config}
+                route = routes.get(self.path)
+                self._reply(route() if route else None, 200 if route else 404)
+
+            def do_PUT(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if self.path != "/1/config":
+                    return self._reply(None, 404)
+                stand_in.put_config(body)
+                self._reply(None, 204)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def write_file(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"{text}\n")
+
+
+def make_cpu_tree(root, sockets=1, cores=4, threads=2, l3="8192K", free_hugepages=None):
+    """Write a fake /sys/devices/system under `root`: one NUMA node and L3 per socket.
+
+    CPUs are numbered like Linux does: the first thread of every core, then
+    the SMT siblings, so with 4 cores and 2 threads CPU 4 is CPU 0's sibling.
+    """
+    total_cores = sockets * cores
+    count = total_cores * threads
+    write_file(root / "cpu/online", f"0-{count - 1}")
+    socket_cpus = {socket: [cpu for cpu in range(count) if cpu % total_cores // cores == socket]
+                   for socket in range(sockets)}
+    for cpu in range(count):
+        socket = cpu % total_cores // cores
+        base = root / f"cpu/cpu{cpu}"
+        write_file(base / "topology/physical_package_id", socket)
+        write_file(base / "topology/core_id", cpu % cores)
+        write_file(base / "cache/index3/level", 3)
+        write_file(base / "cache/index3/size", l3)
+        write_file(base / "cache/index3/shared_cpu_list", ",".join(map(str, socket_cpus[socket])))
+    for socket, cpus in socket_cpus.items():
+        write_file(root / f"node/node{socket}/cpulist", ",".join(map(str, cpus)))
+        if free_hugepages is not None:
+            write_file(root / f"node/node{socket}/hugepages/hugepages-2048kB/free_hugepages", free_hugepages[socket])
+    return root
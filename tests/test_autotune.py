@@ -0,0 +1,117 @@
+import json
+import sys
+import pytest
+from core import autotune
+from core.autotune import (autotune as run_autotune, candidate_layouts, fingerprint, parse_bench_output,
+                           parse_cpu_list, parse_size, read_topology)
+from tests.helpers import make_cpu_tree
+
+FAKE_XMRIG = """#!{python}
+# Stand-in for xmrig --bench: reports the hashrate RATES gives the configured CPU layout
+import json, sys
+RATES = {rates!r}
+config_path = sys.argv[sys.argv.index("--config") + 1]
+with open(config_path) as file:
+    config = json.load(file)
+layout = ",".join(str(thread["affine_to_cpu"]) for thread in config["cpu"]["threads"])
+with open({calls!r}, "a") as file:
+    file.write(layout + "\\n")
+rate = RATES.get(layout, 1000.0)
+if rate is None:
+    print("[2024-01-01 00:00:00.000]  cpu      failed to allocate RandomX dataset")
+    sys.exit(1)
+print(f"[2024-01-01 00:00:10.000]  miner    speed 10s/60s/15m {{rate:.1f}} n/a n/a H/s max {{rate:.1f}} H/s")
+print(f"[2024-01-01 00:00:20.000]  bench    benchmark finished in {{1e6 / rate:.3f}}s")
+"""
+
+
+@pytest.fixture
+def tuning(tmp_path, monkeypatch):
+    """A fake 2-socket sysfs tree, a fake xmrig and an empty autotune cache in tmp_path."""
+    monkeypatch.setattr(autotune.autotune_store, "path", str(tmp_path / "autotune.json"))
+    monkeypatch.setattr(autotune.autotune_store, "_config", None)
+    monkeypatch.setattr(autotune.autotune_store, "_stamp", None)
+    monkeypatch.setattr(autotune, "ensure_attached", lambda: False)
+    root = make_cpu_tree(tmp_path / "sys", sockets=2, cores=4, threads=2, l3="4096K")
+    calls = tmp_path / "calls"
+
+    def fake_xmrig(rates):
+        binary = tmp_path / "xmrig"
+        binary.write_text(FAKE_XMRIG.format(python=sys.executable, rates=rates, calls=str(calls)))
+        binary.chmod(0o755)
+        return str(binary)
+
+    def benchmarked():
+        return calls.read_text().split() if calls.exists() else []
+
+    return root, fake_xmrig, benchmarked
+
+
+def test_parsers():
+    assert parse_cpu_list("0-3,8,10-11") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpu_list("") == []
+    assert parse_size("32768K") == 32 * 1024 ** 2
+    assert parse_size("bogus") is None
+    output = "speed 10s/60s/15m 1200.5 n/a n/a H/s max 1300.0 H/s\nbenchmark finished in 500.000s\n"
+    assert parse_bench_output(output, hashes=1_000_000) == 2000.0
+    assert parse_bench_output(output) == 1200.5
+    assert parse_bench_output("speed 10s/60s/15m n/a n/a n/a H/s max n/a H/s") is None
+
+
+def test_read_topology_from_a_fake_tree(tuning):
+    root = tuning[0]
+    topology = read_topology(str(root))
+    assert topology["cpus"] == list(range(16))
+    assert topology["cores"][0] == [0, 8]  # CPU 8 is CPU 0's SMT sibling
+    assert len(topology["cores"]) == 8
+    assert topology["nodes"] == [[0, 1, 2, 3, 8, 9, 10, 11], [4, 5, 6, 7, 12, 13, 14, 15]]
+    assert [domain["size"] for domain in topology["l3"]] == [4 * 1024 ** 2] * 2
+
+
+def test_candidate_layouts(tuning):
+    layouts = dict(candidate_layouts(read_topology(str(tuning[0]))))
+    assert layouts["all"] == [0, 1, 2, 3, 8, 9, 10, 11, 4, 5, 6, 7, 12, 13, 14, 15]  # Grouped by node
+    assert layouts["physical"] == list(range(8))
+    assert layouts["cache"] == [0, 1, 4, 5]  # 4 MiB of L3 per socket fits two 2 MiB scratchpads
+    assert "cache-physical" not in layouts  # Same CPUs as "cache"
+    assert layouts["node0"] == [0, 1, 2, 3] and layouts["node1"] == [4, 5, 6, 7]
+
+
+def test_autotune_applies_the_fastest_layout(make_config, tuning):
+    root, fake_xmrig, benchmarked = tuning
+    config = make_config({"pools": [], "cpu": {"enabled": True}})
+    xmrig = fake_xmrig({"0,1,4,5": 4200.0, "0,1,2,3,8,9,10,11,4,5,6,7,12,13,14,15": None})
+    entry = run_autotune(config, str(root), xmrig)
+    assert entry["name"] == "cache"
+    assert entry["hashrate"] == pytest.approx(4200.0, rel=1e-3)
+    assert [thread["affine_to_cpu"] for thread in config["cpu"]["threads"]] == [0, 1, 4, 5]
+    assert {result["name"]: result["hashrate"] for result in entry["results"]}["all"] is None
+    assert len(benchmarked()) == 5
+
+
+def test_autotune_is_cached_per_topology(make_config, tuning, tmp_path):
+    root, fake_xmrig, benchmarked = tuning
+    config = make_config({"pools": []})
+    xmrig = fake_xmrig({"0,1,2,3,4,5,6,7": 5000.0})
+    run_autotune(config, str(root), xmrig)
+    runs = len(benchmarked())
+    assert run_autotune(config, str(root), xmrig)["name"] == "physical"
+    assert len(benchmarked()) == runs  # Cached: no benchmarks
+
+    run_autotune(config, str(root), xmrig, force=True)
+    assert len(benchmarked()) == 2 * runs
+
+    other = make_cpu_tree(tmp_path / "sys-other", sockets=1, cores=4, threads=2)
+    run_autotune(config, str(other), xmrig)
+    assert len(benchmarked()) > 2 * runs  # New hardware, new benchmarks
+    with open(autotune.autotune_store.path) as file:
+        cache = json.load(file)
+    assert set(cache) == {fingerprint(read_topology(str(root))), fingerprint(read_topology(str(other)))}
+
+
+def test_autotune_without_any_result_changes_nothing(make_config, tuning):
+    root, fake_xmrig, _ = tuning
+    config = make_config({"pools": [], "cpu": {"enabled": True}})
+    layouts = [",".join(map(str, cpus)) for _, cpus in candidate_layouts(read_topology(str(root)))]
+    assert run_autotune(config, str(root), fake_xmrig({layout: None for layout in layouts})) is None
+    assert config["cpu"] == {"enabled": True}
@@ -0,0 +1,36 @@
+import pytest
+from core.backtest import rank_choices, simulate
+from core.schedule_store import make_schedule
+
+np = pytest.importorskip("numpy")
+
+
+def test_a_decision_waits_for_the_minute_it_saw():
+    earnings = np.ones((10, 2))
+    earnings[5, 1] = 3.0  # Pool 1 pays better for one minute only
+    choices = rank_choices(1 / earnings)
+    assert choices.tolist() == [0] * 6 + [1] * 4  # Too late for that minute: it switches at minute 6
+    assert rank_choices(1 / earnings, start_pool=1)[0] == 1
+    assert len(rank_choices(np.ones((0, 2)))) == 0
+
+    result = simulate(earnings, {"type": "rank", "switch_cost": 0})
+    assert result["earnings"] == 10.0 and result["switches"] == 1
+
+
+def test_ranking_gains_nothing_on_noise():
+    earnings = np.random.default_rng(7).uniform(0.5, 1.5, (14 * 1440, 3))  # Two weeks, three equal pools
+    static = simulate(earnings, {"type": "static", "pool": 0, "switch_cost": 0})
+    ranked = simulate(earnings, {"type": "rank", "switch_cost": 0})
+    assert ranked["switches"] > 1000
+    # Knowing the current minute would pick the best of three, about +25%
+    assert ranked["earnings"] == pytest.approx(static["earnings"], rel=0.01)
+    assert simulate(earnings, {"type": "rank"})["earnings"] < static["earnings"]  # Switching still costs
+
+
+def test_schedules_promote_their_pool_until_the_next_one():
+    pools = ["a.test:3333", "b.test:3333"]
+    earnings = np.ones((24 * 60, 2))
+    schedules = [make_schedule("b.test:3333|wallet", "06:00", "18:00")]
+    result = simulate(earnings, {"type": "schedule", "schedules": schedules}, pools=pools)
+    assert result["minutes"] == [6 * 60, 18 * 60]  # b.test stays on top once its window closes
+    assert result["switches"] == 1
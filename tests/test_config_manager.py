@@ -0,0 +1,98 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from core.config_manager import ConfigStore, config_writes, serialize_config
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Increments "count" in a config file `rounds` times, each a locked read-modify-write
+WRITER = """
+import sys
+from core.config_manager import ConfigStore
+
+store = ConfigStore(sys.argv[1], debounce=0)
+for _ in range(int(sys.argv[2])):
+    with store.transaction() as config:
+        config["count"] += 1
+"""
+
+# Leaves a change in the debounce window and exits; the atexit hook must write it
+EXITER = """
+import sys
+from core.config_manager import config_store
+
+config_store.path, config_store.debounce = sys.argv[1], 60
+config = config_store.load()
+config["pools"].append({"url": "b.test:3333"})
+config_store.save(config)
+"""
+
+
+def run_python(script, *args):
+    return subprocess.Popen([sys.executable, "-c", script, *map(str, args)], cwd=PROJECT_DIR,
+                            env=dict(os.environ, PYTHONPATH=PROJECT_DIR))
+
+
+def written(path):
+    return config_writes.value(file=os.path.basename(path), result="written")
+
+
+def test_concurrent_writers_in_other_processes_lose_nothing(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(serialize_config({"count": 0}))
+    writers = [run_python(WRITER, path, 50) for _ in range(4)]
+    assert [writer.wait(timeout=60) for writer in writers] == [0] * 4
+    assert json.loads(path.read_text()) == {"count": 200}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]  # No temp file left behind
+
+
+def test_a_burst_of_saves_is_one_write(tmp_path):
+    path = str(tmp_path / "config.json")
+    store = ConfigStore(path, debounce=0.2)
+    before = written(path)
+    config = {"pools": []}
+    for idx in range(20):
+        config["pools"].append({"url": f"pool{idx}.test:3333"})
+        store.save(config)
+    assert not os.path.exists(path)  # Still inside the debounce window
+    assert store.load() is config  # Pending changes are newer than the file
+    time.sleep(0.5)
+    assert written(path) == before + 1
+    assert len(json.loads(open(path).read())["pools"]) == 20
+
+    store.save(config)
+    assert store.flush() is False  # Nothing changed: no rewrite
+    assert written(path) == before + 1
+
+
+def test_pending_changes_are_written_on_exit(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(serialize_config({"pools": [{"url": "a.test:3333"}]}))
+    started = time.monotonic()
+    assert run_python(EXITER, path).wait(timeout=30) == 0
+    assert time.monotonic() - started < 30  # Didn't wait out the debounce
+    assert [pool["url"] for pool in json.loads(path.read_text())["pools"]] == ["a.test:3333", "b.test:3333"]
+
+
+def test_external_edits_refresh_the_shared_dict(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(serialize_config({"pools": [{"url": "a.test:3333"}]}))
+    store = ConfigStore(str(path), debounce=0)
+    config = store.load()
+    assert store.load() is config  # Served from memory while the file is unchanged
+
+    replacement = tmp_path / "edited.json"
+    replacement.write_text(serialize_config({"pools": [{"url": "b.test:3333"}]}))  # Same size, new inode
+    os.replace(replacement, path)
+    assert store.load() is config
+    assert config["pools"][0]["url"] == "b.test:3333"
+
+    with open(path, "w") as file:  # Edited in place, like a text editor that doesn't rename
+        file.write(serialize_config({"pools": [], "donate-level": 1}))
+    assert store.load() is config
+    assert config == {"pools": [], "donate-level": 1}
+
+    os.unlink(path)
+    assert store.load() is None
@@ -0,0 +1,74 @@
+import asyncio
+import socket
+from core.daemon import SwitcherDaemon
+from core.pool_manager import rank_pools
+from core.pool_prober import PoolProber
+
+
+class ReorderingProber(PoolProber):
+    """Scores pools from a fixed table; while a round is in flight, `during_round` changes the pools."""
+
+    def __init__(self, latencies, during_round):
+        super().__init__()
+        self.latencies = latencies
+        self.during_round = during_round
+        self.rounds = asyncio.Event()
+
+    async def probe_all(self, pools):
+        await asyncio.sleep(0)
+        self.during_round()
+        for url, rtt in self.latencies.items():
+            self.stats_for({"url": url}).record(rtt)
+        self.rounds.set()
+
+
+def run_one_round(daemon):
+    async def scenario():
+        task = asyncio.create_task(daemon._probe_loop())
+        await daemon.prober.rounds.wait()
+        await asyncio.sleep(0)  # Let the loop rank after the round
+        task.cancel()
+
+    asyncio.run(scenario())
+
+
+def urls(config):
+    return [pool["url"] for pool in config["pools"]]
+
+
+def test_probe_loop_scores_the_pools_as_reordered_during_the_round(make_config):
+    config = make_config({"pools": [{"url": "a.test:1"}, {"url": "b.test:1"}, {"url": "c.test:1"}]})
+    daemon = SwitcherDaemon(config, socket_path="unused.sock", auto_rank=True)
+    # A failover or gossip reaction replaces config["pools"] with a new list mid-round
+    daemon.prober = ReorderingProber({"a.test:1": 100.0, "b.test:1": 10.0, "c.test:1": 50.0},
+                                     lambda: rank_pools(config, [3, 2, 1]))
+    run_one_round(daemon)
+    assert urls(config) == ["b.test:1", "c.test:1", "a.test:1"]
+
+
+def test_probe_loop_survives_a_pool_removed_during_the_round(make_config):
+    config = make_config({"pools": [{"url": "a.test:1"}, {"url": "b.test:1"}, {"url": "c.test:1"}]})
+    daemon = SwitcherDaemon(config, socket_path="unused.sock", auto_rank=True)
+    daemon.prober = ReorderingProber({"a.test:1": 100.0, "b.test:1": 10.0, "c.test:1": 50.0},
+                                     lambda: config.update(pools=config["pools"][:2]))
+    run_one_round(daemon)
+    assert urls(config) == ["b.test:1", "a.test:1"]
+
+
+def test_a_second_daemon_leaves_a_live_socket_alone(make_config, tmp_path):
+    config = make_config({"pools": [{"url": "a.test:1"}]})
+    path = str(tmp_path / "switcher.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as first:  # The running daemon's socket
+        first.bind(path)
+        first.listen()
+        assert asyncio.run(SwitcherDaemon(config, socket_path=path).run()) is False
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(path)  # Still the first daemon's
+
+
+def test_a_failing_handler_is_an_error_reply(make_config):
+    daemon = SwitcherDaemon(make_config({"pools": []}), socket_path="unused.sock")
+    daemon.commands["status"] = lambda: {}["missing"]
+    response = daemon.dispatch({"command": "status"})
+    assert response["ok"] is False and "status failed" in response["error"]
+    assert daemon.dispatch({"command": "list_pools"}) == {"ok": True, "result": []}
@@ -0,0 +1,86 @@
+import pytest
+from core import diff_tuner
+from core.diff_tuner import (DifficultyTuner, difficulty_adapter, optimal_difficulty, plan_difficulties,
+                             register_pool_difficulty, split_difficulty)
+from core.pool_manager import add_listener, pool_key, set_pool_users
+from tests.helpers import XmrigApiStandIn
+from utils.xmrig_api import XmrigApi
+
+WALLET = "4ABCwallet.rig1"
+POOLS = [{"url": "pool.supportxmr.com:443", "user": WALLET}, {"url": "xmr-eu1.nanopool.org:14433", "user": WALLET},
+         {"url": "gulf.moneroocean.stream:10128", "user": WALLET + "+5000"}]
+
+
+def users(config):
+    return [pool["user"] for pool in config["pools"]]
+
+
+def test_each_pool_gets_its_own_syntax_and_limits(monkeypatch):
+    assert difficulty_adapter(POOLS[0]) == ("+", 1000, None)
+    assert difficulty_adapter(POOLS[1]) is None  # nanopool keeps vardiff
+    assert split_difficulty(POOLS[2]) == (WALLET, 5000)
+    assert split_difficulty({"url": "xmr-eu1.nanopool.org:14433", "user": WALLET + "+5000"})[1] is None
+    assert pool_key(POOLS[2]) == pool_key(dict(POOLS[2], user=WALLET + "+9000"))  # Same pool identity
+
+    assert optimal_difficulty(1234.0, 30) == 37000  # Two significant digits
+    assert optimal_difficulty(10.0, 30, ("+", 1000, None)) == 1000  # Clamped to the pool's minimum
+    assert optimal_difficulty(1e6, 30, ("+", 1000, 500_000)) == 500_000
+
+    monkeypatch.setattr(diff_tuner, "POOL_DIFFICULTY", dict(diff_tuner.POOL_DIFFICULTY))
+    assert difficulty_adapter({"url": "192.168.1.5:3333"}) is None
+    register_pool_difficulty("192.168.1.5", "p2pool")  # A local p2pool node
+    assert difficulty_adapter({"url": "192.168.1.5:3333"}) == ("+", 1000, None)
+    with pytest.raises(ValueError):
+        register_pool_difficulty("192.168.1.5", "unknown-pool-software")
+
+
+def test_plan_only_touches_pools_with_a_syntax():
+    config = {"pools": [dict(pool) for pool in POOLS]}
+    assert plan_difficulties(config, 1000.0) == {1: (WALLET, WALLET + "+30000"), 3: (WALLET + "+5000", WALLET + "+30000")}
+    assert plan_difficulties(config, None) == {3: (WALLET + "+5000", WALLET)}  # Back to vardiff
+
+
+def test_a_retune_writes_once_and_follows_drift(make_config):
+    xmrig = XmrigApiStandIn()
+    try:
+        config = make_config({"pools": [dict(pool) for pool in POOLS]})
+        calls = []
+        add_listener(lambda config, cause: calls.append(cause))
+        tuner = DifficultyTuner(config, api=XmrigApi(xmrig.url))
+        assert tuner.tuned_for == 5000 / 30
+
+        xmrig.hashrate = 1000.0
+        assert sorted(tuner.step()) == [1, 3]
+        assert users(config) == [WALLET + "+30000", WALLET, WALLET + "+30000"]
+        assert calls == ["difficulty"]  # One notification (and live push) for both pools
+
+        xmrig.hashrate = 1200.0  # Within the 25% drift: left alone
+        assert tuner.step() == {}
+        xmrig.hashrate = 1300.0
+        assert sorted(tuner.step()) == [1, 3]
+        assert users(config)[0] == WALLET + "+39000" and tuner.tuned_for == 1300.0
+        assert len(calls) == 2
+    finally:
+        xmrig.close()
+
+
+def test_a_clamped_difficulty_is_no_baseline(make_config):
+    xmrig = XmrigApiStandIn()
+    try:
+        config = make_config({"pools": [{"url": "pool.supportxmr.com:443", "user": WALLET + "+1000"}]})
+        tuner = DifficultyTuner(config, api=XmrigApi(xmrig.url))
+        assert tuner.tuned_for is None  # 1000 is the minimum: the rig may be far slower than 33 H/s
+        xmrig.hashrate = 10.0
+        assert tuner.step() == {}  # Still the minimum, nothing to write
+        assert tuner.tuned_for == 10.0
+        assert not tuner.drifted(11.0)
+    finally:
+        xmrig.close()
+
+
+def test_a_pool_edited_meanwhile_keeps_its_user(make_config):
+    config = make_config({"pools": [dict(pool) for pool in POOLS]})
+    changes = plan_difficulties(config, 1000.0)
+    config["pools"][2]["user"] = "4DEFother+5000"  # Edited after the plan was made
+    assert set_pool_users(config, changes, cause="difficulty") == [1]
+    assert users(config) == [WALLET + "+30000", WALLET, "4DEFother+5000"]
@@ -0,0 +1,64 @@
+import json
+import os
+from core.config_manager import serialize_config
+from core.fleet import apply_to_fleet, load_inventory, main, match_pool, promote, set_cores
+
+POOLS = [{"url": "pool.supportxmr.com:443", "user": "wallet"}, {"url": "xmr-eu1.nanopool.org:14433", "user": "wallet"}]
+
+
+def make_rigs(root, count):
+    """Write `count` rig configs under root/rigN/config.json; returns their paths."""
+    paths = []
+    for idx in range(count):
+        path = root / f"rig{idx}" / "config.json"
+        path.parent.mkdir(parents=True)
+        path.write_text(serialize_config({"pools": POOLS, "cpu": {"enabled": True}}))
+        paths.append(str(path))
+    return paths
+
+
+def top(path):
+    with open(path) as file:
+        return json.load(file)["pools"][0]["url"]
+
+
+def test_inventory_lines_are_paths_directories_or_globs(tmp_path):
+    paths = make_rigs(tmp_path, 3)
+    inventory = tmp_path / "fleet.txt"
+    inventory.write_text("# lab rigs\nrig0\n\nrig*  # every rig\n" + paths[2] + "\nmissing/config.json\n")
+    assert load_inventory(str(inventory)) == paths + [str(tmp_path / "missing" / "config.json")]
+
+
+def test_match_pool_by_url_domain_or_identity():
+    assert match_pool(POOLS, "xmr-eu1.nanopool.org:14433") == 2
+    assert match_pool(POOLS, "nanopool.org") == 2
+    assert match_pool(POOLS, "supportxmr.com") == 1
+    assert match_pool(POOLS, "moneroocean.stream") is None
+
+
+def test_changes_reach_every_rig_and_failures_are_reported(tmp_path):
+    paths = make_rigs(tmp_path, 5)
+    paths.append(str(tmp_path / "gone" / "config.json"))
+    results = apply_to_fleet(paths, [promote("nanopool.org"), set_cores(2)], workers=4)
+    assert [r["status"] for r in results] == ["changed"] * 5 + ["failed"]
+    assert results[0]["changed"] == ["cpu", "pools"]
+    assert "not found" in results[-1]["error"]
+    assert all(top(path) == "xmr-eu1.nanopool.org:14433" for path in paths[:5])
+
+    stamps = [os.stat(path).st_mtime_ns for path in paths[:5]]
+    again = apply_to_fleet(paths[:5], [promote("nanopool.org")])
+    assert [r["status"] for r in again] == ["unchanged"] * 5
+    assert [os.stat(path).st_mtime_ns for path in paths[:5]] == stamps  # Not rewritten
+
+
+def test_dry_run_and_unknown_pools_write_nothing(tmp_path, capsys):
+    paths = make_rigs(tmp_path, 2)
+    inventory = tmp_path / "fleet.txt"
+    inventory.write_text("rig*\n")
+    assert main([str(inventory), "--promote", "nanopool.org", "--dry-run"]) == 0
+    assert "2 changed" in capsys.readouterr().out
+    assert all(top(path) == "pool.supportxmr.com:443" for path in paths)
+
+    assert main([str(inventory), "--promote", "moneroocean.stream"]) == 1
+    assert "no pool matching moneroocean.stream" in capsys.readouterr().out
+    assert all(top(path) == "pool.supportxmr.com:443" for path in paths)
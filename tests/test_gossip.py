@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+from core.config_manager import serialize_config
+from core.gossip import DOWN_AFTER, PROTOCOL, GossipNode, HealthTable, endpoint
+from core.pool_prober import PoolProber
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POOLS = [{"url": "a.test:3333", "user": "wallet"}, {"url": "b.test:3333", "user": "wallet"}]
+
+# One switcher on the fleet: node 0 can't reach a.test, the others only probe b.test. Each stops
+# once every node has been heard from and a.test is demoted, and prints what it ended up with.
+NODE = """
+import asyncio, json, sys
+from core.config_manager import config_store
+from core.gossip import GossipNode
+
+index, total, port = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+config_store.path, config_store.debounce = sys.argv[4], 0
+config = config_store.load()
+
+
+async def main():
+    node = await GossipNode(config, port=port, interface="127.0.0.1", node_id=f"node{index}", interval=0.05).start()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + 10
+    while loop.time() < deadline:
+        node.publish({"a.test:3333": None} if index == 0 else {"b.test:3333": 10.0 + index})
+        if config["pools"][0]["url"] == "b.test:3333" and len(node.table.fresh()) == total:
+            break
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.3)  # Keep answering peers that are still catching up
+    node.stop()
+    print(json.dumps({"top": config["pools"][0]["url"], "nodes": sorted(node.table.fresh())}))
+
+
+asyncio.run(main())
+"""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingProber(PoolProber):
+    """Answers every probe with 20 ms and counts the pools it actually probed."""
+
+    def __init__(self):
+        super().__init__()
+        self.probed = []
+
+    async def probe_all(self, pools):
+        self.probed.extend(pool["url"] for pool in pools)
+        return [20.0 for _ in pools]
+
+
+def free_udp_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("", 0))
+        return sock.getsockname()[1]
+
+
+def test_tables_converge_whatever_the_order():
+    clock = FakeClock()
+    tables = [HealthTable(f"node{idx}", clock) for idx in range(3)]
+    for idx, table in enumerate(tables):
+        table.observe({"a.test:3333": 10.0 * (idx + 1)})
+    tables[0].observe({"a.test:3333": 5.0})
+    snapshots = [dict(table.snapshots) for table in tables]
+    for table in tables:
+        for other in reversed(snapshots):
+            table.merge(other)
+        table.merge(snapshots[0])  # Duplicates change nothing
+    assert tables[0].vector() == tables[1].vector() == tables[2].vector()
+    assert tables[1].snapshots["node0"]["pools"]["a.test:3333"][0] == 5.0
+    assert sorted(tables[2].missing_from({"node0": 0})) == ["node0", "node1", "node2"]
+
+
+def test_a_pool_is_down_until_some_node_sees_it_answer():
+    clock = FakeClock()
+    failing, healthy = HealthTable("node0", clock), HealthTable("node1", clock)
+    for round_number in range(DOWN_AFTER):
+        clock.now += 1
+        went_down = failing.observe({"a.test:3333": None})
+    assert went_down == ["a.test:3333"] and round_number == DOWN_AFTER - 1
+    healthy.merge(failing.snapshots)
+    assert healthy.view("a.test:3333")["down"]
+
+    clock.now += 1
+    healthy.observe({"a.test:3333": 30.0})
+    assert not healthy.view("a.test:3333")["down"]
+    clock.now += 61
+    assert healthy.view("a.test:3333") is None  # Every report went stale
+
+
+def test_mirrors_are_separate_endpoints():
+    assert endpoint({"url": "stratum+ssl://XMR-EU1.nanopool.org:14433"}) == "xmr-eu1.nanopool.org:14433"
+    assert endpoint({"url": "xmr-us1.nanopool.org:14433"}) != endpoint({"url": "xmr-eu1.nanopool.org:14433"})
+    assert endpoint({"url": "a.test"}) == "a.test:3333"
+
+
+def test_garbage_datagrams_are_dropped(make_config):
+    config = make_config({"pools": [dict(pool) for pool in POOLS]})
+    peer = HealthTable("node1")
+    peer.observe({"a.test:3333": 12.0})
+
+    def datagram(snap, vector=None, proto=PROTOCOL):
+        return json.dumps({"proto": proto, "from": "node9", "vv": vector or {}, "snap": snap}).encode()
+
+    async def scenario():
+        node = await GossipNode(config, port=free_udp_port(), interface="127.0.0.1", node_id="node0").start()
+        try:
+            for data in (b"\xff\xfe", b"[1, 2]", b"null", datagram([1]), datagram({}, vector=[1]),
+                         datagram({}, vector={"node1": "x"}), datagram({"node2": None}),
+                         datagram({"node2": {"v": "9"}}),
+                         datagram({"node2": {"v": 9, "t": 1, "pools": {"a.test:3333": [1, 2]}}}),
+                         datagram({"node2": {"v": 9, "t": 1, "pools": {"a.test:3333": ["fast", 0, None, 1]}}}),
+                         datagram({"node2": {"v": 9, "t": None, "pools": {}}}),
+                         datagram(peer.snapshots, proto=PROTOCOL + 1)):
+                node.datagram_received(data, ("127.0.0.1", 47777))
+            assert node.table.snapshots == {}
+            node.datagram_received(datagram(peer.snapshots), ("127.0.0.1", 47777))
+            assert node.table.view("a.test:3333")["p50"] == 12.0
+            assert node.status() == {"node": "node0", "peers": 1, "down": []}
+        finally:
+            node.stop()
+
+    asyncio.run(scenario())
+
+
+def test_probe_round_records_a_borrowed_result_once(make_config):
+    async def scenario():
+        config = make_config({"pools": [dict(pool) for pool in POOLS]})
+        node = GossipNode(config, node_id="node0", interval=5)
+        clock = node.table.clock = FakeClock()
+        peer = HealthTable("node1", clock)
+        peer.observe({"a.test:3333": 42.0})
+        node.table.merge(peer.snapshots)
+        prober = CountingProber()
+
+        for _ in range(3):
+            borrowed = await node.probe_round(prober, max_age=5)
+            clock.now += 1
+        assert borrowed == {"a.test:3333": 42.0}
+        assert prober.probed == ["b.test:3333"] * 3  # a.test was never probed, the peer just did
+        assert list(prober.stats_for(POOLS[0]).samples) == [42.0]  # ...and its result counted once
+
+        peer.observe({"a.test:3333": 44.0})  # The peer's next probe is a new sample
+        node.table.merge(peer.snapshots)
+        await node.probe_round(prober, max_age=5)
+        assert list(prober.stats_for(POOLS[0]).samples) == [42.0, 44.0]
+
+        clock.now += 10  # Too old to borrow: probe it ourselves
+        await node.probe_round(prober, max_age=5)
+        assert prober.probed[-2:] == ["a.test:3333", "b.test:3333"]
+
+    asyncio.run(scenario())
+
+
+def test_a_fleet_on_localhost_fails_over_together(tmp_path):
+    total, port = 3, free_udp_port()
+    script = tmp_path / "node.py"
+    script.write_text(NODE)
+    nodes = []
+    for index in range(total):
+        config_path = tmp_path / f"config-{index}.json"
+        config_path.write_text(serialize_config({"pools": POOLS}))
+        nodes.append(subprocess.Popen([sys.executable, str(script), str(index), str(total), str(port), str(config_path)],
+                                      cwd=PROJECT_DIR, env=dict(os.environ, PYTHONPATH=PROJECT_DIR),
+                                      stdout=subprocess.PIPE, text=True))
+    outputs = []
+    for process in nodes:
+        stdout, _ = process.communicate(timeout=30)
+        assert process.returncode == 0
+        outputs.append(json.loads(stdout.strip().splitlines()[-1]))
+    for index, output in enumerate(outputs):
+        assert output["top"] == "b.test:3333"  # Only node 0 saw a.test fail; all of them moved
+        assert output["nodes"] == [f"node{idx}" for idx in range(total)]
+        with open(tmp_path / f"config-{index}.json") as file:
+            assert json.load(file)["pools"][0]["url"] == "b.test:3333"
@@ -0,0 +1,93 @@
+import time
+import pytest
+from core.health_monitor import HealthMonitor
+from core.pool_manager import pool_key
+from tests.helpers import XmrigApiStandIn
+from utils.xmrig_api import XmrigApi
+
+POOLS = [{"url": "a.test:3333"}, {"url": "b.test:3333"}, {"url": "c.test:3333"}]
+
+
+@pytest.fixture
+def xmrig_api():
+    stand_in = XmrigApiStandIn()
+    yield stand_in
+    stand_in.close()
+
+
+def make_monitor(make_config, xmrig_api, **kwargs):
+    config = make_config({"pools": [dict(pool) for pool in POOLS]})
+    return config, HealthMonitor(config, api=XmrigApi(xmrig_api.url), **kwargs)
+
+
+def top(config):
+    return config["pools"][0]["url"]
+
+
+def test_a_healthy_pool_is_kept(make_config, xmrig_api):
+    config, monitor = make_monitor(make_config, xmrig_api)
+    for _ in range(5):
+        xmrig_api.shares += 3
+        xmrig_api.good += 3
+        assert not monitor.step()
+    assert monitor.problems == [] and top(config) == "a.test:3333"
+
+
+def test_a_dead_connection_fails_over(make_config, xmrig_api):
+    config, monitor = make_monitor(make_config, xmrig_api)
+    assert not monitor.step()
+    xmrig_api.uptime, xmrig_api.failures = 0, 1
+    assert not monitor.step()  # One bad poll is within the hysteresis
+    xmrig_api.failures = 2
+    assert monitor.step()
+    assert top(config) == "b.test:3333"
+    assert pool_key(POOLS[0]) in monitor.demoted
+
+
+def test_a_low_accepted_share_rate_fails_over(make_config, xmrig_api):
+    config, monitor = make_monitor(make_config, xmrig_api)
+    monitor.step()
+    xmrig_api.shares, xmrig_api.good = 10, 6
+    assert not monitor.step()
+    assert monitor.problems == ["4/10 shares rejected or invalid"]
+    xmrig_api.shares, xmrig_api.good = 12, 7
+    assert monitor.step()
+    assert top(config) == "b.test:3333"
+
+
+def test_a_stale_job_fails_over(make_config, xmrig_api):
+    config, monitor = make_monitor(make_config, xmrig_api, window=0.3)
+    xmrig_api.diff, xmrig_api.hashrate = 10, 1000.0  # A share expected every 0.01s
+    xmrig_api.shares = xmrig_api.good = 5
+    assert not monitor.step()
+    time.sleep(0.35)
+    assert not monitor.step()
+    assert monitor.problems[0].startswith("stale job: no accepted share")
+    assert monitor.step()
+    assert top(config) == "b.test:3333"
+
+
+def test_failover_demotes_the_pool_xmrig_is_on(make_config, xmrig_api):
+    config, monitor = make_monitor(make_config, xmrig_api, fail_polls=1)
+    xmrig_api.pool = "b.test:3333"  # xmrig moved on by itself; the config still lists a first
+    xmrig_api.uptime = 0
+    assert monitor.step()
+    assert list(monitor.demoted) == [pool_key(POOLS[1])]
+    assert top(config) == "a.test:3333"
+
+
+def test_an_unknown_pool_is_not_blamed_on_the_top_one(make_config, xmrig_api, capsys):
+    config, monitor = make_monitor(make_config, xmrig_api, fail_polls=1)
+    xmrig_api.pool = "elsewhere.test:3333"
+    xmrig_api.uptime = 0
+    assert not monitor.step()
+    assert monitor.demoted == {}
+    assert [pool["url"] for pool in config["pools"]] == [pool["url"] for pool in POOLS]
+    assert "isn't in config.json" in capsys.readouterr().out
+
+
+def test_an_unreachable_api_is_not_a_pool_problem(make_config, xmrig_api):
+    config, monitor = make_monitor(make_config, xmrig_api, fail_polls=1)
+    xmrig_api.close()
+    assert not monitor.step()
+    assert monitor.last_error and top(config) == "a.test:3333"
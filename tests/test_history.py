@@ -0,0 +1,40 @@
+import time
+from core import history
+from core.history import HistoryRecorder, HistoryStore, build_report
+from core.supervisor import supervisor
+from tests.helpers import XmrigApiStandIn
+from utils.monero_data import market_data
+
+
+def test_shares_go_to_the_pool_mined_on(tmp_path, make_config, monkeypatch):
+    xmrig = XmrigApiStandIn()
+    try:
+        port = int(xmrig.url.rsplit(":", 1)[1])
+        make_config({"pools": [{"url": "a.test:3333"}, {"url": "b.test:3333"}],
+                     "http": {"enabled": True, "port": port}})
+        monkeypatch.setattr(supervisor, "is_running", lambda: True)
+        store = HistoryStore(str(tmp_path / "history.db"))
+        recorder = HistoryRecorder(store)
+        started = time.time()
+        # xmrig's share counters are process-wide: they keep counting across pool switches
+        for pool, good in (("a.test:3333", 100), ("a.test:3333", 110), ("b.test:3333", 120),
+                           ("b.test:3333", 500), ("a.test:3333", 510)):
+            xmrig.pool, xmrig.good, xmrig.shares = pool, good, good + 1
+            recorder.sample()
+        accepted = store.totals("accepted", started - 60, time.time() + 60)
+        assert {pool: entry[1] for pool, entry in accepted.items()} == {"a.test:3333": 20, "b.test:3333": 390}
+        report = build_report(store, now=time.time() + 60)
+        assert report["pools"]["a.test:3333"]["accepted"] == 20
+        assert report["pools"]["b.test:3333"]["rejected"] == 0
+        store.close()
+    finally:
+        xmrig.close()
+
+
+def test_recording_starts_the_price_feed(tmp_path, monkeypatch):
+    started = []
+    monkeypatch.setattr(market_data, "start", lambda: started.append(True))
+    monkeypatch.setattr(history, "_store", HistoryStore(str(tmp_path / "history.db")))
+    stop = history.start_recording(interval=3600)
+    stop.set()
+    assert started == [True]  # Headless daemons record prices too, not just the menu
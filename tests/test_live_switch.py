@@ -0,0 +1,127 @@
+import threading
+import time
+import pytest
+from core import pool_manager
+from core.live_switch import LiveSwitcher, pool_address
+from core.pool_manager import set_pool_on_top
+from tests.helpers import XmrigApiStandIn
+from utils.xmrig_api import XmrigApi
+
+POOLS = [{"url": "a.test:3333"}, {"url": "stratum+tcp://B.test:4444"}, {"url": "c.test:5555"}]
+
+
+class FollowingXmrig(XmrigApiStandIn):
+    """An xmrig API that moves to the top pool of each PUT config after `connect_delay`, and
+    gets its first share accepted there after `share_delay` (never if None)."""
+
+    def __init__(self, running_config, connect_delay=0.05, share_delay=0.1):
+        super().__init__(running_config)
+        self.connect_delay = connect_delay
+        self.share_delay = share_delay
+        self.pool = pool_address(running_config["pools"][0])
+        self.put_at = None
+
+    def put_config(self, config):
+        super().put_config(config)
+        self.put_at = time.monotonic()
+
+    def summary(self):
+        if self.put_at is not None:
+            since = time.monotonic() - self.put_at
+            if since >= self.connect_delay:
+                self.pool = pool_address(self.running_config["pools"][0])
+            self.accepted = int(self.share_delay is not None and since >= self.share_delay)
+        return super().summary()
+
+
+@pytest.fixture
+def live(make_config):
+    """A config with three pools, an xmrig API stand-in running it, and a switcher pushing to it."""
+    started = []
+
+    def make(**kwargs):
+        config = make_config({"pools": [dict(pool) for pool in POOLS], "cpu": {"enabled": True},
+                              "http": {"enabled": True, "port": 1}})
+        xmrig = FollowingXmrig({**config, "donate-level": 1, "http": {"access-token": "secret"}}, **kwargs)
+        started.append(xmrig)
+        return config, xmrig, LiveSwitcher(config, api=XmrigApi(xmrig.url), share_timeout=2, poll_interval=0.01)
+
+    yield make
+    for xmrig in started:
+        xmrig.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def test_push_replaces_only_the_pools_and_cpu_sections(live):
+    config, xmrig, switcher = live()
+    config["pools"].reverse()
+    config["cpu"] = {"enabled": True, "max-threads-hint": 50}
+    switcher.push()
+    assert xmrig.running_config["pools"] == config["pools"]
+    assert xmrig.running_config["cpu"] == config["cpu"]
+    assert xmrig.running_config["donate-level"] == 1  # Sections the switcher doesn't own are kept
+    assert xmrig.running_config["http"] == {"access-token": "secret"}
+
+
+def test_switch_measures_connect_and_first_share(live):
+    config, xmrig, switcher = live()
+    record = switcher.switch(2)
+    assert config["pools"][0]["url"] == POOLS[1]["url"]
+    assert record["pool"] == "b.test:4444"
+    assert record["result"] == "ok"
+    assert 0.05 <= record["connect_s"] <= record["first_share_s"]
+    assert record["first_share_s"] >= 0.1
+    assert switcher.status()["last_switch"]["pool"] == "b.test:4444"
+
+
+def test_a_switch_without_a_share_times_out(live):
+    config, xmrig, switcher = live(share_delay=None)
+    switcher.share_timeout = 0.3
+    record = switcher.switch(3)
+    assert record["result"] == "timeout"
+    assert record["connect_s"] is not None and record["first_share_s"] is None
+
+
+def test_a_later_switch_supersedes_the_measurement(live):
+    config, xmrig, switcher = live()
+    first = switcher.switch(2, wait=False)
+    switcher.switch(3, wait=False)
+    assert switcher.measure(first, time.monotonic())["result"] == "superseded"
+
+
+def test_thread_changes_are_pushed_without_a_switch(live):
+    config, xmrig, switcher = live()
+    assert switcher.set_threads(1)
+    assert xmrig.running_config["cpu"] == config["cpu"]
+    assert len(switcher.switches) == 0
+
+
+def test_the_listener_pushes_changes_made_elsewhere(live):
+    config, xmrig, switcher = live()
+    stop = threading.Event()
+    thread = switcher.start_background(stop)
+    try:
+        wait_for(lambda: switcher.on_change in pool_manager._listeners)
+        set_pool_on_top(config, 3, cause="schedule")
+        wait_for(lambda: switcher.switches and switcher.switches[-1]["result"] == "ok")
+        assert switcher.switches[-1]["pool"] == "c.test:5555"
+        assert switcher.switches[-1]["cause"] == "schedule"
+        assert xmrig.running_config["pools"][0]["url"] == "c.test:5555"
+    finally:
+        stop.set()
+        thread.join()  # Unregisters its listener before the fixtures restore them
+
+
+def test_an_unreachable_api_leaves_the_switch_to_config_json(live):
+    config, xmrig, switcher = live()
+    xmrig.close()
+    assert switcher.switch(2) is None
+    assert switcher.last_error
+    assert config["pools"][0]["url"] == POOLS[1]["url"]
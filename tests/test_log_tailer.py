@@ -0,0 +1,118 @@
+import os
+import time
+from datetime import datetime, timedelta
+from core.log_tailer import LogTailer
+
+POOL_A = "pool.supportxmr.com:443"
+POOL_B = "xmr-eu1.nanopool.org:14433"
+
+
+def xmrig_log(pool, seconds, start=datetime(2024, 1, 1)):
+    """`seconds` of xmrig output on `pool`: a job every 5s, a share every 3s (every 50th rejected), speed every 10s."""
+    lines = [f"[{start:%Y-%m-%d %H:%M:%S}.000]  \x1b[1;35mnet\x1b[0m      use pool {pool}  203.0.113.7"]
+    accepted = rejected = 0
+    for second in range(seconds):
+        stamp = f"[{start + timedelta(seconds=second):%Y-%m-%d %H:%M:%S}.000]"
+        if second % 5 == 0:
+            lines.append(f"{stamp}  net      new job from {pool} diff 120001 algo rx/0 height 3000000")
+        if second % 3 == 0:
+            if second % 150 == 0:
+                rejected += 1
+                lines.append(f'{stamp}  cpu      rejected ({accepted}/{rejected}) diff 120001 "Low difficulty share" (41 ms)')
+            else:
+                accepted += 1
+                lines.append(f"{stamp}  cpu      accepted ({accepted}/{rejected}) diff 120001 (40 ms)")
+        if second % 10 == 0:
+            lines.append(f"{stamp}  miner    speed 10s/60s/15m 5000.0 5000.0 n/a H/s max 5100.0 H/s")
+    return "\n".join(lines) + "\n"
+
+
+def make_tailer(tmp_path):
+    return LogTailer(str(tmp_path / "xmrig.log"), str(tmp_path / "log_tailer.json"))
+
+
+def test_a_day_of_logs_is_read_in_seconds_and_only_once(tmp_path):
+    log = tmp_path / "xmrig.log"
+    log.write_text(xmrig_log(POOL_A, 86400))
+    tailer = make_tailer(tmp_path)
+    started = time.perf_counter()
+    assert tailer.poll() == log.read_text().count("\n")
+    assert time.perf_counter() - started < 5
+    stats = tailer.stats[POOL_A]
+    assert (stats.accepted, stats.rejected, stats.jobs) == (28224, 576, 17280)
+    assert stats.hashrate == 5000.0 and stats.share_ms == 40.0
+    assert stats.last_reject == "Low difficulty share"
+    tailer.close()
+
+    with open(log, "a") as file:
+        file.write(xmrig_log(POOL_B, 60, datetime(2024, 1, 2)))
+    resumed = make_tailer(tmp_path)  # A restart picks up from the saved offset
+    assert resumed.poll() == xmrig_log(POOL_B, 60).count("\n")
+    assert resumed.stats[POOL_A].accepted == 28224
+    assert resumed.stats[POOL_B].accepted == 19
+    resumed.close()
+
+
+def test_a_partial_line_waits_for_its_end(tmp_path):
+    log = tmp_path / "xmrig.log"
+    log.write_text(xmrig_log(POOL_A, 1) + "[2024-01-01 00:00:01.000]  cpu      accepted (2/0) di")
+    tailer = make_tailer(tmp_path)
+    assert tailer.poll() == 4
+    assert tailer.stats[POOL_A].accepted == 0  # The first share is rejected by the generator
+    with open(log, "a") as file:
+        file.write("ff 120001 (40 ms)\n")
+    assert tailer.poll() == 1
+    assert tailer.stats[POOL_A].accepted == 1
+    tailer.close()
+
+
+def test_rotation_finishes_the_old_file_first(tmp_path):
+    log = tmp_path / "xmrig.log"
+    log.write_text(xmrig_log(POOL_A, 30))
+    tailer = make_tailer(tmp_path)
+    tailer.poll()
+    with open(log, "a") as file:
+        file.write("[2024-01-01 00:00:30.000]  cpu      accepted (11/1) diff 120001 (40 ms)\n")
+    os.rename(log, f"{log}.1")  # Rotated before the last share was read
+    log.write_text(xmrig_log(POOL_B, 30))
+    tailer.poll()
+    assert tailer.stats[POOL_A].accepted == 10
+    assert tailer.stats[POOL_B].accepted == 9
+    tailer.close()
+
+    with open(log, "a") as file:
+        file.write("[2024-01-01 00:00:30.000]  cpu      accepted (10/1) diff 120001 (40 ms)\n")
+    os.rename(log, f"{log}.1")  # Rotated again while nothing was running
+    log.write_text(xmrig_log(POOL_A, 3))
+    restarted = make_tailer(tmp_path)
+    restarted.poll()
+    assert restarted.stats[POOL_B].accepted == 10
+    assert restarted.stats[POOL_A].accepted == 10  # The new log starts with a rejected share
+    assert restarted.stats[POOL_A].rejected == 2
+    restarted.close()
+
+
+def test_a_truncated_log_is_read_from_the_start(tmp_path):
+    log = tmp_path / "xmrig.log"
+    log.write_text(xmrig_log(POOL_A, 30))
+    tailer = make_tailer(tmp_path)
+    tailer.poll()
+    with open(log, "w") as file:  # copytruncate keeps the inode
+        file.write(xmrig_log(POOL_B, 4))
+    assert tailer.poll() == xmrig_log(POOL_B, 4).count("\n")
+    assert tailer.stats[POOL_B].accepted == 1
+    assert tailer.stats[POOL_A].accepted == 9
+    tailer.close()
+
+
+def test_a_log_removed_mid_rotation_keeps_the_rest_of_the_old_one(tmp_path):
+    log = tmp_path / "xmrig.log"
+    log.write_text(xmrig_log(POOL_A, 3))
+    tailer = make_tailer(tmp_path)
+    tailer.poll()
+    with open(log, "a") as file:
+        file.write("[2024-01-01 00:00:03.000]  cpu      accepted (1/1) diff 120001 (40 ms)\n")
+    os.rename(log, f"{log}.1")  # xmrig hasn't reopened its log yet
+    assert tailer.poll() == 1
+    tailer.close()
+    assert make_tailer(tmp_path).stats[POOL_A].accepted == 1  # Saved, not just counted
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import time
+import pytest
+import main
+from core import control_client
+
+
+@pytest.mark.parametrize("argv", [["--timing", "pools"], ["pools", "--timing"], ["daemon", "--timing", "--live"]])
+def test_timing_is_accepted_before_or_after_the_command(argv):
+    args = main.build_parser().parse_args(argv)
+    assert args.timing is True
+    assert args.command in ("pools", "daemon")
+
+
+def test_timing_defaults_to_off():
+    assert main.build_parser().parse_args(["status"]).timing is False
+
+
+def test_cli_reports_timing_after_the_command(make_config, monkeypatch, capsys):
+    make_config({"pools": [{"url": "a.test:3333"}]})
+
+    def no_daemon(command, **args):
+        raise control_client.DaemonUnreachable(command)
+
+    monkeypatch.setattr(control_client, "send_command", no_daemon)
+    assert main.cli(["pools", "--timing"]) == 0
+    assert "pools: " in capsys.readouterr().err
+
+
+def test_timing_counts_from_the_process_start():
+    if main._process_age() is None:
+        pytest.skip("no /proc here")
+    assert main._process_age() > time.perf_counter() - main._STARTED  # pytest ran long before main was imported
+
+
+def test_quick_commands_skip_the_numa_imports():
+    script = "import sys, main; main.run_local(main.build_parser().parse_args(['pools'])); print('core.numa' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", script], cwd=main.PROJECT_DIR, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=main.PROJECT_DIR), timeout=60)
+    assert result.stdout.splitlines()[-1] == "False"
+
+
+def test_cores_out_of_range_is_an_error_not_a_traceback(make_config, capsys):
+    config = make_config({"pools": [], "cpu": {"enabled": True}})
+    args = main.build_parser().parse_args(["cores", str((os.cpu_count() or 1) + 1)])
+    assert main.run_local(args) == 1
+    assert "Core count must be between 1 and" in capsys.readouterr().out
+    assert config["cpu"] == {"enabled": True}
+
+
+def test_seven_still_exits_the_menu(make_config, monkeypatch, capsys):
+    make_config({"pools": [{"url": "a.test:3333"}]})
+    answers = iter(["7"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    monkeypatch.setattr(main, "is_xmrig_active", lambda: True)
+    main.main()
+    out = capsys.readouterr().out
+    assert "7. Exit" in out and "Exiting..." in out
+
+
+def test_history_sits_next_to_the_schedules(capsys):
+    main.show_commands_menu()
+    lines = capsys.readouterr().out.splitlines()
+    schedules = next(idx for idx, line in enumerate(lines) if "View active schedules" in line)
+    assert "View history report" in lines[schedules + 1]
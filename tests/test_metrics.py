@@ -0,0 +1,83 @@
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from core.config_manager import config_store
+from core.pool_manager import add_listener, pool_switch_seconds, pool_switches, rank_pools, set_pool_on_top
+from utils import metrics
+from utils.metrics import counter, gauge, histogram, render, start_metrics_server
+
+
+def test_series_render_in_the_exposition_format():
+    requests = counter("test_requests_total", "Requests served.", ("path",))
+    requests.inc(path="/a")
+    requests.inc(2, path='say "hi"\n')
+    temperature = gauge("test_temperature", "Degrees.")
+    temperature.set(71.5)
+    latency = histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+
+    lines = render().splitlines()
+    assert "# TYPE xmrig_switcher_test_requests_total counter" in lines
+    assert 'xmrig_switcher_test_requests_total{path="/a"} 1' in lines
+    assert 'xmrig_switcher_test_requests_total{path="say \\"hi\\"\\n"} 2' in lines
+    assert "xmrig_switcher_test_temperature 71.5" in lines
+    assert 'xmrig_switcher_test_latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'xmrig_switcher_test_latency_seconds_bucket{le="1.0"} 2' in lines  # Buckets are cumulative
+    assert 'xmrig_switcher_test_latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "xmrig_switcher_test_latency_seconds_sum 5.55" in lines
+    assert "xmrig_switcher_test_latency_seconds_count 3" in lines
+
+
+def test_labels_and_registrations_must_match():
+    requests = counter("test_labelled_total", "Requests.", ("path",))
+    assert counter("test_labelled_total", "Requests.", ("path",)) is requests  # Get-or-create
+    for labels in ({}, {"route": "/a"}, {"path": "/a", "code": "200"}):
+        with pytest.raises(ValueError):
+            requests.inc(**labels)
+    with pytest.raises(ValueError):
+        gauge("test_labelled_total", "Requests.", ("path",))
+    with pytest.raises(ValueError):
+        counter("test_labelled_total", "Requests.", ("route",))
+    assert "xmrig_switcher_test_labelled_total" in metrics._registry
+
+
+def test_the_server_answers_metrics_only():
+    server = start_metrics_server(port=0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(base + "/metrics?name[]=x", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "# TYPE xmrig_switcher_pool_switches_total counter" in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(base + "/", timeout=5)
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_pool_switches_are_counted(make_config):
+    config = make_config({"pools": [{"url": "a.test:3333"}, {"url": "b.test:3333"}]})
+    switches, timed = pool_switches.value(pool="b.test", cause="test"), pool_switch_seconds.count()
+    set_pool_on_top(config, 2, cause="test")
+    set_pool_on_top(config, 1, cause="test")  # Already on top: not a switch
+    assert pool_switches.value(pool="b.test", cause="test") == switches + 1
+    assert pool_switch_seconds.count() == timed + 2
+
+
+def test_listeners_run_outside_the_config_lock(make_config):
+    config = make_config({"pools": [{"url": "a.test:3333"}, {"url": "b.test:3333"}]})
+    free = []
+
+    def listener(config, cause):
+        # A live push or proxy switch can take seconds; other threads must still reach the config meanwhile
+        other = threading.Thread(target=lambda: free.append(config_store.lock.acquire(timeout=0.1)
+                                                            and config_store.lock.release() is None))
+        other.start()
+        other.join()
+    add_listener(listener)
+    set_pool_on_top(config, 2, cause="test")
+    rank_pools(config, [2, 1])
+    assert free == [True, True]
@@ -0,0 +1,121 @@
+import asyncio
+import socket
+import pytest
+from core.mirrors import (DnsCache, candidate_hosts, choose_mirror, register_mirrors, replace_host, select_mirrors,
+                          use_mirror)
+from core.pool_manager import add_listener, pool_key
+from tests.helpers import start_listener
+
+
+class StubResolver:
+    """Answers lookups from a table of host -> IPv4 addresses (no IPv6); counts the queries per name."""
+
+    def __init__(self, table, ttl=None, delay=0.0):
+        self.table = table
+        self.ttl = ttl
+        self.delay = delay
+        self.queries = {}
+
+    async def __call__(self, host, family):
+        self.queries[(host, family)] = self.queries.get((host, family), 0) + 1
+        await asyncio.sleep(self.delay)
+        if family != socket.AF_INET:
+            return [], None
+        if host not in self.table:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return list(self.table[host]), self.ttl
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def scored(*scores):
+    return [{"host": host, "addresses": {}, "score": score} for host, score in scores]
+
+
+def test_candidates_and_urls():
+    pool = {"url": "stratum+ssl://XMR-EU1.nanopool.org:14433"}
+    hosts = candidate_hosts(pool)
+    assert hosts[0] == "xmr-eu1.nanopool.org" and hosts.count("xmr-eu1.nanopool.org") == 1
+    assert "xmr-asia1.nanopool.org" in hosts
+    assert replace_host(pool["url"], "xmr-asia1.nanopool.org") == "stratum+ssl://xmr-asia1.nanopool.org:14433"
+    assert candidate_hosts({"url": "pool.test:abc"}) == []
+    with pytest.raises(ValueError):
+        register_mirrors("nanopool.org", ["xmr.evil.example"])
+
+
+def test_choose_mirror_applies_hysteresis():
+    assert choose_mirror(scored(("a", 100.0), ("b", 95.0))) is None  # 5% faster is within the 10%
+    assert choose_mirror(scored(("a", 100.0), ("b", 80.0))) == "b"
+    assert choose_mirror(scored(("a", float("inf")), ("b", 500.0))) == "b"
+    assert choose_mirror(scored(("a", float("inf")), ("b", float("inf")))) is None
+
+
+def test_dns_cache_honours_ttls_and_shares_queries_in_flight():
+    async def scenario():
+        clock = FakeClock()
+        resolver = StubResolver({"pool.test": ["192.0.2.1"]}, ttl=60, delay=0.01)
+        dns = DnsCache(resolver, negative_ttl=5, clock=clock)
+        answers = await asyncio.gather(*(dns.resolve("pool.test") for _ in range(10)))
+        assert answers == [["192.0.2.1"]] * 10
+        assert resolver.queries[("pool.test", socket.AF_INET)] == 1  # One query for ten concurrent lookups
+
+        clock.now += 59
+        await dns.resolve("pool.test")
+        assert resolver.queries[("pool.test", socket.AF_INET)] == 1
+        clock.now += 2
+        await dns.resolve("pool.test")
+        assert resolver.queries[("pool.test", socket.AF_INET)] == 2
+
+        assert await dns.resolve("gone.test") == []
+        clock.now += 4
+        await dns.resolve("gone.test")
+        assert resolver.queries[("gone.test", socket.AF_INET)] == 1  # Negative answers are cached too
+        clock.now += 2
+        await dns.resolve("gone.test")
+        assert resolver.queries[("gone.test", socket.AF_INET)] == 2
+        assert await dns.resolve("127.0.0.1") == ["127.0.0.1"]  # Literals never hit the resolver
+
+    asyncio.run(scenario())
+
+
+def test_select_mirrors_moves_a_pool_to_a_reachable_mirror(make_config):
+    async def scenario():
+        mirror = await start_listener(host="127.0.0.2")
+        port = mirror.sockets[0].getsockname()[1]
+        # The current host refuses connections on the pool port; us-east1 answers; the rest don't resolve
+        resolver = StubResolver({"xmr-eu1.nanopool.org": ["127.0.0.3"], "xmr-us-east1.nanopool.org": ["127.0.0.2"]})
+        pool = {"url": f"xmr-eu1.nanopool.org:{port}", "user": "wallet"}
+        config = make_config({"pools": [pool, {"url": "pool.other.test:3333"}]})
+        key = pool_key(config["pools"][0])
+        causes = []
+        add_listener(lambda config, cause: causes.append(cause))
+        try:
+            reports = await select_mirrors(config, dns=DnsCache(resolver), rounds=2)
+        finally:
+            mirror.close()
+            await mirror.wait_closed()
+        assert list(reports) == [1]  # The other pool has no known mirrors
+        by_host = {result["host"]: result for result in reports[1]}
+        assert by_host["xmr-eu1.nanopool.org"]["score"] == float("inf")
+        assert by_host["xmr-us-east1.nanopool.org"]["addresses"]["127.0.0.2"].p50 is not None
+        assert by_host["xmr-asia1.nanopool.org"]["addresses"] == {}
+        assert config["pools"][0]["url"] == f"xmr-us-east1.nanopool.org:{port}"
+        assert pool_key(config["pools"][0]) == key  # Schedules still match
+        assert causes == ["mirror"]
+
+    asyncio.run(scenario())
+
+
+def test_use_mirror_saves_and_notifies(make_config):
+    config = make_config({"pools": [{"url": "stratum+tcp://xmr-eu1.nanopool.org:10343"}]})
+    causes = []
+    add_listener(lambda config, cause: causes.append((cause, config["pools"][0]["url"])))
+    use_mirror(config, 1, "xmr-jp1.nanopool.org")
+    assert causes == [("mirror", "stratum+tcp://xmr-jp1.nanopool.org:10343")]
+
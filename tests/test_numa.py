@@ -0,0 +1,132 @@
+import json
+import sys
+import pytest
+from core import autotune, numa
+from core.numa import (fallback_plan, hugepage_shortfall, launch_instances, pages_needed, plan_instances,
+                       process_hugepages, refresh_instance_configs)
+from core.pool_manager import set_pool_on_top, warn_hugepages
+from core.supervisor import XmrigSupervisor
+from tests.helpers import make_cpu_tree, write_file
+
+STUB = f"""#!{sys.executable}
+# Stand-in for xmrig: ignores its arguments and mines (sleeps) until stopped
+import time
+time.sleep(60)
+"""
+MEMINFO = {"Hugepagesize": 2048, "HugePages_Total": 2400, "HugePages_Free": 40}
+
+
+@pytest.fixture
+def numa_dirs(tmp_path, monkeypatch):
+    """A stub xmrig, with the instances' configs, logs and pidfiles kept in tmp_path and no numactl."""
+    binary = tmp_path / "xmrig"
+    binary.write_text(STUB)
+    binary.chmod(0o755)
+    monkeypatch.setattr(numa, "XMRIG_DIR", str(tmp_path))
+    monkeypatch.setattr(numa, "PROJECT_DIR", str(tmp_path))
+    monkeypatch.setattr(numa.shutil, "which", lambda name: None)
+    monkeypatch.setattr(numa, "find_xmrig", lambda exclude=(): None)
+    started = []
+
+    def main_xmrig(running):
+        """Make the project's main supervisor one running the stub, or an idle one."""
+        main = XmrigSupervisor(str(binary), pidfile=str(tmp_path / "xmrig.pid"), log_file=str(tmp_path / "xmrig.log"))
+        monkeypatch.setattr(numa, "supervisor", main)
+        if running:
+            main.start()
+        started.append(main)
+        return main
+
+    yield str(binary), main_xmrig, started
+    for supervisor in started:
+        supervisor.stop(timeout=1)
+
+
+def launch(config, binary, started, **kwargs):
+    plan = [{"node": 0, "cpus": [0, 1]}, {"node": 1, "cpus": [4, 5]}]
+    supervisors = launch_instances(config, plan, binary, **kwargs)
+    started.extend(supervisors or [])
+    return supervisors
+
+
+def read_json(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def test_held_pages_count_as_available():
+    assert pages_needed(4) == 1172
+    assert hugepage_shortfall(4, MEMINFO) == 1172 - 40
+    # A running xmrig holding 1172 pages is reconfigured, not joined by a second one
+    assert hugepage_shortfall(4, MEMINFO, held=1172) == 0
+
+
+def test_process_hugepages_reads_smaps_rollup(tmp_path):
+    write_file(tmp_path / "42/smaps_rollup", "Rss:  2400000 kB\nPrivate_Hugetlb:  2396160 kB\nShared_Hugetlb:  4096 kB\n")
+    assert process_hugepages(42, proc=str(tmp_path)) == 1172
+    assert process_hugepages(43, proc=str(tmp_path)) is None
+
+
+def test_warn_hugepages_ignores_the_pages_xmrig_holds(monkeypatch, capsys):
+    monkeypatch.setattr(numa, "read_meminfo", lambda: MEMINFO)
+    monkeypatch.setattr(numa, "xmrig_hugepages", lambda: 1172)
+    warn_hugepages(4)
+    assert "Warning" not in capsys.readouterr().out
+
+    monkeypatch.setattr(numa, "xmrig_hugepages", lambda: None)  # Running, pages unreadable: no guess
+    warn_hugepages(4)
+    assert "Warning" not in capsys.readouterr().out
+
+    monkeypatch.setattr(numa, "xmrig_hugepages", lambda: 0)
+    warn_hugepages(4)
+    assert "1132 more 2 MiB hugepages" in capsys.readouterr().out
+
+
+def test_plan_and_fallback_on_a_fake_tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(autotune.autotune_store, "path", str(tmp_path / "autotune.json"))
+    monkeypatch.setattr(autotune.autotune_store, "_config", None)
+    root = make_cpu_tree(tmp_path / "sys", sockets=2, cores=4, threads=2, free_hugepages=[1200, 100])
+    plan = plan_instances(str(root), MEMINFO)
+    assert [(instance["node"], instance["cpus"]) for instance in plan] == [(0, [0, 1, 2, 3]), (1, [4, 5, 6, 7])]
+    assert [instance["shortfall"] for instance in plan] == [0, 1072]
+    backed, note = fallback_plan(plan, MEMINFO)
+    assert [instance["node"] for instance in backed] == [0]
+    assert note == "dropped node1 (not enough hugepages)"
+
+
+def test_launch_refuses_while_the_main_xmrig_runs(make_config, numa_dirs, tmp_path):
+    binary, main_xmrig, started = numa_dirs
+    main = main_xmrig(running=True)
+    config = make_config({"pools": [{"url": "a.test:1"}]})
+    assert launch(config, binary, started) is None
+    assert main.is_running()
+    assert not list(tmp_path.glob("config-node*.json")) and not list(tmp_path.glob("xmrig-node*.pid"))
+
+
+def test_launch_with_replace_stops_the_main_xmrig(make_config, numa_dirs, tmp_path):
+    binary, main_xmrig, started = numa_dirs
+    main = main_xmrig(running=True)
+    config = make_config({"pools": [{"url": "a.test:1"}], "http": {"enabled": True, "port": 8080}})
+    supervisors = launch(config, binary, started, replace=True)
+    assert not main.is_running()
+    assert [supervisor.is_running() for supervisor in supervisors] == [True, True]
+    node1 = read_json(tmp_path / "config-node1.json")
+    assert [thread["affine_to_cpu"] for thread in node1["cpu"]["threads"]] == [4, 5]
+    assert node1["http"]["port"] == 8081 and node1["randomx"]["numa"] is True
+
+    # Launching again attaches to the instances instead of taking them for the main xmrig
+    assert [supervisor.pid for supervisor in launch(config, binary, started)] == [s.pid for s in supervisors]
+
+
+def test_node_configs_follow_pool_switches(make_config, numa_dirs, tmp_path):
+    binary, main_xmrig, started = numa_dirs
+    main_xmrig(running=False)
+    config = make_config({"pools": [{"url": "a.test:1"}, {"url": "b.test:1"}], "http": {"enabled": True, "port": 8080}})
+    launch(config, binary, started)
+    set_pool_on_top(config, 2)
+    for name, cpus, port in (("node0", [0, 1], 8080), ("node1", [4, 5], 8081)):
+        generated = read_json(tmp_path / f"config-{name}.json")
+        assert [pool["url"] for pool in generated["pools"]] == ["b.test:1", "a.test:1"]
+        assert [thread["affine_to_cpu"] for thread in generated["cpu"]["threads"]] == cpus
+        assert generated["http"]["port"] == port
+    assert refresh_instance_configs(config) == []  # Already current: nothing rewritten
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from core.pool_manager import rank_pools
+from core.pool_prober import PoolProber, PoolStats, percentile, probe_loop, probe_pool
+from tests.helpers import closed_port, listener_url, start_listener
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([30, 10, 20], 50) == 20
+    assert percentile(list(range(1, 101)), 95) == 95
+
+
+def test_stats_count_lost_probes_as_timeouts():
+    stats = PoolStats(window=4)
+    for rtt in (10.0, 20.0, None, 30.0, None):
+        stats.record(rtt)
+    assert list(stats.samples) == [20.0, None, 30.0, None]  # The window dropped the oldest sample
+    assert stats.loss == 0.5
+    assert stats.p50 == 20.0
+    assert stats.score(timeout=1) == 20.0 * 0.5 + 1000 * 0.5
+    assert PoolStats().score() == float("inf")
+
+
+def test_probe_pool_times_a_local_listener():
+    async def scenario():
+        server = await start_listener()
+        try:
+            return await probe_pool(listener_url(server)), await probe_pool(f"127.0.0.1:{closed_port()}")
+        finally:
+            server.close()
+
+    rtt, refused = asyncio.run(scenario())
+    assert 0 < rtt < 1000
+    assert refused is None
+
+
+def test_probe_all_takes_one_timeout_not_one_per_pool():
+    async def scenario():
+        servers = [await start_listener(stall=True) for _ in range(20)]
+        pools = [{"url": listener_url(server), "tls": True} for server in servers]  # Handshakes never complete
+        prober = PoolProber(timeout=0.3)
+        started = time.perf_counter()
+        results = await prober.probe_all(pools)
+        elapsed = time.perf_counter() - started
+        for server in servers:
+            server.close()
+        return prober, pools, results, elapsed
+
+    prober, pools, results, elapsed = asyncio.run(scenario())
+    assert results == [None] * 20
+    assert elapsed < 2.0  # Serially this would take 20 * 0.3s
+    assert all(prober.stats_for(pool).loss == 1.0 for pool in pools)
+
+
+def test_rank_pools_only_reorders_past_the_hysteresis(make_config):
+    config = make_config({"pools": [{"url": "a.example.com:3333"}, {"url": "b.example.com:3333"}]})
+    assert not rank_pools(config, [100.0, 90.0], hysteresis=0.2)  # 10% better: stays below
+    assert rank_pools(config, [100.0, 50.0], hysteresis=0.2)
+    assert [pool["url"] for pool in config["pools"]] == ["b.example.com:3333", "a.example.com:3333"]
+    assert not rank_pools(config, [50.0, 100.0], hysteresis=0.2)  # Already in order: nothing saved
+
+
+def test_probe_loop_promotes_the_reachable_pool(make_config):
+    async def scenario(config):
+        server = await start_listener()
+        url = listener_url(server)
+        config["pools"].append({"url": url})
+        try:
+            await probe_loop(config, interval=0, rounds=1)
+        finally:
+            server.close()
+        return url
+
+    config = make_config({"pools": [{"url": f"127.0.0.1:{closed_port()}"}]})
+    live = asyncio.run(scenario(config))
+    assert config["pools"][0]["url"] == live
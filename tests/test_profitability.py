@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from core import profitability
+from core.pool_manager import add_listener
+from core.profitability import ATOMIC_UNITS, ProfitabilityEngine, wallet_address
+
+WALLET = "4" + "A" * 94
+NETWORK = {"difficulty": 300e9, "value": 0.6 * ATOMIC_UNITS}
+
+
+class NodejsPoolStandIn:
+    """A local nodejs-pool API serving canned JSON; counts the requests per path."""
+
+    def __init__(self, fee=1.0, hashrate=50e6, round_hashes=150e9, thresholds=None, delay=0.0):
+        self.routes = {
+            "/network/stats": NETWORK,
+            "/pool/stats": {"pool_statistics": {"hashRate": hashrate, "roundHashes": round_hashes}},
+            "/config": {"pplns_fee": fee, "min_wallet_payout": 0.003 * ATOMIC_UNITS},
+        }
+        for address, threshold in (thresholds or {}).items():
+            self.routes[f"/user/{address}"] = {"payout_threshold": threshold * ATOMIC_UNITS}
+        self.delay = delay
+        self.hits = {}
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._http.daemon_threads = True
+        threading.Thread(target=self._http.serve_forever, args=(0.05,), daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._http.server_address[1]}"
+
+    def requests(self):
+        return sum(self.hits.values())
+
+    def close(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.hits[self.path] = stand_in.hits.get(self.path, 0) + 1
+                time.sleep(stand_in.delay)
+                body = stand_in.routes.get(self.path)
+                data = json.dumps(body).encode()
+                self.send_response(200 if body is not None else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def stand_ins(monkeypatch):
+    """Start stand-in pool APIs and register them for hosts pool0.test, pool1.test, ..."""
+    started = []
+
+    def start(*stand_ins):
+        pools = []
+        for stand_in in stand_ins:
+            host = f"pool{len(started)}.test"
+            monkeypatch.setitem(profitability.POOL_APIS, host, ("nodejs-pool", stand_in.url))
+            started.append(stand_in)
+            pools.append({"url": f"{host}:3333", "user": f"{WALLET}.rig1"})
+        return pools
+
+    yield start
+    for stand_in in started:
+        stand_in.close()
+
+
+def test_wallet_address_strips_worker_and_difficulty():
+    assert wallet_address(f"{WALLET}+50000") == WALLET
+    assert wallet_address(f"{WALLET}.rig1") == WALLET
+    assert wallet_address(None) == ""
+
+
+def test_fetch_reads_the_pool_api(stand_ins):
+    pools = stand_ins(NodejsPoolStandIn(fee=0.6, thresholds={WALLET: 0.1}), NodejsPoolStandIn())
+    engine = ProfitabilityEngine()
+    with_user, default = engine.fetch_all(pools)
+    assert with_user["fee"] == pytest.approx(0.006)
+    assert with_user["hashrate"] == 50e6
+    assert with_user["effort"] == pytest.approx(0.5)
+    assert with_user["payout_threshold"] == pytest.approx(0.1)
+    assert default["payout_threshold"] == pytest.approx(0.003)  # Unknown wallet: the pool's minimum
+    assert default["min_payout"] == pytest.approx(0.003)
+
+
+def test_stats_are_cached_per_pool_until_the_ttl(stand_ins):
+    first, second = NodejsPoolStandIn(), NodejsPoolStandIn()
+    pools = stand_ins(first, second)
+    engine = ProfitabilityEngine(ttl=300)
+    engine.fetch_all(pools)
+    fetched = first.requests(), second.requests()
+    engine.fetch_all(pools)
+    assert (first.requests(), second.requests()) == fetched
+
+    engine._cache[pools[0]["url"]] = (time.monotonic() - 301, engine._cache[pools[0]["url"]][1])
+    engine.fetch_all(pools)
+    assert first.requests() == 2 * fetched[0]  # Only the expired pool is fetched again
+    assert second.requests() == fetched[1]
+
+
+def test_pools_are_fetched_concurrently(stand_ins):
+    pools = stand_ins(*(NodejsPoolStandIn(delay=0.2) for _ in range(6)))
+    started = time.perf_counter()
+    stats = ProfitabilityEngine().fetch_all(pools)
+    elapsed = time.perf_counter() - started
+    assert all(stats)
+    assert elapsed < 2.0  # Four 0.2s requests per pool: about 0.8s at once, 4.8s one after another
+
+
+def test_expected_xmr_per_hour_is_net_of_fees():
+    engine = ProfitabilityEngine(hashrate=10_000)
+    stats = {"fee": 0.01, "network": {"difficulty": 300e9, "reward": 0.6}}
+    assert engine.expected_xmr_per_hour(stats) == pytest.approx(10_000 / 300e9 * 0.6 * 3600 * 0.99)
+    assert engine.expected_xmr_per_hour(None) is None
+    assert engine.expected_xmr_per_hour({"fee": 0, "network": {"difficulty": 0, "reward": 0.6}}) is None
+
+
+def test_rank_reorders_through_rank_pools(make_config, stand_ins):
+    expensive, cheap = stand_ins(NodejsPoolStandIn(fee=8.0), NodejsPoolStandIn(fee=0.5))
+    unknown = {"url": "pool.nowhere.example:3333", "user": WALLET}
+    config = make_config({"pools": [unknown, expensive, cheap]})
+    causes = []
+    add_listener(lambda config, cause: causes.append(cause))
+
+    engine = ProfitabilityEngine()
+    pools, stats, earnings = engine.rank(config)
+    assert [pool["url"] for pool in config["pools"]] == [cheap["url"], expensive["url"], unknown["url"]]
+    assert earnings[0] is None and earnings[2] > earnings[1]
+    assert engine.errors[unknown["url"]] == "no stats adapter for this pool"
+    assert causes == ["ranking"]
+
+    # 0.4% vs 0.5% fee is well inside the 5% hysteresis: no reorder, nothing saved
+    config["pools"][1] = stand_ins(NodejsPoolStandIn(fee=0.4))[0]
+    ProfitabilityEngine().rank(config)
+    assert config["pools"][0]["url"] == cheap["url"]
+    assert causes == ["ranking"]
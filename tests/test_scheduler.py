@@ -0,0 +1,100 @@
+from datetime import datetime
+import pytest
+from core import scheduler, schedule_store
+from core.pool_manager import pool_key, set_pool_on_top
+from core.schedule_store import ScheduleIndex, load_schedules, make_schedule, save_schedules
+
+POOLS = [{"url": "a.test:3333", "user": "wallet"}, {"url": "b.test:3333", "user": "wallet"}]
+
+
+@pytest.fixture
+def schedules_file(tmp_path, monkeypatch):
+    """Point schedule_store at a schedules.json in tmp_path and give the scheduler empty schedules."""
+    path = tmp_path / "schedules.json"
+    monkeypatch.setattr(schedule_store.schedule_store, "path", str(path))
+    monkeypatch.setattr(schedule_store.schedule_store, "_config", None)
+    monkeypatch.setattr(schedule_store.schedule_store, "_stamp", None)
+    monkeypatch.setattr(schedule_store.schedule_store, "_written", None)
+    monkeypatch.setattr(scheduler, "schedules", [])
+    monkeypatch.setattr(scheduler, "_index", ScheduleIndex())
+    monkeypatch.setattr(scheduler, "_applied", None)
+    return path
+
+
+@pytest.fixture
+def at(monkeypatch):
+    """Set the scheduler's wall clock: at(hour, minute=0, day=1)."""
+    moment = [datetime(2024, 1, 1)]
+
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return moment[0]
+
+    monkeypatch.setattr(scheduler, "datetime", FixedDatetime)
+
+    def set_time(hour, minute=0, day=1):
+        moment[0] = datetime(2024, 1, day, hour, minute)
+    return set_time
+
+
+def test_the_index_finds_owners_boundaries_and_conflicts():
+    night = make_schedule("a", "21:00", "03:00")
+    morning = make_schedule("b", "02:00", "06:00")
+    index = ScheduleIndex([night, morning])
+    assert index.owner_at(22 * 60) is night
+    assert index.owner_at(2 * 60 + 30) is morning  # The newest schedule wins the overlap
+    assert index.owner_at(12 * 60) is None
+    assert index.next_boundary(12 * 60) == 21 * 60
+    assert index.next_boundary(23 * 60) == 0
+    assert sorted(sched["pool"] for sched in index.conflicts(5 * 60, 22 * 60)) == ["a", "b"]
+    assert index.conflicts(7 * 60, 20 * 60) == []
+    assert ScheduleIndex().empty
+
+
+def test_schedules_round_trip_and_a_bad_file_starts_empty(schedules_file, capsys):
+    save_schedules([make_schedule("a.test|wallet", "08:00", "17:30")])
+    schedule_store.schedule_store._config = None  # Read it back from disk
+    loaded = load_schedules()
+    assert [(sched["pool"], sched["start"], sched["end"]) for sched in loaded] == [("a.test|wallet", 480, 1050)]
+
+    for content in ("{not json", '{"schedules": [{"pool": "a"}]}', '{"schedules": [{"pool": "a", '
+                    '"start_time": "25:00", "end_time": "01:00"}]}', '{"schedules": 5}'):
+        schedules_file.write_text(content)
+        schedule_store.schedule_store._config = None
+        assert load_schedules() == []
+        assert "could not read schedules" in capsys.readouterr().out
+
+
+def test_a_failover_inside_the_window_is_not_undone(schedules_file, make_config, at):
+    config = make_config({"pools": [dict(pool) for pool in POOLS]})
+    at(10)
+    assert scheduler.schedule_pool(config, 2, "09:00", "17:00")
+    assert scheduler._apply_active_schedule(config)
+    assert config["pools"][0]["url"] == "b.test:3333"
+
+    set_pool_on_top(config, 2, cause="failover")  # b.test failed; a.test takes over
+    for hour in (11, 12, 16):  # Hourly re-checks in the same window
+        at(hour)
+        assert not scheduler._apply_active_schedule(config)
+    assert config["pools"][0]["url"] == "a.test:3333"
+
+    at(17, 30)
+    assert not scheduler._apply_active_schedule(config)  # Window closed: nothing to promote
+    at(9, 0, day=2)
+    assert scheduler._apply_active_schedule(config)  # Next day's window opens
+    assert config["pools"][0]["url"] == "b.test:3333"
+
+
+def test_a_new_schedule_applies_at_once(schedules_file, make_config, at):
+    config = make_config({"pools": [dict(pool) for pool in POOLS]})
+    at(10)
+    scheduler.schedule_pool(config, 2, "09:00", "17:00")
+    scheduler._apply_active_schedule(config)
+    scheduler.schedule_pool(config, 2, "10:00", "11:00")  # a.test, now second
+    assert scheduler._apply_active_schedule(config)
+    assert config["pools"][0]["url"] == "a.test:3333"
+    assert scheduler.active_schedule()["pool"] == pool_key(POOLS[0])
+    assert scheduler.remove_schedule(2)
+    assert scheduler._apply_active_schedule(config)  # Back to the 09:00-17:00 schedule
+    assert config["pools"][0]["url"] == "b.test:3333"
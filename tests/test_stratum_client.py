@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+from core.config_manager import config_store
+from core.stratum_client import JobTracker, StratumStats, job_key, login_request, measure_all, run_stratum_probe
+from utils.mock_stratum import MockStratumServer, make_blob
+
+
+async def start_raw_pool(reply):
+    """A pool that answers every login with the raw bytes `reply`."""
+    async def handle(reader, writer):
+        await reader.readline()
+        writer.write(reply)
+        await writer.drain()
+        await reader.read()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+def test_job_key_is_the_previous_block_hash():
+    assert job_key({"blob": make_blob(10, extra=1)}) == job_key({"blob": make_blob(10, extra=2)})
+    assert job_key({"blob": make_blob(10)}) != job_key({"blob": make_blob(11)})
+    assert job_key({"blob": "zz", "height": 7}) == 7
+
+
+def test_stats_measure_lag_behind_the_first_pool():
+    tracker = JobTracker()
+    first, late = StratumStats(), StratumStats()
+    first.record_job("tip-1", 100.0, tracker)
+    late.record_job("tip-1", 100.25, tracker)
+    late.record_job("tip-1", 101.0, tracker)  # Same tip again: not a new lag sample
+    assert list(first.lags) == [0.0]
+    assert list(late.lags) == [250.0]
+    late.login_rtt = 10.0
+    assert late.score() == 260.0
+    assert StratumStats().score() == float("inf")
+
+
+def test_login_request_uses_the_pool_credentials():
+    request = login_request({"url": "pool:3333", "user": "4ABC", "pass": "w1", "rig-id": "rig-7"})
+    assert request["method"] == "login"
+    assert request["params"]["login"] == "4ABC"
+    assert request["params"]["pass"] == "w1"
+    assert request["params"]["rigid"] == "rig-7"
+
+
+def test_measure_all_against_mock_pools():
+    async def scenario():
+        fast = await MockStratumServer(block_interval=0.2).start()
+        late = await MockStratumServer(block_interval=0.2, login_delay=0.05, job_delay=0.08).start()
+        rejecting = await MockStratumServer(reject_login=True).start()
+        pools = [{"url": server.url, "user": "4ABC", "rig-id": "rig-1"} for server in (fast, late, rejecting)]
+        try:
+            results = await measure_all(pools, duration=1.0, timeout=1.0)
+        finally:
+            for server in (fast, late, rejecting):
+                await server.stop()
+        return fast, results
+
+    fast, (fast_stats, late_stats, rejected) = asyncio.run(scenario())
+    assert fast.logins[0]["rigid"] == "rig-1"
+    assert fast.submits == []  # Never submits shares
+    assert late_stats.login_rtt > fast_stats.login_rtt
+    assert late_stats.login_rtt >= 50
+    assert 0.1 < fast_stats.job_interval < 0.3
+    assert late_stats.lag_p50 > fast_stats.lag_p50
+    assert late_stats.lag_p50 > 40
+    assert rejected.login_rtt is None
+    assert rejected.error == "Invalid payment address provided"
+
+
+def test_the_login_job_is_not_a_lag_sample():
+    async def scenario():
+        servers = [await MockStratumServer(block_interval=3600).start(),
+                   await MockStratumServer(block_interval=3600, login_delay=0.2).start()]
+        try:
+            return await measure_all([{"url": server.url} for server in servers], duration=0.4, timeout=1.0)
+        finally:
+            for server in servers:
+                await server.stop()
+
+    fast, slow = asyncio.run(scenario())
+    assert list(fast.lags) == [] and list(slow.lags) == []  # No job was pushed after login
+    assert slow.score() == slow.login_rtt  # Login latency counted once, not again as lag
+
+
+def test_a_misbehaving_pool_does_not_abort_the_others():
+    async def scenario():
+        servers = [await start_raw_pool(b'{"id": 1, "error": "Invalid login"}\n'),
+                   await start_raw_pool(b'{"id": 1, "result": "' + b"a" * 70000 + b'"}\n'),
+                   await start_raw_pool(b'[1, 2, 3]\n')]
+        good = await MockStratumServer().start()
+        pools = [{"url": url} for _, url in servers] + [{"url": good.url}]
+        try:
+            return await measure_all(pools, duration=0.5, timeout=0.5)
+        finally:
+            await good.stop()
+            for server, _ in servers:
+                server.close()
+
+    string_error, oversized, not_an_object, good = asyncio.run(scenario())
+    assert string_error.error == "Invalid login"
+    assert oversized.login_rtt is None and oversized.error
+    assert not_an_object.error == "login timed out"
+    assert good.error is None and good.login_rtt is not None
+
+
+def test_run_stratum_probe_ranks_by_login_and_lag(make_config):
+    # run_stratum_probe runs its own event loop, so the mock pools serve from another thread
+    loop = asyncio.new_event_loop()
+    slow = loop.run_until_complete(MockStratumServer(login_delay=0.2).start())
+    fast = loop.run_until_complete(MockStratumServer().start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        config = make_config({"pools": [{"url": slow.url, "user": "4ABC"}, {"url": fast.url, "user": "4ABC"}]})
+        run_stratum_probe(config, duration=0.5)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        for server in (slow, fast):
+            loop.run_until_complete(server.stop())
+        loop.close()
+    assert config["pools"][0]["url"] == fast.url
+    with open(config_store.path) as file:
+        assert json.load(file)["pools"][0]["url"] == fast.url
@@ -0,0 +1,190 @@
+import asyncio
+import time
+from core import stratum_proxy
+from core.pool_manager import set_pool_on_top, set_pool_url
+from core.stratum_proxy import NONCE_OFFSET, StratumProxy, nonce_slot, pool_target, split_job
+from utils.mock_stratum import MockMiner, MockStratumServer
+
+
+class EchoPool(MockStratumServer):
+    """A mock pool that answers each submit with its nonce after `submit_delay`, so replies can be traced."""
+
+    def __init__(self, submit_delay=0.0, string_errors=False, host="127.0.0.1", port=0):
+        super().__init__(host, port, block_interval=3600)
+        self.submit_delay = submit_delay
+        self.string_errors = string_errors
+
+    async def _dispatch(self, request, writer):
+        reply = await super()._dispatch(request, writer)
+        if request.get("method") == "submit":
+            await asyncio.sleep(self.submit_delay)
+            if self.string_errors:
+                writer.write(b"[1, 2]\n")  # Not a stratum message at all
+                reply["error"] = "Low difficulty share"
+                del reply["result"]
+            else:
+                reply["result"] = {"status": "OK", "nonce": request["params"]["nonce"]}
+        return reply
+
+
+async def eventually(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+def proxied(make_config, *pools, miners=1):
+    """Run `scenario(proxy, miners)` with a proxy in front of `pools` and `miners` logged-in mock miners."""
+    def run(scenario):
+        async def main():
+            for pool in pools:
+                await pool.start()
+            config = make_config({"pools": [{"url": pool.url, "user": "wallet"} for pool in pools]})
+            proxy = await StratumProxy(config, host="127.0.0.1", port=0, follow_file=False).start()
+            connected = [MockMiner("127.0.0.1", proxy.port, rig_id=f"rig-{idx}") for idx in range(miners)]
+            try:
+                assert all(await asyncio.gather(*(miner.connect() for miner in connected)))
+                await scenario(proxy, connected)
+            finally:
+                for miner in connected:
+                    await miner.close()
+                await proxy.stop()
+                for pool in pools:
+                    await pool.stop()
+
+        asyncio.run(main())
+    return run
+
+
+def test_split_job_and_nonce_slot():
+    job = {"blob": "00" * 76, "job_id": "1"}
+    offset = (NONCE_OFFSET + 3) * 2
+    assert split_job(job, 0xAB)["blob"][offset:offset + 2] == "ab"
+    assert job["blob"] == "00" * 76
+    assert nonce_slot("123456ab") == 0xAB
+    assert nonce_slot("12345") is None and nonce_slot(7) is None and nonce_slot("1234zzzz") is None
+
+
+def test_miners_share_one_login_with_their_own_nonce_byte(make_config):
+    pool = EchoPool()
+
+    async def scenario(proxy, miners):
+        assert len(pool.logins) == 1  # One upstream login for every miner
+        assert len({miner.miner_id for miner in miners}) == 4
+        assert len({miner.fixed_byte for miner in miners}) == 4
+        offset = (NONCE_OFFSET + 3) * 2
+        blobs = {miner.jobs[-1]["blob"][:offset] + miner.jobs[-1]["blob"][offset + 2:] for miner in miners}
+        assert len(blobs) == 1  # Otherwise the same job
+        assert "nicehash" in miners[0].extensions
+
+    proxied(make_config, pool, miners=4)(scenario)
+
+
+def test_submits_use_the_upstream_login_and_results_reach_their_miner(make_config):
+    pool = EchoPool(submit_delay=0.01)
+
+    async def scenario(proxy, miners):
+        await asyncio.gather(*(miner.submit() for miner in miners for _ in range(3)))
+        assert len(pool.submits) == 9
+        assert {share["id"] for share in pool.submits} == {"1"}  # The proxy's login id, not the miners'
+        for miner in miners:
+            assert len(miner.results) == 3
+            for result, error in miner.results:
+                assert error is None
+                assert result["nonce"][6:8] == miner.fixed_byte  # The pool's answer to this miner's share
+
+    proxied(make_config, pool, miners=3)(scenario)
+
+
+def test_a_switch_answers_the_shares_in_flight_on_the_old_pool(make_config, monkeypatch):
+    monkeypatch.setattr(stratum_proxy, "RETIRE_GRACE", 0.5)
+    old, new = EchoPool(submit_delay=0.3), EchoPool()
+    new._job_seq = 100  # Real pools' job ids don't collide
+
+    async def scenario(proxy, miners):
+        miner = miners[0]
+        old_job = miner.jobs[-1]
+        in_flight = asyncio.create_task(miner.submit())
+        await eventually(lambda: old.submits)
+        miner.new_job.clear()
+        assert await proxy.promote([{"url": new.url, "user": "wallet"}, {"url": old.url, "user": "wallet"}])
+        await asyncio.wait_for(miner.new_job.wait(), 2)
+        assert len(new.logins) == 1
+
+        result, error = await in_flight
+        assert error is None and result["nonce"][6:8] == miner.fixed_byte
+
+        _, error = await miner.submit(old_job)  # Found just before the switch, sent just after it
+        assert error is None
+        result, error = await miner.submit()
+        assert error is None
+        assert len(old.submits) == 2 and len(new.submits) == 1
+
+        await eventually(lambda: proxy.upstreams[0].retired[0].closed.is_set())
+        _, error = await miner.submit(old_job)
+        assert error["message"] == "Block expired"
+
+    proxied(make_config, old, new)(scenario)
+
+
+def test_a_disconnect_frees_the_miners_slot(make_config):
+    pool = EchoPool()
+
+    async def scenario(proxy, miners):
+        freed = miners[1].fixed_byte
+        await miners[1].close()
+        await eventually(lambda: len(proxy.miners) == 2)
+        newcomer = MockMiner("127.0.0.1", proxy.port)
+        miners.append(newcomer)
+        assert await newcomer.connect()
+        assert newcomer.fixed_byte == freed
+        assert len(proxy.upstreams) == 1 and len(pool.logins) == 1
+
+    proxied(make_config, pool, miners=3)(scenario)
+
+
+def test_string_errors_from_the_pool_reach_the_miner(make_config):
+    pool = EchoPool(string_errors=True)
+
+    async def scenario(proxy, miners):
+        for _ in range(2):  # The upstream survives the junk line and keeps answering
+            _, error = await miners[0].submit()
+            assert error["message"] == "Low difficulty share"
+        assert proxy.status()["pools"] == [pool.url]
+
+    proxied(make_config, pool)(scenario)
+
+
+def test_a_failed_switch_is_retried(make_config, monkeypatch):
+    monkeypatch.setattr(stratum_proxy, "CONFIG_POLL", 0.05)
+    old, new = EchoPool(), EchoPool()
+
+    async def scenario(proxy, miners):
+        new.reject_login = True
+        set_pool_on_top(proxy.config, 2)
+        await eventually(lambda: new.logins)
+        assert proxy.top == pool_target({"url": old.url, "user": "wallet"})  # Still the pool everyone is on
+        new.reject_login = False
+        await eventually(lambda: proxy.top == pool_target({"url": new.url, "user": "wallet"}))
+        assert proxy.status()["pools"] == [new.url]
+
+    proxied(make_config, old, new)(scenario)
+
+
+def test_a_mirror_of_the_top_pool_is_a_switch(make_config):
+    first = EchoPool(host="127.0.0.1")
+
+    async def scenario(proxy, miners):
+        mirror = await EchoPool(host="127.1.0.1", port=first.port).start()  # Same domain and port: same pool_key
+        try:
+            miners[0].new_job.clear()
+            set_pool_url(proxy.config, 1, mirror.url)
+            await asyncio.wait_for(miners[0].new_job.wait(), 2)
+            assert len(mirror.logins) == 1
+            assert proxy.status()["pools"] == [mirror.url]
+        finally:
+            await mirror.stop()
+
+    proxied(make_config, first)(scenario)
@@ -0,0 +1,160 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+from core import supervisor as supervisor_module
+from core.config_manager import config_store
+from core.supervisor import XmrigSupervisor, force_foreground
+from utils import helpers
+
+STUB = f"""#!{sys.executable}
+# Stand-in for xmrig: exits with argv[1] after argv[2] seconds
+import sys, time
+time.sleep(float(sys.argv[2]))
+sys.exit(int(sys.argv[1]))
+"""
+
+
+@pytest.fixture
+def make_supervisor(tmp_path, monkeypatch):
+    """A supervisor running a stub xmrig from tmp_path, with a fast backoff."""
+    binary = tmp_path / "xmrig"
+    binary.write_text(STUB)
+    binary.chmod(0o755)
+    monkeypatch.setattr(supervisor_module, "BACKOFF_INITIAL", 0.05)
+    started = []
+
+    def make(exit_code=0, runtime=60):
+        supervisor = XmrigSupervisor(str(binary), [str(exit_code), str(runtime)], pidfile=str(tmp_path / "xmrig.pid"),
+                                     log_file=str(tmp_path / "xmrig.log"))
+        started.append(supervisor)
+        return supervisor
+
+    yield make
+    for supervisor in started:
+        supervisor.stop(timeout=1)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def test_start_tracks_the_child_by_pidfile(make_supervisor):
+    supervisor = make_supervisor()
+    assert supervisor.start()
+    assert supervisor.is_running()
+    with open(supervisor.pidfile) as file:
+        recorded = json.load(file)
+    assert recorded["pid"] == supervisor.pid
+    assert recorded["create_time"] == supervisor.create_time
+
+    supervisor.stop(timeout=1)
+    assert not supervisor.is_running()
+    assert supervisor.exit_codes[-1][1] == -15  # SIGTERM
+    assert not os.path.exists(supervisor.pidfile)
+
+
+def test_a_second_supervisor_attaches_without_scanning(make_supervisor, monkeypatch):
+    first = make_supervisor()
+    first.start()
+    monkeypatch.setattr(supervisor_module, "find_xmrig", lambda: pytest.fail("scanned the process table"))
+    second = make_supervisor()
+    assert second.attach()
+    assert second.pid == first.pid
+    assert second.is_running()
+
+
+def test_crashes_restart_with_backoff_until_a_crash_loop(make_supervisor):
+    supervisor = make_supervisor(exit_code=3, runtime=0)
+    supervisor.start()
+    delays = []
+    while not supervisor.crash_loop:
+        wait_for(lambda: not supervisor.is_running() or supervisor.crash_loop)
+        supervisor.check()
+        if supervisor.restart_at is not None:
+            delays.append(supervisor.restart_at - supervisor.exit_codes[-1][0])
+            wait_for(lambda: time.time() >= supervisor.restart_at)
+            supervisor.check()
+    assert [code for _, code in supervisor.exit_codes] == [3] * supervisor_module.CRASH_LIMIT
+    assert delays == pytest.approx([0.05, 0.1, 0.2, 0.4], abs=0.01)
+    assert supervisor.restart_at is None
+    assert not supervisor.is_running()
+
+
+def test_a_clean_exit_is_not_restarted(make_supervisor):
+    supervisor = make_supervisor(exit_code=0, runtime=0)
+    supervisor.start()
+    wait_for(lambda: not supervisor.is_running())
+    supervisor.check()
+    assert supervisor.exit_codes[-1][1] == 0
+    assert supervisor.restart_at is None and not supervisor.crash_times
+
+
+def test_an_adopted_exit_is_a_crash(make_supervisor):
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    supervisor = make_supervisor()
+    assert supervisor.adopt(process.pid)
+    assert supervisor.is_running()
+    process.terminate()
+    process.wait()
+    supervisor.check()
+    assert supervisor.exit_codes[-1][1] is None
+    assert supervisor.restart_at - supervisor.exit_codes[-1][0] == pytest.approx(0.05, abs=0.01)
+    assert len(supervisor.crash_times) == 1
+    wait_for(lambda: time.time() >= supervisor.restart_at)
+    supervisor.check()
+    assert supervisor.is_running() and supervisor.process is not None  # Our own xmrig now
+
+
+def test_a_failed_restart_backs_off_and_keeps_the_exit_codes(make_supervisor):
+    supervisor = make_supervisor(exit_code=3, runtime=0)
+    supervisor.start()
+    wait_for(lambda: not supervisor.is_running())
+    supervisor.check()
+    os.unlink(supervisor.binary)
+    wait_for(lambda: time.time() >= supervisor.restart_at)
+    supervisor.check()
+    assert "not found" in supervisor.start_error
+    assert [code for _, code in supervisor.exit_codes] == [3]
+    assert supervisor.consecutive_crashes == 2
+    assert supervisor.restart_at - supervisor.crash_times[-1] == pytest.approx(0.1, abs=0.01)
+
+
+def test_a_reused_pid_is_not_running(make_supervisor):
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    try:
+        supervisor = make_supervisor()
+        supervisor.adopt(process.pid)
+        # The xmrig we recorded started earlier than the process now holding its PID
+        supervisor.create_time -= 100
+        assert not supervisor.is_running()
+
+        with open(supervisor.pidfile, "w") as file:
+            json.dump({"pid": process.pid, "create_time": supervisor.create_time}, file)
+        assert not make_supervisor().attach()
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_force_foreground_turns_background_off(make_config):
+    make_config({"background": True, "pools": []})
+    assert force_foreground()
+    assert not force_foreground()
+    with open(config_store.path) as file:
+        assert json.load(file)["background"] is False
+
+
+def test_helpers_start_xmrig_forces_the_foreground(make_config, make_supervisor, monkeypatch):
+    config = make_config({"background": True, "pools": []})
+    supervisor = make_supervisor()
+    monkeypatch.setattr(supervisor_module, "supervisor", supervisor)
+    helpers.start_xmrig()
+    assert config["background"] is False
+    assert supervisor.is_running()
@@ -0,0 +1,161 @@
+import pytest
+from core.config_manager import config_store
+from core.thermal_governor import ThreadGovernor, layout_cpus, main, read_frequency, read_temperature
+from tests.helpers import XmrigApiStandIn, make_cpu_tree, write_file
+from utils.xmrig_api import XmrigApi
+
+# Hashrate by thread count: the 4th thread adds little on this rig, the others pay for themselves
+RATES = {1: 1300.0, 2: 2600.0, 3: 3900.0, 4: 4000.0}
+MAX_KHZ = 3_000_000
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Rig(XmrigApiStandIn):
+    """An xmrig API whose hashrate follows the number of threads in the config last PUT."""
+
+    def __init__(self, running_config, rates):
+        super().__init__(running_config)
+        self.rates = rates
+
+    def summary(self):
+        self.hashrate = self.rates[len(self.running_config["cpu"]["threads"])]
+        return super().summary()
+
+
+def set_temperature(root, celsius, zone=0, kind="x86_pkg_temp"):
+    write_file(root / f"thermal_zone{zone}/type", kind)
+    write_file(root / f"thermal_zone{zone}/temp", int(celsius * 1000))
+
+
+def set_clock(sysfs, cpus, ratio):
+    for cpu in cpus:
+        write_file(sysfs / f"cpu/cpu{cpu}/cpufreq/cpuinfo_max_freq", MAX_KHZ)
+        write_file(sysfs / f"cpu/cpu{cpu}/cpufreq/scaling_cur_freq", int(MAX_KHZ * ratio))
+
+
+@pytest.fixture
+def rig(tmp_path, make_config):
+    """A 4-thread config, fake thermal and cpufreq trees, and a Rig stand-in running the config."""
+    started = []
+
+    def make(rates=RATES, celsius=70.0, **kwargs):
+        thermal, sysfs = tmp_path / "thermal", make_cpu_tree(tmp_path / "sys", cores=4, threads=1)
+        set_temperature(thermal, celsius)
+        set_clock(sysfs, range(4), 1.0)
+        config = make_config({"pools": [{"url": "a.test:3333"}],
+                              "cpu": {"threads": [{"affine_to_cpu": cpu} for cpu in range(4)]}})
+        xmrig = Rig({**config, "donate-level": 1}, rates)
+        started.append(xmrig)
+        clock = FakeClock()
+        governor = ThreadGovernor(config, api=XmrigApi(xmrig.url), thermal_root=str(thermal), sysfs_root=str(sysfs),
+                                  dwell=60, settle=20, clock=clock, **kwargs)
+        return governor, xmrig, clock, thermal, sysfs
+
+    yield make
+    for xmrig in started:
+        xmrig.close()
+
+
+def run(governor, clock, seconds, interval=10):
+    """Step the governor every `interval` seconds of fake time; returns the thread counts it moved to."""
+    changes = []
+    for _ in range(int(seconds / interval)):
+        target = governor.step()
+        if target is not None:
+            changes.append(target)
+        clock.now += interval
+    return changes
+
+
+def test_readings_from_a_fake_sysfs(tmp_path, capsys):
+    thermal, sysfs = tmp_path / "thermal", tmp_path / "sys"
+    assert read_temperature(str(thermal)) is None
+    set_temperature(thermal, 99.0, zone=0, kind="iwlwifi_1")
+    assert read_temperature(str(thermal)) == 99.0  # No CPU zone, so any zone will do
+    set_temperature(thermal, 71.5, zone=1)
+    set_temperature(thermal, 64.0, zone=2, kind="coretemp")
+    write_file(thermal / "thermal_zone3/type", "x86_pkg_temp")
+    write_file(thermal / "thermal_zone3/temp", "garbage")
+    assert read_temperature(str(thermal)) == 71.5  # The hottest CPU zone, not the hot wifi card
+
+    assert read_frequency([0, 1], str(sysfs)) is None
+    set_clock(sysfs, [0], 0.5)
+    set_clock(sysfs, [1], 1.0)
+    assert read_frequency([0, 1, 2], str(sysfs)) == 0.75  # CPU 2 has no cpufreq and isn't counted
+
+    assert main(["--readings", "--thermal-root", str(thermal), "--sysfs", str(sysfs)]) == 0
+    out = capsys.readouterr().out
+    assert "71.5°C" in out and "of maximum" in out
+
+
+def test_layout_cpus_follows_the_pinned_threads():
+    assert layout_cpus({"cpu": {"threads": [{"affine_to_cpu": 6}, {"affine_to_cpu": 2}]}}) == [6, 2]
+    assert layout_cpus({"cpu": {"threads": [{"affine_to_cpu": 1}, {}]}}) == [1, 1]
+    assert len(layout_cpus({"cpu": {"threads": [{"affine_to_cpu": -1}]}})) >= 1  # Unpinned: every CPU
+    assert len(layout_cpus({})) >= 1
+
+
+def test_a_cool_rig_keeps_every_thread(rig):
+    governor, xmrig, clock, thermal, sysfs = rig(rates={1: 1000.0, 2: 2000.0, 3: 3000.0, 4: 4000.0})
+    assert run(governor, clock, 600) == []
+    assert xmrig.puts == 0
+    assert governor.status()["state"] == "cool" and governor.status()["hashrates"] == {4: 4000.0}
+
+
+def test_a_hot_rig_sheds_the_thread_that_does_not_pay(rig):
+    governor, xmrig, clock, thermal, sysfs = rig(celsius=88.0)
+    changes = run(governor, clock, 900)
+    # Shed to find out what the 4th and 3rd threads add; the 3rd pays for its heat and comes back
+    assert changes == [3, 2, 3]
+    assert governor.threads == 3 and governor.status()["state"] == "hot"
+    assert governor.marginal(4) == 100.0 and governor.marginal(3) == 1300.0
+    assert [thread["affine_to_cpu"] for thread in xmrig.running_config["cpu"]["threads"]] == [0, 1, 2]
+    assert xmrig.running_config["donate-level"] == 1
+    with open(config_store.path) as file:
+        assert '"affine_to_cpu": 3' not in file.read()
+
+
+def test_changes_wait_for_the_dwell_time(rig):
+    governor, xmrig, clock, thermal, sysfs = rig(celsius=88.0)
+    governor.dwell = 300
+    assert run(governor, clock, 290) == []
+    assert run(governor, clock, 20) == [3]
+    assert run(governor, clock, 290) == []
+
+
+def test_critical_heat_sheds_a_thread_per_settled_sample(rig):
+    governor, xmrig, clock, thermal, sysfs = rig(celsius=97.0, min_threads=2)
+    governor.dwell = 3600
+    assert run(governor, clock, 200) == [3, 2]  # Whatever the threads add, and down to min_threads only
+    set_temperature(thermal, 70.0)
+    assert run(governor, clock, 3600, interval=60) == [3]  # Cool again: back up, but the 4th thread still doesn't pay
+
+
+def test_a_clock_drop_counts_as_hot_without_thermal_zones(rig):
+    governor, xmrig, clock, thermal, sysfs = rig(rates={1: 1000.0, 2: 2000.0, 3: 3000.0, 4: 4000.0})
+    set_temperature(thermal, 0, kind="garbage")
+    write_file(thermal / "thermal_zone0/temp", "n/a")
+    assert run(governor, clock, 120) == []
+    set_clock(sysfs, range(4), 0.8)
+    assert run(governor, clock, 10) == [3]  # Throttling: find out what the 4th thread adds
+    run(governor, clock, 30)
+    assert governor.status()["state"] == "hot"  # The clock first seen on 3 threads is low already
+    assert run(governor, clock, 60) == [4]  # ...and the 4th thread pays for itself
+    assert governor.status()["state"] == "hot" and governor.status()["temp"] is None
+
+
+def test_an_unreachable_api_still_rewrites_config_json(rig, capsys):
+    governor, xmrig, clock, thermal, sysfs = rig(celsius=88.0)
+    xmrig.close()
+    governor.apply(2)
+    assert "Live push failed" in capsys.readouterr().out
+    assert governor.last_error and governor.threads == 2
+    assert len(governor.config["cpu"]["threads"]) == 2
+    assert governor.sample()["hashrate"] is None
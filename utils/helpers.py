@@ -1,6 +1,4 @@
 from urllib.parse import urlparse
-import psutil
-import os
 
 RESET = "\033[0m"
 CYAN = "\033[96m"
@@ -40,17 +38,19 @@ MONERO_LOGO = fMONERO_LOGO = f"""
 
 def check_xmrig_active():
     """Check if xmrig miner is running."""
-    for proc in psutil.process_iter(['name']):
-        if 'xmrig' in (proc.info['name'] or '').lower():
-            print(f"{GREEN}xmrig miner is currently running.{RESET}")
-            return True
+    from core.supervisor import ensure_attached, supervisor
+    if ensure_attached() and supervisor.is_running():
+        print(f"{GREEN}xmrig miner is currently running.{RESET}")
+        return True
     print(f"{RED}xmrig miner is not running.{RESET}")
     return False
 
 def start_xmrig():
     """Start the xmrig miner."""
+    from core.supervisor import force_foreground, supervisor
     try:
-        os.system("nohup ./xmrig > xmrig.log 2>&1 &")
+        force_foreground()  # A self-forking xmrig would exit at once and go untracked
+        supervisor.start()
         print(f"{GREEN}xmrig miner started successfully.{RESET}")
     except Exception as e:
         print(f"{RED}Failed to start xmrig miner: {e}{RESET}")
@@ -68,3 +68,10 @@ def get_domain(url):
             return f"{RED}Invalid URL{RESET}"
     except Exception:
         return f"{RED}Error parsing URL{RESET}"
+
+def parse_pool_url(url, default_port=3333):
+    """Split a pool URL (e.g. 'stratum+ssl://host:443' or 'host:3333') into host and port."""
+    parsed_url = urlparse(url if "://" in url else f"stratum://{url}")
+    if not parsed_url.hostname:
+        raise ValueError(f"Invalid pool URL: {url}")
+    return parsed_url.hostname, parsed_url.port or default_port
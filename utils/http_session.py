@@ -0,0 +1,15 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_TIMEOUT = 10  # Seconds for connect and read on every API call
+USER_AGENT = "xmr-pool-switcher"
+
+
+def make_session(pool_size=10):
+    """Create a requests Session that keeps up to `pool_size` connections per host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
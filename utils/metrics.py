@@ -0,0 +1,193 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_HOST = "127.0.0.1"  # Local only; put a reverse proxy in front to expose it
+METRICS_PORT = 9479
+PREFIX = "xmrig_switcher_"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}  # Metric name -> metric, in registration order
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of series, one per combination of label values.
+
+    Updates take a per-metric lock held for a dict lookup and an add, about a
+    microsecond: noise next to the file writes and network calls measured.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        if not labels:
+            return ()
+        try:
+            return tuple([labels[name] for name in self.labels])
+        except KeyError:
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_label_text(self.labels, key)} {_format(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._series.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def value(self, **labels):
+        return self._series.get(self._key(labels))
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram; observations cost a bisect and three adds."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block takes, in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _render_series(self, key, value):
+        counts, total, count = value
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = 'le="' + _format(bound) + '"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_format(total)}")
+        lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+def _register(cls, name, help_text, labels=(), **kwargs):
+    with _registry_lock:
+        metric = _registry.get(PREFIX + name)
+        if metric is None:
+            metric = _registry[PREFIX + name] = cls(name, help_text, labels, **kwargs)
+        elif not isinstance(metric, cls) or metric.labels != tuple(labels):
+            raise ValueError(f"{PREFIX + name} is already registered differently")
+        return metric
+
+
+def counter(name, help_text, labels=()):
+    """Get or create the counter `name` (prefixed with PREFIX)."""
+    return _register(Counter, name, help_text, labels)
+
+
+def gauge(name, help_text, labels=()):
+    """Get or create the gauge `name` (prefixed with PREFIX)."""
+    return _register(Gauge, name, help_text, labels)
+
+
+def histogram(name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+    """Get or create the histogram `name` (prefixed with PREFIX)."""
+    return _register(Histogram, name, help_text, labels, buckets=buckets)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics on a daemon thread; returns the server (call shutdown() to stop it)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Only the serving process pays for it
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would drown the console
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
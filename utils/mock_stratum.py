@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+BLOCK_INTERVAL = 120.0  # Seconds between mock blocks
+MOCK_TARGET = "b88d0600"
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def make_blob(height, extra=0):
+    """Build a hashing blob for `height`: the same height gives the same previous block hash on every server."""
+    prev_id = hashlib.sha256(f"block-{height - 1}".encode()).digest()
+    merkle_root = hashlib.sha256(f"merkle-{height}-{extra}".encode()).digest()
+    return (bytes([16, 16]) + _varint(int(time.time())) + prev_id + bytes(4) + merkle_root + _varint(1)).hex()
+
+
+class MockStratumServer:
+    """Minimal Monero stratum pool for offline testing.
+
+    Accepts logins, pushes a new job whenever the shared mock chain advances and
+    acknowledges submits. Heights are derived from the wall clock, so several
+    servers in one process agree on the chain tip; `job_delay` makes a server
+    push each new block late, and `login_delay` slows down its login replies.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, block_interval=BLOCK_INTERVAL,
+                 login_delay=0.0, job_delay=0.0, reject_login=False):
+        self.host = host
+        self.port = port
+        self.block_interval = block_interval
+        self.login_delay = login_delay
+        self.job_delay = job_delay
+        self.reject_login = reject_login
+        self.logins = []  # Login params received, in order
+        self.submits = []  # Submit params received, in order
+        self.server = None
+        self._writers = set()
+        self._handlers = set()
+        self._ticker = None
+        self._job_seq = 0
+
+    @property
+    def url(self):
+        return f"{self.host}:{self.port}"
+
+    @property
+    def height(self):
+        return 3_000_000 + int(time.time() // self.block_interval)
+
+    def make_job(self):
+        self._job_seq += 1
+        return {
+            "blob": make_blob(self.height, self._job_seq),
+            "job_id": str(self._job_seq),
+            "target": MOCK_TARGET,
+            "algo": "rx/0",
+            "height": self.height,
+            "seed_hash": "00" * 32,
+        }
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._ticker = asyncio.create_task(self._new_blocks())
+        return self
+
+    async def stop(self):
+        if self._ticker:
+            self._ticker.cancel()
+        for handler in list(self._handlers):
+            handler.cancel()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def push_job(self):
+        """Send a fresh job to every logged-in client."""
+        message = _encode({"jsonrpc": "2.0", "method": "job", "params": self.make_job()})
+        for writer in list(self._writers):
+            try:
+                writer.write(message)
+            except (OSError, RuntimeError):
+                self._writers.discard(writer)
+
+    async def _new_blocks(self):
+        while True:
+            next_block = (time.time() // self.block_interval + 1) * self.block_interval
+            await asyncio.sleep(next_block - time.time() + self.job_delay)
+            await self.push_job()
+
+    async def _handle(self, reader, writer):
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                reply = await self._dispatch(request, writer)
+                if reply is not None:
+                    writer.write(_encode(reply))
+                    await writer.drain()
+        except (OSError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, request, writer):
+        method = request.get("method")
+        params = request.get("params") or {}
+        reply = {"id": request.get("id"), "jsonrpc": "2.0", "error": None}
+        if method == "login":
+            self.logins.append(params)
+            await asyncio.sleep(self.login_delay)
+            if self.reject_login:
+                reply["error"] = {"code": -1, "message": "Invalid payment address provided"}
+                return reply
+            self._writers.add(writer)
+            reply["result"] = {"id": str(len(self.logins)), "job": self.make_job(),
+                               "extensions": ["keepalive", "nicehash"], "status": "OK"}
+        elif method == "submit":
+            self.submits.append(params)
+            reply["result"] = {"status": "OK"}
+        elif method == "keepalived":
+            reply["result"] = {"status": "KEEPALIVED"}
+        else:
+            reply["error"] = {"code": -1, "message": f"Unknown method {method}"}
+        return reply
+
+
+def _encode(message):
+    return (json.dumps(message) + "\n").encode()
+
+
+class MockMiner:
+    """Minimal xmrig stand-in for testing the stratum proxy.
+
+    Logs in, keeps every job it is sent and submits fake shares in nicehash
+    mode: only the low three nonce bytes vary, the top one comes from the blob.
+    """
+
+    NONCE_OFFSET = 39
+
+    def __init__(self, host, port, login="mock-miner", rig_id=None):
+        self.host = host
+        self.port = port
+        self.login = login
+        self.rig_id = rig_id
+        self.miner_id = None
+        self.extensions = []
+        self.jobs = []  # Job params received, login job first
+        self.results = []  # (result, error) of each submit, in order
+        self.error = None
+        self._reader = self._writer = None
+        self._task = None
+        self._next_id = 1
+        self._pending = {}
+        self.new_job = asyncio.Event()
+
+    async def connect(self):
+        """Connect and log in. Returns True if the login was accepted."""
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._task = asyncio.create_task(self._read_loop())
+        result, error = await self._call("login", {"login": self.login, "pass": "x", "agent": "mock-miner",
+                                                   "rigid": self.rig_id, "algo": ["rx/0"]})
+        if error:
+            self.error = error.get("message")
+            return False
+        self.miner_id = result["id"]
+        self.extensions = result.get("extensions", [])
+        self._add_job(result["job"])
+        return True
+
+    @property
+    def fixed_byte(self):
+        """The nonce byte the pool (or proxy) assigned to this miner, from the current blob."""
+        offset = (self.NONCE_OFFSET + 3) * 2
+        return self.jobs[-1]["blob"][offset:offset + 2]
+
+    async def submit(self, job=None):
+        """Submit a fake share for `job` (default: the current one). Returns (result, error)."""
+        job = job or self.jobs[-1]
+        nonce = os.urandom(3).hex() + self.fixed_byte
+        outcome = await self._call("submit", {"id": self.miner_id, "job_id": job["job_id"], "nonce": nonce,
+                                              "result": "00" * 32})
+        self.results.append(outcome)
+        return outcome
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+        if self._writer:
+            self._writer.close()
+
+    def _add_job(self, job):
+        self.jobs.append(job)
+        self.new_job.set()
+
+    async def _call(self, method, params):
+        request_id = self._next_id
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write(_encode({"id": request_id, "jsonrpc": "2.0", "method": method, "params": params}))
+        try:
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message.get("method") == "job":
+                    self._add_job(message["params"])
+                elif message.get("id") in self._pending:
+                    self._pending[message["id"]].set_result((message.get("result"), message.get("error")))
+        except (OSError, ValueError):
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_result((None, {"message": "connection closed"}))
+
+
+async def run_mock_miners(host, port, count, shares=1):
+    """Connect `count` mock miners at once and submit `shares` shares from each; returns the miners."""
+    miners = [MockMiner(host, port, rig_id=f"rig-{idx}") for idx in range(count)]
+    await asyncio.gather(*(miner.connect() for miner in miners))
+    for _ in range(shares):
+        await asyncio.gather(*(miner.submit() for miner in miners if miner.miner_id))
+    return miners
+
+
+async def _serve(args):
+    server = await MockStratumServer(args.host, args.port, args.block_interval,
+                                     args.login_delay, args.job_delay).start()
+    print(f"Mock stratum pool listening on {server.url}")
+    await server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock Monero stratum pool.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3333)
+    parser.add_argument("--block-interval", type=float, default=BLOCK_INTERVAL)
+    parser.add_argument("--login-delay", type=float, default=0.0)
+    parser.add_argument("--job-delay", type=float, default=0.0)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
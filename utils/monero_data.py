@@ -1,25 +1,197 @@
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
 import requests
 from utils.helpers import CYAN, GREEN, ORANGE, RED, RESET
+from utils.http_session import HTTP_TIMEOUT, make_session
+from utils.metrics import histogram
 
 COINGECKO_URL = "https://api.coingecko.com/api/v3/coins/monero"
+MARKET_TTL = 60  # Seconds before cached market data is refreshed
+HISTORY_SIZE = 1440  # Samples kept for trend queries (a day at one per minute)
+FIRST_FETCH_TIMEOUT = 5  # Seconds a caller waits when nothing is cached yet
+BACKOFF_INITIAL = 30  # Seconds to wait after a rate limit or error, doubled on each repeat
+BACKOFF_MAX = 900
+
+market_fetch_seconds = histogram("market_fetch_seconds", "CoinGecko request time, by outcome.", ("result",))
+
+
+def _retry_after(response):
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_market_data(data):
+    """Extract the fields we use from a CoinGecko /coins/monero response."""
+    market = data["market_data"]
+    return {
+        "price": market["current_price"]["usd"],
+        "market_cap": market["market_cap"]["usd"],
+        "volume": market["total_volume"]["usd"],
+        "circulating_supply": market["circulating_supply"],
+        "fetched_at": time.time(),
+    }
+
+
+class MarketDataService:
+    """Cached CoinGecko market data with background refresh and rate-limit backoff.
+
+    `get` answers from the cache and refreshes stale data on a background
+    thread, so callers only wait when nothing has been fetched yet. Refreshes
+    are conditional (ETag / Last-Modified), 429 responses and errors back off
+    exponentially (honouring Retry-After), and every fresh sample is appended
+    to a fixed-size ring buffer for cheap trend queries.
+    """
+
+    def __init__(self, url=COINGECKO_URL, ttl=MARKET_TTL, history_size=HISTORY_SIZE, session=None):
+        self.url = url
+        self.ttl = ttl
+        self.session = session or make_session(2)
+        self.history = deque(maxlen=history_size)  # (timestamp, price in USD)
+        self.last_error = None
+        self._data = None
+        self._checked_at = 0.0
+        self._etag = None
+        self._last_modified = None
+        self._retry_at = 0.0
+        self._backoff = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _back_off(self, seconds=None):
+        self._backoff = min(BACKOFF_MAX, self._backoff * 2 if self._backoff else BACKOFF_INITIAL)
+        self._retry_at = time.monotonic() + (seconds if seconds is not None else self._backoff)
+
+    def refresh(self):
+        """Fetch new data now unless backing off. Returns the (possibly unchanged) cached data."""
+        if not self._refreshing.acquire(blocking=False):
+            return self._data  # Another thread is already refreshing
+        try:
+            if time.monotonic() < self._retry_at:
+                return self._data
+            headers = {}
+            if self._data is not None:
+                if self._etag:
+                    headers["If-None-Match"] = self._etag
+                if self._last_modified:
+                    headers["If-Modified-Since"] = self._last_modified
+            started = time.perf_counter()
+            try:
+                response = self.session.get(self.url, headers=headers, timeout=HTTP_TIMEOUT)
+                if response.status_code == 429:
+                    market_fetch_seconds.observe(time.perf_counter() - started, result="rate_limited")
+                    self._back_off(_retry_after(response))
+                    self.last_error = "rate limited by CoinGecko"
+                    return self._data
+                if response.status_code == 304:
+                    market_fetch_seconds.observe(time.perf_counter() - started, result="not_modified")
+                    self._checked_at = time.monotonic()
+                    return self._data
+                response.raise_for_status()
+                data = parse_market_data(response.json())
+            except requests.RequestException as e:
+                market_fetch_seconds.observe(time.perf_counter() - started, result="error")
+                self._back_off()
+                self.last_error = str(e)
+                return self._data
+            except (KeyError, TypeError, ValueError) as e:
+                market_fetch_seconds.observe(time.perf_counter() - started, result="bad_response")
+                self._back_off()
+                self.last_error = f"unexpected response structure: {e}"
+                return self._data
+            market_fetch_seconds.observe(time.perf_counter() - started, result="ok")
+            with self._lock:
+                self._data = data
+                self._checked_at = time.monotonic()
+                self._etag = response.headers.get("ETag")
+                self._last_modified = response.headers.get("Last-Modified")
+                self.history.append((data["fetched_at"], data["price"]))
+            self._backoff = 0.0
+            self.last_error = None
+            return data
+        finally:
+            self._refreshing.release()
+
+    def is_stale(self):
+        return time.monotonic() - self._checked_at >= self.ttl
+
+    def get(self):
+        """Return the latest market data, or None if none could be fetched yet."""
+        if self._data is None:
+            deadline = time.monotonic() + FIRST_FETCH_TIMEOUT
+            worker = threading.Thread(target=self.refresh, daemon=True)
+            worker.start()
+            worker.join(FIRST_FETCH_TIMEOUT)
+            # The background loop may have been mid-refresh; wait for it too
+            if self._data is None and self._refreshing.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                self._refreshing.release()
+        elif self.is_stale():
+            threading.Thread(target=self.refresh, daemon=True).start()
+        return self._data
+
+    def start(self):
+        """Keep the cache warm by refreshing every `ttl` seconds on a daemon thread. Starts it once."""
+        def loop():
+            while not self._stop.is_set():
+                self.refresh()
+                self._stop.wait(self.ttl)
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def samples(self, window=None):
+        """Return (timestamp, price) samples, optionally only those from the last `window` seconds."""
+        with self._lock:
+            samples = list(self.history)
+        if window is None:
+            return samples
+        cutoff = time.time() - window
+        return [sample for sample in samples if sample[0] >= cutoff]
+
+    def price_change(self, window):
+        """Fractional price change over the last `window` seconds, or None with fewer than two samples."""
+        samples = self.samples(window)
+        if len(samples) < 2 or not samples[0][1]:
+            return None
+        return samples[-1][1] / samples[0][1] - 1
+
+
+market_data = MarketDataService()
+
 
 def get_monero_data():
     """Fetch Monero data from the CoinGecko API."""
-    try:
-        response = requests.get(COINGECKO_URL)
-        response.raise_for_status()
-        data = response.json()
-        
-        current_price = data['market_data']['current_price']['usd']
-        market_cap = data['market_data']['market_cap']['usd']
-        volume = data['market_data']['total_volume']['usd']
-
-        print(f"\n{CYAN}Monero Market Data:{RESET}")
-        print(f"{GREEN}  Price (USD): ${current_price:,.2f}{RESET}")
-        print(f"{ORANGE}  Market Cap (USD): ${market_cap:,.2f}{RESET}")
-        print(f"  24h Volume (USD): ${volume:,.2f}")
-        print(f"  Circulating Supply: {data['market_data']['circulating_supply']:,.2f} XMR{RESET}")
-    except requests.RequestException as e:
-        print(f"{RED}Error fetching Monero data: {e}{RESET}")
-    except KeyError as e:
-        print(f"{RED}Unexpected response structure: {e}{RESET}")
+    data = market_data.get()
+    if data is None:
+        print(f"{RED}Error fetching Monero data: {market_data.last_error or 'no response yet'}{RESET}")
+        return None
+
+    print(f"\n{CYAN}Monero Market Data:{RESET}")
+    print(f"{GREEN}  Price (USD): ${data['price']:,.2f}{RESET}")
+    print(f"{ORANGE}  Market Cap (USD): ${data['market_cap']:,.2f}{RESET}")
+    print(f"  24h Volume (USD): ${data['volume']:,.2f}")
+    print(f"  Circulating Supply: {data['circulating_supply']:,.2f} XMR{RESET}")
+    change = market_data.price_change(3600)
+    if change is not None:
+        print(f"  1h Change: {change:+.2%}")
+    if market_data.last_error:
+        print(f"{RED}  Showing cached data: {market_data.last_error}{RESET}")
+    return data
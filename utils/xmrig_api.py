@@ -0,0 +1,50 @@
+import requests
+from utils.http_session import make_session
+
+API_TIMEOUT = 2  # Seconds; the API is local, a slow answer means xmrig is stuck
+
+
+class XmrigApiError(Exception):
+    """The xmrig HTTP API is disabled, unreachable or answered with an error."""
+
+
+class XmrigApi:
+    """Client for the local xmrig HTTP API over a keep-alive session."""
+
+    def __init__(self, base_url, token=None, timeout=API_TIMEOUT, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = session or make_session(2)
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Build a client from the "http" section of xmrig's config.json."""
+        http = config.get("http") or {}
+        if not http.get("enabled") or not http.get("port"):
+            raise XmrigApiError('the xmrig HTTP API is disabled; set "http": {"enabled": true, "port": ...} in config.json')
+        host = http.get("host") or "127.0.0.1"
+        if host in ("0.0.0.0", "::"):
+            host = "127.0.0.1"
+        return cls(f"http://{host}:{http['port']}", http.get("access-token"), **kwargs)
+
+    def request(self, method, path, **kwargs):
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+            return response.json() if response.content else None
+        except (requests.RequestException, ValueError) as e:
+            raise XmrigApiError(f"{method} {path}: {e}")
+
+    def summary(self):
+        """GET /2/summary: hashrate, share results and the current pool connection."""
+        return self.request("GET", "/2/summary")
+
+    def get_config(self):
+        """GET /1/config: the config xmrig is running with (needs an access token and "restricted": false)."""
+        return self.request("GET", "/1/config")
+
+    def put_config(self, config):
+        """PUT /1/config: replace xmrig's running config; it reconnects only if the pools changed."""
+        return self.request("PUT", "/1/config", json=config)